@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+# License: BSD3
+
+"""
+Bits and pieces shared by the benchmark scripts
+"""
+
+from __future__ import print_function
+import os
+import sys
+import time
+import timeit
+
+DEFAULT_CORPUS = os.path.normpath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                 '..', 'data', 'stac-sample'))
+
+
+def corpus_dir_arg(position=1):
+    """
+    Corpus directory given as the command line argument at this
+    position, or the STAC sample corpus if there is none
+    """
+    return sys.argv[position] if len(sys.argv) > position\
+        else DEFAULT_CORPUS
+
+
+def int_arg(position, default):
+    """
+    Number given as the command line argument at this position, or
+    the default if there is none
+    """
+    return int(sys.argv[position]) if len(sys.argv) > position\
+        else default
+
+
+def best_time(fun, repeat, number=1):
+    """
+    Best time (seconds) of `repeat` runs, each of which calls `fun`
+    `number` times
+    """
+    return min(timeit.repeat(fun, repeat=repeat, number=number))
+
+
+def print_times(funs, repeat, number=1):
+    """
+    Print the best time (see `best_time`) for each of the named
+    functions, in milliseconds
+
+    :type funs: [(string, function)]
+    """
+    for name, fun in funs:
+        secs = best_time(fun, repeat, number)
+        print("%-12s %8.1f ms" % (name, secs * 1e3))
+
+
+class Timer(object):
+    """
+    Wall-clock time (seconds) spent in a `with` block ::
+
+        with Timer() as timer:
+            ...
+        print(timer.seconds)
+    """
+    def __init__(self):
+        self.start = None
+        self.seconds = None
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.time() - self.start
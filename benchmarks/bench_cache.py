@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# License: BSD3
+
+"""
+Cold vs warm corpus loading with the parse cache (`educe.cache`)
+
+Usage: python benchmarks/bench_cache.py [CORPUS_DIR]
+
+Defaults to the STAC sample corpus in data/
+"""
+
+from __future__ import print_function
+import shutil
+import tempfile
+
+import educe.stac
+
+from _common import Timer, corpus_dir_arg
+
+
+def timed_slurp(corpus_dir, cache_dir=None):
+    "time to read the whole corpus (seconds)"
+    reader = educe.stac.Reader(corpus_dir, cache_dir=cache_dir)
+    anno_files = reader.files()
+    with Timer() as timer:
+        reader.slurp(anno_files)
+    return timer.seconds, len(anno_files)
+
+
+def main():
+    "run the benchmark"
+    corpus_dir = corpus_dir_arg()
+    cache_dir = tempfile.mkdtemp(prefix='educe-cache-bench-')
+    try:
+        no_cache, nfiles = timed_slurp(corpus_dir)
+        cold, _ = timed_slurp(corpus_dir, cache_dir)
+        warm, _ = timed_slurp(corpus_dir, cache_dir)
+    finally:
+        shutil.rmtree(cache_dir)
+    print("%d files in %s" % (nfiles, corpus_dir))
+    print("no cache:   %.3fs" % no_cache)
+    print("cold cache: %.3fs" % cold)
+    print("warm cache: %.3fs (%.1fx faster than no cache)" %
+          (warm, no_cache / warm))
+
+
+if __name__ == '__main__':
+    main()
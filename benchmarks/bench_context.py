@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# License: BSD3
+
+"""
+Time to build the EDU contexts (`educe.stac.context.Context.for_edus`)
+of ever longer games, given their enclosure graph.
+
+The games are synthetic: dialogues of 25 turns, each turn with two
+EDUs, and the speakers taking two turns at a time (so that there are
+turn stars to merge). For each size, we also give the time per EDU,
+which should only grow slowly with the number of turns.
+
+Usage: python benchmarks/bench_context.py [REPEATS]
+"""
+
+from __future__ import print_function
+
+from educe.annotation import Document, Span, Unit
+from educe.corpus import FileId
+from educe.stac.context import Context
+from educe.stac.graph import EnclosureGraph
+
+from _common import best_time, int_arg
+
+SIZES = [250, 500, 1000, 2000, 4000]
+TURNS_PER_DIALOGUE = 25
+EDUS_PER_TURN = 2
+PLAYERS = ['Alice', 'Bob', 'Charlie', 'Dave']
+
+
+def long_game(nturns):
+    """
+    Synthetic game with the given number of turns
+    """
+    text = ''
+    units = []
+
+    def unit(utype, start, end, features=None):
+        "add a unit"
+        units.append(Unit('stac_%d' % len(units), Span(start, end),
+                          utype, features or {}))
+
+    dia_start = 0
+    for i in range(nturns):
+        speaker = PLAYERS[(i // 2) % len(PLAYERS)]
+        turn_start = len(text)
+        text += '%d : %s : ' % (i + 1, speaker)
+        for j in range(EDUS_PER_TURN):
+            edu_start = len(text)
+            text += 'word%d word%d' % (i, j)
+            unit('Segment', edu_start, len(text))
+            text += ' '
+        unit('Turn', turn_start, len(text) - 1,
+             {'Emitter': speaker, 'Identifier': str(i + 1)})
+        text += '\n'
+        if (i + 1) % TURNS_PER_DIALOGUE == 0 or i + 1 == nturns:
+            unit('Dialogue', dia_start, len(text) - 1)
+            dia_start = len(text)
+    doc = Document(units, [], [], text)
+    doc.set_origin(FileId('long-game-%d' % nturns, '01', 'units', 'bench'))
+    return doc
+
+
+def main():
+    "run the benchmark"
+    repeats = int_arg(1, 3)
+    print("%6s %6s %10s %12s" % ('turns', 'EDUs', 'contexts', 'per EDU'))
+    for nturns in SIZES:
+        doc = long_game(nturns)
+        egraph = EnclosureGraph(doc)
+        nedus = nturns * EDUS_PER_TURN
+        secs = best_time(lambda: Context.for_edus(doc, enclosure=egraph),
+                         repeats)
+        print("%6d %6d %8.1f ms %9.1f us" %
+              (nturns, nedus, secs * 1e3, secs * 1e6 / nedus))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# License: BSD3
+
+"""
+Time to build the enclosure graph of every document in a corpus,
+with its POS tagged tokens (`educe.stac.graph.EnclosureGraph`),
+and to build the EDU contexts that rely on it
+(`educe.stac.context.Context.for_edus`); then to bring them up to
+date after nudging an EDU in each document, either by building them
+again, or by patching them (`EnclosureGraph.update_span` and
+`Context.refresh`)
+
+Usage: python benchmarks/bench_enclosure.py [CORPUS_DIR]
+
+Defaults to the STAC sample corpus in data/, which comes with
+POS tagger output
+"""
+
+from __future__ import print_function
+import copy
+import warnings
+
+import educe.stac
+import educe.stac.postag
+from educe.annotation import Span
+from educe.stac.annotation import is_edu
+from educe.stac.context import Context
+from educe.stac.graph import EnclosureGraph
+
+from _common import Timer, corpus_dir_arg
+
+
+def main():
+    "run the benchmark"
+    corpus_dir = corpus_dir_arg()
+    reader = educe.stac.Reader(corpus_dir)
+    corpus = reader.slurp(reader.files())
+    postags = educe.stac.postag.read_tags(corpus, corpus_dir)
+    keys = sorted(corpus)
+    print("%d documents in %s (%d tokens)" %
+          (len(keys), corpus_dir, sum(len(postags[k]) for k in keys)))
+
+    with Timer() as timer:
+        for key in keys:
+            EnclosureGraph(corpus[key], postags[key])
+    print("enclosure graphs: %.2fs" % timer.seconds)
+
+    with warnings.catch_warnings(), Timer() as timer:
+        warnings.simplefilter('ignore')
+        for key in keys:
+            Context.for_edus(corpus[key], postags[key])
+    print("EDU contexts:     %.2fs" % timer.seconds)
+
+    # shrink the longest EDU of each document by a character
+    corpus = dict((k, copy.deepcopy(corpus[k])) for k in keys)
+    keys = [k for k in keys if corpus[k].view(is_edu)]
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        built = {}
+        for key in keys:
+            egraph = EnclosureGraph(corpus[key], postags[key])
+            built[key] = (egraph, Context.for_edus(corpus[key],
+                                                   enclosure=egraph))
+        edits = {}
+        for key in keys:
+            doc = corpus[key]
+            edu = max(doc.view(is_edu), key=lambda x: x.text_span().length())
+            old_span = edu.text_span()
+            edu.span = Span(old_span.char_start, old_span.char_end - 1)
+            doc.bump_version()
+            edits[key] = (edu, [old_span, edu.span])
+
+        with Timer() as timer:
+            for key in keys:
+                EnclosureGraph(corpus[key], postags[key])
+                Context.for_edus(corpus[key], postags[key])
+        print("edit, rebuild:    %.2fs" % timer.seconds)
+
+        with Timer() as timer:
+            for key in keys:
+                egraph, contexts = built[key]
+                edu, spans = edits[key]
+                egraph.update_span(edu)
+                Context.refresh(contexts, corpus[key], egraph, spans)
+        print("edit, refresh:    %.2fs" % timer.seconds)
+
+
+if __name__ == '__main__':
+    main()
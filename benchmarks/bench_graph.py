@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# License: BSD3
+
+"""
+Time to build the graph of every discourse document in a corpus
+(`educe.stac.graph.Graph.from_doc`), to look up the type,
+annotation and mirror of every node and edge in them, as the RFC
+code, sanity checks and graph dumps do, to find their connected
+components, to copy out the
+subgraph for each batch of 5 consecutive EDUs (one at a time with
+`copy`, or all at once with `copy_many`), and to replace their CDUs
+with their heads (`without_cdus`)
+
+Usage: python benchmarks/bench_graph.py [CORPUS_DIR] [REPEATS]
+
+Defaults to the STAC sample corpus in data/
+"""
+
+from __future__ import print_function
+
+import educe.stac
+import educe.stac.graph as stac_gr
+
+from _common import corpus_dir_arg, int_arg, print_times
+
+
+def main():
+    "run the benchmark"
+    corpus_dir = corpus_dir_arg()
+    repeats = int_arg(2, 5)
+    reader = educe.stac.Reader(corpus_dir)
+    corpus = reader.slurp(reader.files())
+    keys = sorted(k for k in corpus if k.stage == 'discourse')
+
+    def build():
+        "graphs for every discourse document"
+        return [stac_gr.Graph.from_doc(corpus, k) for k in keys]
+
+    graphs = build()
+
+    def lookup():
+        "attributes of every node and edge"
+        for graph in graphs:
+            for x in graph.nodes() + graph.hyperedges():
+                graph.type(x)
+                graph.annotation(x)
+                graph.mirror(x)
+
+    def queries():
+        "the usual graph queries"
+        for graph in graphs:
+            graph.edus()
+            for rel in graph.relations():
+                graph.rel_links(rel)
+            for cdu in graph.cdus():
+                graph.cdu_members(cdu, deep=True)
+            for edu in graph.edus():
+                graph.containing_cdu(edu)
+                graph.containing_cdu_chain(edu)
+            graph.recursive_cdu_heads(sloppy=True)
+
+    def components():
+        "connected components"
+        for graph in graphs:
+            graph.connected_components()
+
+    batches = []
+    for graph in graphs:
+        edus = sorted(graph.edus(),
+                      key=lambda x, g=graph: g.annotation(x).text_span())
+        batches.append([edus[i:i + 5] for i in range(0, len(edus), 5)])
+
+    def copies():
+        "subgraphs, one at a time"
+        for graph, nodesets in zip(graphs, batches):
+            for nodes in nodesets:
+                graph.copy(nodes)
+
+    def copy_many():
+        "subgraphs, all at once"
+        for graph, nodesets in zip(graphs, batches):
+            graph.copy_many(nodesets)
+
+    def strip():
+        "graphs without CDUs"
+        for graph in graphs:
+            graph.without_cdus(sloppy=True)
+
+    nnodes = sum(len(g.nodes()) for g in graphs)
+    nedges = sum(len(g.hyperedges()) for g in graphs)
+    print("%d discourse documents in %s (%d nodes, %d edges)" %
+          (len(keys), corpus_dir, nnodes, nedges))
+    print_times([('build', build),
+                 ('lookup', lookup),
+                 ('queries', queries),
+                 ('components', components),
+                 ('copy', copies),
+                 ('copy_many', copy_many),
+                 ('strip', strip)], repeats)
+
+
+if __name__ == '__main__':
+    main()
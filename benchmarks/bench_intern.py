@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# License: BSD3
+
+"""
+Memory held by a slurped corpus, with and without string interning
+at parse time (see `educe.internalutil.intern_string`)
+
+Usage: python benchmarks/bench_intern.py [CORPUS_DIR]
+
+Defaults to the STAC sample corpus in data/ (needs Python 3 for
+tracemalloc)
+"""
+
+from __future__ import print_function
+import gc
+import tracemalloc
+
+import educe.glozz
+import educe.stac
+
+from _common import corpus_dir_arg
+
+
+def slurp_memory(corpus_dir):
+    "bytes allocated (and still held) by reading the whole corpus"
+    reader = educe.stac.Reader(corpus_dir)
+    anno_files = reader.files()
+    gc.collect()
+    tracemalloc.start()
+    corpus = reader.slurp(anno_files)
+    gc.collect()
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return held, len(corpus)
+
+
+def main():
+    "run the benchmark"
+    corpus_dir = corpus_dir_arg()
+    interned, nfiles = slurp_memory(corpus_dir)
+    real_intern = educe.glozz.intern_string
+    educe.glozz.intern_string = lambda s, max_length=None: s
+    try:
+        plain, _ = slurp_memory(corpus_dir)
+    finally:
+        educe.glozz.intern_string = real_intern
+    print("%d files in %s" % (nfiles, corpus_dir))
+    print("without interning: %.2f MiB" % (plain / 2.0 ** 20))
+    print("with interning:    %.2f MiB (%.1f%% less)" %
+          (interned / 2.0 ** 20, 100.0 * (plain - interned) / plain))
+
+
+if __name__ == '__main__':
+    main()
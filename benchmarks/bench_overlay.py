@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# License: BSD3
+
+"""
+Peak RSS and time for fusing the EDUs of every discourse document in
+a corpus (keeping the results, as feature extraction does) and taking
+every document graph `without_cdus`, with deep copies of the documents
+as we used to, and with copy-on-write overlays
+(see `educe.annotation.Document.overlay`)
+
+Usage: python benchmarks/bench_overlay.py [CORPUS_DIR]
+
+Defaults to the STAC sample corpus in data/. Each variant runs in a
+fresh interpreter, so that they do not share a high water mark.
+"""
+
+from __future__ import print_function
+import copy
+import resource
+import subprocess
+import sys
+
+import educe.stac
+import educe.stac.graph as stac_gr
+from educe.annotation import Document
+from educe.stac.fusion import fuse_edus
+
+from _common import Timer, corpus_dir_arg
+
+VARIANTS = ['deepcopy', 'overlay']
+
+
+def peak_rss():
+    "high water mark of our resident set size, in MiB"
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    scale = 2.0 ** 20 if sys.platform == 'darwin' else 2.0 ** 10
+    return rss / scale
+
+
+def deepcopy_overlay(doc):
+    "a document `overlay` the old way"
+    return copy.deepcopy(doc)
+
+
+def deepcopy_without_cdus(graph, sloppy=False):
+    "`Graph.without_cdus` the old way"
+    graph2 = copy.deepcopy(graph)
+    graph2.strip_cdus(sloppy)
+    return graph2
+
+
+def workload(corpus_dir):
+    "fuse and strip every discourse document; return rss before, after"
+    reader = educe.stac.Reader(corpus_dir)
+    corpus = reader.slurp(reader.files())
+    keys = sorted(k for k in corpus if k.stage == 'discourse')
+    before = peak_rss()
+    fused = []
+    for key in keys:
+        ukey = copy.copy(key)
+        ukey.stage = 'units'
+        fused.append(fuse_edus(corpus[key], corpus.get(ukey), None))
+    for key in keys:
+        graph = stac_gr.Graph.from_doc(corpus, key)
+        graph.without_cdus(sloppy=True)
+    return before, peak_rss(), len(keys)
+
+
+def run_variant(variant, corpus_dir):
+    "run the workload (in this process) and print the figures"
+    if variant == 'deepcopy':
+        Document.overlay = deepcopy_overlay
+        stac_gr.Graph.without_cdus = deepcopy_without_cdus
+    with Timer() as timer:
+        before, after, ndocs = workload(corpus_dir)
+    print("%d %f %f %f" % (ndocs, before, after, timer.seconds))
+
+
+def main():
+    "run the benchmark"
+    if len(sys.argv) > 2 and sys.argv[1] == '--variant':
+        run_variant(sys.argv[2], sys.argv[3])
+        return
+    corpus_dir = corpus_dir_arg()
+    print("%-9s %12s %12s %10s" % ('', 'peak RSS', 'growth', 'time'))
+    for variant in VARIANTS:
+        out = subprocess.check_output([sys.executable, __file__,
+                                       '--variant', variant, corpus_dir])
+        ndocs, before, after, secs = out.decode('utf-8').split()
+        print("%-9s %8.1f MiB %8.1f MiB %8.2f s" %
+              (variant, float(after), float(after) - float(before),
+               float(secs)))
+    print("(%s discourse documents in %s)" % (ndocs, corpus_dir))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# License: BSD3
+
+"""
+Per-object memory and attribute access time for the slotted core
+classes (`Span`, `RelSpan`, `FileId`, `RawToken`, `Token`,
+`TweakedToken`), against equivalent classes with an instance
+dictionary
+
+Usage: python benchmarks/bench_slots.py [N]
+
+(needs Python 3 for tracemalloc)
+"""
+
+from __future__ import print_function
+import gc
+import timeit
+import tracemalloc
+
+from educe.annotation import Span, RelSpan
+from educe.corpus import FileId
+from educe.external.postag import RawToken, Token
+from educe.ptb.annotation import TweakedToken
+
+from _common import int_arg
+
+
+def with_dict(cls):
+    "subclass of a slotted class that has an instance dictionary again"
+    return type(cls.__name__, (cls,), {})
+
+
+def make(cls):
+    "a function building an instance of one of our classes"
+    if issubclass(cls, Token):
+        return lambda i: cls(RawToken('word', 'NN'), Span(i, i + 4))
+    elif issubclass(cls, TweakedToken):
+        return lambda i: cls('word', 'NN', 'tweak')
+    elif issubclass(cls, RawToken):
+        return lambda i: cls('word', 'NN')
+    elif issubclass(cls, FileId):
+        return lambda i: cls('doc', str(i), 'units', 'someone')
+    elif issubclass(cls, RelSpan):
+        return lambda i: cls('a', 'b')
+    else:
+        return lambda i: cls(i, i + 4)
+
+
+def memory_per_object(cls, num):
+    "bytes per object, measured over `num` of them"
+    mk_obj = make(cls)
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    objs = [mk_obj(i) for i in range(num)]
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objs
+    # only count the outer object (not eg. the span inside a Token)
+    inner = 0
+    if issubclass(cls, Token):
+        inner = memory_per_object(Span, num)
+    return float(after - before) / num - inner
+
+
+def _first_attribute(cls):
+    "name of an attribute to read"
+    for base, attr in [(Span, 'char_start'),
+                       (RelSpan, 't1'),
+                       (FileId, 'doc')]:
+        if issubclass(cls, base):
+            return attr
+    return 'word'
+
+
+def access_time(cls):
+    "nanoseconds per read of an attribute"
+    timer = timeit.Timer('obj.' + _first_attribute(cls),
+                         globals={'obj': make(cls)(0)})
+    return min(timer.repeat(repeat=5, number=1000000)) * 1000
+
+
+class _UncachedFileId(FileId):
+    "FileId as it was before we cached its tuple and hash"
+    def _tuple(self):
+        return (self.doc, self.subdoc, self.stage, self.annotator)
+
+    def __hash__(self):
+        return hash(self._tuple())
+
+
+def lookup_times():
+    "nanoseconds per corpus dictionary lookup, uncached vs cached FileId"
+    times = []
+    for cls in [_UncachedFileId, FileId]:
+        corpus = {make(cls)(0): None}
+        timer = timeit.Timer('key in corpus',
+                             globals={'corpus': corpus,
+                                      'key': make(cls)(0)})
+        times.append(min(timer.repeat(repeat=5, number=1000000)) * 1000)
+    return times
+
+
+def main():
+    "run the benchmark"
+    num = int_arg(1, 100000)
+    print("%-13s %11s %11s   %11s %11s" %
+          ('', 'bytes/obj', '', 'ns/read', ''))
+    print("%-13s %11s %11s   %11s %11s" %
+          ('class', 'dict', 'slots', 'dict', 'slots'))
+    for cls in [Span, RelSpan, FileId, RawToken, Token, TweakedToken]:
+        dcls = with_dict(cls)
+        print("%-13s %11.1f %11.1f   %11.1f %11.1f" %
+              (cls.__name__,
+               memory_per_object(dcls, num),
+               memory_per_object(cls, num),
+               access_time(dcls),
+               access_time(cls)))
+    uncached, cached = lookup_times()
+    print("corpus[FileId] lookup: %.1f ns uncached, %.1f ns cached" %
+          (uncached, cached))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# License: BSD3
+
+"""
+Time to get the graphs of every discourse document in a corpus
+(`educe.stac.graph.Graph`) by building them from the documents,
+or from snapshots of them (`Graph.snapshot`), either pointing
+them at the documents or at the skeletons in the snapshots; and
+likewise for the enclosure graphs of every document
+(`educe.stac.graph.EnclosureGraph`).
+
+Also: time to go from corpus files to graphs with a warm cache
+(see `educe.cache`), reading the documents
+(`educe.stac.Reader.slurp`) or the snapshots
+(`educe.stac.graph.graph_snapshots`)
+
+Usage: python benchmarks/bench_snapshot.py [CORPUS_DIR] [REPEATS]
+
+Defaults to the STAC sample corpus in data/
+"""
+
+from __future__ import print_function
+import shutil
+import tempfile
+
+from six.moves import cPickle as pickle
+
+import educe.stac
+import educe.stac.graph as stac_gr
+
+from _common import corpus_dir_arg, int_arg, print_times
+
+
+def main():
+    "run the benchmark"
+    corpus_dir = corpus_dir_arg()
+    repeats = int_arg(2, 5)
+    reader = educe.stac.Reader(corpus_dir)
+    anno_files = reader.filter(reader.files(),
+                               lambda k: k.stage == 'discourse')
+    corpus = reader.slurp(anno_files)
+    keys = sorted(corpus)
+
+    snapshots = [stac_gr.Graph.from_doc(corpus, k).snapshot()
+                 for k in keys]
+    egraphs = [stac_gr.EnclosureGraph(corpus[k]) for k in keys]
+    esnapshots = [g.snapshot() for g in egraphs]
+    size = sum(len(pickle.dumps(x, pickle.HIGHEST_PROTOCOL))
+               for x in snapshots + esnapshots)
+    print("%d discourse documents in %s (%d KiB of snapshots)" %
+          (len(keys), corpus_dir, size // 1024))
+
+    def build():
+        "graphs from documents"
+        for key in keys:
+            stac_gr.Graph.from_doc(corpus, key)
+
+    def restore():
+        "graphs from snapshots, with documents"
+        for snapshot in snapshots:
+            stac_gr.Graph.from_snapshot(snapshot, corpus)
+
+    def restore_skeleton():
+        "graphs from snapshots alone"
+        for snapshot in snapshots:
+            stac_gr.Graph.from_snapshot(snapshot)
+
+    def ebuild():
+        "enclosure graphs from documents"
+        for key in keys:
+            stac_gr.EnclosureGraph(corpus[key])
+
+    def erestore():
+        "enclosure graphs from snapshots"
+        for key, snapshot in zip(keys, esnapshots):
+            stac_gr.EnclosureGraph(corpus[key], snapshot=snapshot)
+
+    cache_dir = tempfile.mkdtemp()
+    try:
+        cached = educe.stac.Reader(corpus_dir, cache_dir=cache_dir)
+        cached.slurp(anno_files)
+        stac_gr.graph_snapshots(cached, anno_files)
+
+        def warm_docs():
+            "corpus files to graphs via cached documents"
+            cached_corpus = cached.slurp(anno_files)
+            for key in keys:
+                stac_gr.Graph.from_doc(cached_corpus, key)
+
+        def warm_snapshots():
+            "corpus files to graphs via cached snapshots"
+            for snapshot in stac_gr.graph_snapshots(cached,
+                                                    anno_files).values():
+                stac_gr.Graph.from_snapshot(snapshot)
+
+        print_times([('build', build),
+                     ('restore', restore),
+                     ('skeleton', restore_skeleton),
+                     ('enc build', ebuild),
+                     ('enc restore', erestore),
+                     ('warm docs', warm_docs),
+                     ('warm snaps', warm_snapshots)], repeats)
+    finally:
+        shutil.rmtree(cache_dir)
+
+
+if __name__ == '__main__':
+    main()
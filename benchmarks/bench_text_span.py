@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# License: BSD3
+
+"""
+Time spent in `text_span()` on the CDUs of a document where each
+CDU is nested in the next one (built with `educe.stac.fake_graph`),
+the old way, with a set-based walk, and with the memoized
+terminals/span
+(see `educe.annotation.Document.bump_version`)
+
+Usage: python benchmarks/bench_text_span.py [REPEATS]
+"""
+
+from __future__ import print_function
+from itertools import chain
+import string
+
+from educe.annotation import Standoff, _terminals_span
+from educe.stac.fake_graph import LightGraph
+
+from _common import best_time, int_arg
+
+# as many EDUs and CDUs as the fake graph alphabet allows
+NUM_EDUS = 13
+
+
+def nested_cdus_source():
+    """
+    Fake graph source with EDUs a, b, c, ... and CDUs n(ab),
+    o(nc), p(od), ... each one containing the previous
+    """
+    edus = string.ascii_lowercase[:NUM_EDUS]
+    cdus = string.ascii_lowercase[NUM_EDUS:]
+    blocks = [cdus[0] + '(' + edus[0] + edus[1] + ')']
+    for i, cdu in enumerate(cdus[1:NUM_EDUS - 1]):
+        blocks.append(cdu + '(' + cdus[i] + edus[i + 2] + ')')
+    return '\n'.join(['# A' + edus, ' '.join(blocks)])
+
+
+def old_terminals(anno, seen=None):
+    "terminals as we used to collect them (list-based visited path)"
+    my_members = anno._members()
+    seen = seen or []
+    if my_members is None:
+        return [anno]
+    return chain.from_iterable([old_terminals(m, seen + my_members)
+                                for m in my_members if m not in seen])
+
+
+def old_text_span(anno):
+    "text span as we used to compute it"
+    return _terminals_span(list(old_terminals(anno)))
+
+
+def uncached_text_span(anno):
+    "text span from scratch, with the set-based walk"
+    return _terminals_span(Standoff._terminals(anno, seen=set()))
+
+
+def main():
+    "run the benchmark"
+    repeats = int_arg(1, 1000)
+    doc = LightGraph(nested_cdus_source()).get_doc()
+    cdus = doc.schemas
+    depth = len(cdus)
+
+    def old():
+        "every CDU span, the old way"
+        for cdu in cdus:
+            old_text_span(cdu)
+
+    def uncached():
+        "every CDU span from scratch"
+        for cdu in cdus:
+            uncached_text_span(cdu)
+
+    def memoized():
+        "every CDU span through the memo"
+        for cdu in cdus:
+            cdu.text_span()
+
+    def edited():
+        "every CDU span just after an edit to the document"
+        doc.bump_version()
+        memoized()
+
+    for cdu in cdus:
+        assert cdu.text_span() == uncached_text_span(cdu)
+        assert cdu.text_span() == old_text_span(cdu)
+    print("%d CDUs nested %d deep, %d repeats" % (depth, depth, repeats))
+    for name, fun in [('old', old),
+                      ('uncached', uncached),
+                      ('memoized', memoized),
+                      ('after edit', edited)]:
+        secs = best_time(fun, 5, number=repeats)
+        print("%-11s %8.2f us per text_span()" %
+              (name, secs * 1e6 / (repeats * depth)))
+
+
+if __name__ == '__main__':
+    main()
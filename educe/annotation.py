@@ -18,8 +18,15 @@ some sort of graph representation of them
 # pylint: disable=too-many-arguments, protected-access
 # pylint: disable=too-few-public-methods
 
+from bisect import bisect_left, bisect_right
+import copy
 from itertools import chain
 
+import numpy as np
+import six
+
+from .internalutil import get_slots_state, set_slots_state
+
 
 class Span(object):
     """
@@ -38,10 +45,15 @@ class Span(object):
     So `(0,5)` covers the whole word above, and `(1,2)`
     picks out the letter "o"
     """
+    __slots__ = ('char_start', 'char_end')
+
     def __init__(self, start, end):
         self.char_start = start
         self.char_end = end
 
+    __getstate__ = get_slots_state
+    __setstate__ = set_slots_state
+
     def __str__(self):
         return '(%d,%d)' % (self.char_start, self.char_end)
 
@@ -178,11 +190,229 @@ class Span(object):
         return Span(big_start, big_end)
 
 
+class SpanArray(object):
+    """
+    A sequence of spans, held as two numpy arrays of start and end
+    offsets so that you can compare thousands of them at once rather
+    than one `Span` at a time.
+
+    The comparisons mirror those on `Span`. They accept either a
+    single `Span` (compared against every span in the array), or
+    another `SpanArray` of the same length (compared element-wise),
+    and return boolean arrays.
+
+    Building a `SpanArray` from a pair of integer arrays does not
+    copy them (so beware of modifying them afterwards); going to and
+    from lists of `Span` objects does (see `from_spans` and
+    `to_spans`).
+
+    :param starts: start offsets
+    :type starts: array-like of int
+    :param ends: end offsets
+    :type ends: array-like of int
+    """
+    def __init__(self, starts, ends):
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.ends = np.asarray(ends, dtype=np.int64)
+        if self.starts.shape != self.ends.shape:
+            raise ValueError("need as many start offsets as end offsets")
+
+    @classmethod
+    def from_spans(cls, spans):
+        """
+        Array of the given spans
+
+        :type spans: iterable(Span)
+        """
+        spans = list(spans)
+        return cls(np.fromiter((x.char_start for x in spans), np.int64,
+                               count=len(spans)),
+                   np.fromiter((x.char_end for x in spans), np.int64,
+                               count=len(spans)))
+
+    @classmethod
+    def from_annotations(cls, annos):
+        """
+        Array of the text spans of the given annotations
+
+        :type annos: iterable(Standoff)
+        """
+        return cls.from_spans(x.text_span() for x in annos)
+
+    def to_spans(self):
+        """
+        The spans in this array as `Span` objects
+
+        :rtype: [Span]
+        """
+        return [Span(start, end) for start, end in
+                zip(self.starts.tolist(), self.ends.tolist())]
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self):
+        return iter(self.to_spans())
+
+    def __getitem__(self, idx):
+        if isinstance(idx, (int, np.integer)):
+            return Span(int(self.starts[idx]), int(self.ends[idx]))
+        return SpanArray(self.starts[idx], self.ends[idx])
+
+    def __repr__(self):
+        return 'SpanArray(%r, %r)' % (self.starts.tolist(),
+                                      self.ends.tolist())
+
+    @staticmethod
+    def _bounds(other):
+        "start and end offsets of a span or span array"
+        if isinstance(other, Span):
+            return other.char_start, other.char_end
+        return other.starts, other.ends
+
+    def length(self):
+        """
+        Lengths of the spans
+        """
+        return self.ends - self.starts
+
+    def shift(self, offset):
+        """
+        Copy of this array, shifted to the right (if offset is
+        positive) or left (if negative).
+
+        :param offset: a single offset, or one per span
+        :type offset: int or array-like of int
+        """
+        return SpanArray(self.starts + offset, self.ends + offset)
+
+    def encloses(self, other):
+        """
+        Which of these spans include the argument (see `Span.encloses`)
+
+        :type other: Span or SpanArray
+        :rtype: numpy.ndarray(bool)
+        """
+        o_start, o_end = self._bounds(other)
+        return (self.starts <= o_start) & (self.ends >= o_end)
+
+    def enclosed_by(self, other):
+        """
+        Which of these spans are included in the argument
+
+        :type other: Span or SpanArray
+        :rtype: numpy.ndarray(bool)
+        """
+        o_start, o_end = self._bounds(other)
+        return (o_start <= self.starts) & (o_end >= self.ends)
+
+    def overlaps(self, other, inclusive=False):
+        """
+        Which of these spans have regions in common with the argument,
+        ie. for which `Span.overlaps` would return a span rather than
+        None (touching edges count if `inclusive`)
+
+        :type other: Span or SpanArray
+        :rtype: numpy.ndarray(bool)
+        """
+        o_start, o_end = self._bounds(other)
+        common_start = np.maximum(self.starts, o_start)
+        common_end = np.minimum(self.ends, o_end)
+        common = common_start <= common_end if inclusive\
+            else common_start < common_end
+        return common | self.encloses(other) | self.enclosed_by(other)
+
+    def merge_all(self):
+        """
+        Span stretching from the beginning to the end of all the
+        spans in this array (see `Span.merge_all`)
+
+        :rtype: Span
+        """
+        if len(self) < 1:
+            raise ValueError("must have at least one span")
+        return Span(int(self.starts.min()), int(self.ends.max()))
+
+    def _is_sorted(self):
+        "if the start offsets are in ascending order"
+        return bool(np.all(self.starts[1:] >= self.starts[:-1]))
+
+    def _is_monotonic(self):
+        "if both start and end offsets are in ascending order"
+        return self._is_sorted() and\
+            bool(np.all(self.ends[1:] >= self.ends[:-1]))
+
+    def enclosing(self, others):
+        """
+        For each of the given spans, the index of the first span in
+        this array that encloses it, or -1 if there is none.
+
+        This is a binary search if the spans in this array are in
+        order (as tokens, sentences or paragraphs would be), and a
+        brute force comparison otherwise.
+
+        :type others: SpanArray or iterable(Span)
+        :rtype: numpy.ndarray(int)
+        """
+        if not isinstance(others, SpanArray):
+            others = SpanArray.from_spans(others)
+        if self._is_monotonic():
+            # those that start early enough are a prefix; those that
+            # end late enough, a suffix: we want the first in both
+            lo = np.searchsorted(self.ends, others.ends, side='left')
+            hi = np.searchsorted(self.starts, others.starts, side='right')
+            return np.where(lo < hi, lo, -1)
+        res = np.full(len(others), -1, dtype=np.int64)
+        # (in blocks, to keep the comparison matrix reasonably small)
+        step = max(1, 2 ** 20 // max(1, len(self)))
+        for i in range(0, len(others), step):
+            block = others[i:i + step]
+            hits = ((self.starts[np.newaxis, :] <=
+                     block.starts[:, np.newaxis]) &
+                    (self.ends[np.newaxis, :] >=
+                     block.ends[:, np.newaxis]))
+            found = hits.any(axis=1)
+            res[i:i + step][found] = hits.argmax(axis=1)[found]
+        return res
+
+    def enclosed_indices(self, span):
+        """
+        Indices (in ascending order) of the spans in this array
+        that the given span encloses (narrowed down with a binary
+        search if the array is sorted)
+
+        :type span: Span
+        :rtype: numpy.ndarray(int)
+        """
+        if not self._is_sorted():
+            return np.flatnonzero(self.enclosed_by(span))
+        lo = np.searchsorted(self.starts, span.char_start, side='left')
+        hi = np.searchsorted(self.starts, span.char_end, side='right')
+        return lo + np.flatnonzero(self.ends[lo:hi] <= span.char_end)
+
+    def overlapping_indices(self, span, inclusive=False):
+        """
+        Indices (in ascending order) of the spans in this array
+        that overlap the given one (see `overlaps`; narrowed down
+        with a binary search if the array is sorted)
+
+        :type span: Span
+        :rtype: numpy.ndarray(int)
+        """
+        if not self._is_sorted():
+            return np.flatnonzero(self.overlaps(span, inclusive=inclusive))
+        # nothing that starts after the span ends can overlap it
+        hi = np.searchsorted(self.starts, span.char_end, side='right')
+        return np.flatnonzero(self[:hi].overlaps(span, inclusive=inclusive))
+
+
 # pylint: disable=invalid-name
 class RelSpan(object):
     """
     Which two units a relation connections.
     """
+    __slots__ = ('t1', 't2')
+
     def __init__(self, t1, t2):
         self.t1 = t1
         "string: id of an annotation"
@@ -190,6 +420,9 @@ class RelSpan(object):
         self.t2 = t2
         "string: id of an annotation"
 
+    __getstate__ = get_slots_state
+    __setstate__ = set_slots_state
+
     def __str__(self):
         return '%s -> %s' % (self.t1, self.t2)
 
@@ -199,11 +432,92 @@ class RelSpan(object):
 
 
 # pylint: disable=no-self-use
+def _terminals_span(terminals):
+    """
+    Span from the earliest of the given terminal annotations to the
+    latest (None if there are none)
+    """
+    if not terminals:
+        return None
+    return Span(min(t.span.char_start for t in terminals),
+                max(t.span.char_end for t in terminals))
+
+
+class _IdentitySet(object):
+    """
+    Immutable set of objects, compared by identity rather than
+    equality (annotations are equal if their local ids are).
+
+    We hold on to the members, so that their ids cannot be handed
+    out to new objects while they are in the set; and we forget
+    the ids when pickled, as they would not mean anything once
+    unpickled
+    """
+    __slots__ = ('_members',)
+
+    def __init__(self, objects=()):
+        self._members = dict((id(x), x) for x in objects)
+
+    def __contains__(self, obj):
+        return self._members.get(id(obj)) is obj
+
+    def __len__(self):
+        return len(self._members)
+
+    def union(self, objects):
+        """
+        A set with these objects as well as ours
+        """
+        res = _IdentitySet(objects)
+        res._members.update(self._members)
+        return res
+
+    def __getstate__(self):
+        return list(self._members.values())
+
+    def __setstate__(self, objects):
+        self._members = dict((id(x), x) for x in objects)
+
+
+class _Version(object):
+    """
+    Edit counter shared by a document and its relations and schemas
+    (see `Document.bump_version`).
+
+    Each version is a fresh object, which we compare by identity
+    rather than by value, so that it cannot be mistaken for any
+    other, even one that was pickled in another process along with
+    the memos computed with it (eg. in a process pool or the parse
+    cache)
+    """
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = object()
+
+    def bump(self):
+        """
+        Move on to a new version
+        """
+        self.value = object()
+
+
 class Standoff(object):
     """
     A standoff object ultimately points to some piece of text.
     The pointing is not necessarily direct though
     """
+    # no instance dictionary here, so that slotted subclasses
+    # (eg. `educe.external.postag.Token`) can do without one;
+    # subclasses that do not declare slots get one as usual
+    __slots__ = ()
+
+    # edit counter of the document this belongs to (if any), and the
+    # terminals and text span we last computed with it
+    # (see `Document.bump_version`)
+    _version = None
+    _memo = None
+
     def __init__(self, origin=None):
         self.origin = origin
 
@@ -220,15 +534,46 @@ class Standoff(object):
         """
         For terminal annotations, this is just the annotation itself.
         For non-terminal annotations, this recursively fetches the
-        terminals
+        terminals (each one once, in depth-first order)
+
+        :param seen: ids of annotations already visited (and to skip)
+        :type seen: set(int)
         """
+        if seen is None and self._version is not None:
+            return list(self._memoized()[0])
         my_members = self._members()
-        seen = seen or []
         if my_members is None:
             return [self]
-        else:
-            return chain.from_iterable([m._terminals(seen + my_members)
-                                        for m in my_members if m not in seen])
+        seen = set() if seen is None else seen
+        seen.add(id(self))
+        terminals = []
+        stack = list(reversed(my_members))
+        while stack:
+            anno = stack.pop()
+            if id(anno) in seen:
+                continue
+            seen.add(id(anno))
+            members = anno._members()
+            if members is None:
+                terminals.append(anno)
+            else:
+                stack.extend(reversed(members))
+        return terminals
+
+    def _memoized(self):
+        """
+        Terminals and text span of this annotation, recomputed only if
+        its document has been modified since we last asked
+
+        :rtype: (tuple(Standoff), Span)
+        """
+        memo = self._memo
+        version = self._version.value
+        if memo is None or memo[0] is not version:
+            terminals = tuple(self._terminals(seen=set()))
+            memo = (version, terminals, _terminals_span(terminals))
+            self._memo = memo
+        return memo[1], memo[2]
 
     def text_span(self):
         """
@@ -238,13 +583,9 @@ class Standoff(object):
         Corner case: if this is an empty non-terminal (which would be a very
         weird thing indeed), return None
         """
-        terminals = list(self._terminals())
-        if len(terminals) > 0:
-            start = min(t.span.char_start for t in terminals)
-            end = max(t.span.char_end for t in terminals)
-            return Span(start, end)
-        else:
-            return None
+        if self._version is not None:
+            return self._memoized()[1]
+        return _terminals_span(self._terminals())
 
     def encloses(self, other):
         """
@@ -454,26 +795,167 @@ class Schema(Annotation):
             self.members.append(objects[i])
 
 
+def _interval_tree(entries):
+    """
+    Centered interval tree over `(start, end, position)` entries:
+    a node is `(center, here_by_start, here_by_end, left, right)`
+    where `here` are the entries whose interval contains the center,
+    `left` those entirely before it and `right` entirely after
+    """
+    if not entries:
+        return None
+    points = sorted(chain.from_iterable((e[0], e[1]) for e in entries))
+    center = points[len(points) // 2]
+    here = [e for e in entries if e[0] <= center <= e[1]]
+    if not here:  # only backwards spans; no point in splitting further
+        here, left, right = entries, [], []
+    else:
+        left = [e for e in entries if e[1] < center]
+        right = [e for e in entries if e[0] > center]
+    return (center,
+            sorted(here),
+            sorted(here, key=lambda e: e[1], reverse=True),
+            _interval_tree(left),
+            _interval_tree(right))
+
+
+def _stab(node, point):
+    """
+    Entries in an interval tree whose interval contains the point
+    """
+    found = []
+    while node is not None:
+        center, by_start, by_end, left, right = node
+        if point < center:
+            for entry in by_start:
+                if entry[0] > point:
+                    break
+                found.append(entry)
+            node = left
+        elif point > center:
+            for entry in by_end:
+                if entry[1] < point:
+                    break
+                found.append(entry)
+            node = right
+        else:
+            found.extend(by_start)
+            node = None
+    return found
+
+
+class SpanIndex(object):
+    """
+    Index of annotations by their text span, for finding those
+    that enclose, are enclosed by, or overlap some span without
+    scanning them all (an interval tree, and the annotations sorted
+    by starting point).
+
+    Queries return annotations in the order they were given to us,
+    and can be restricted to annotations of the given types.
+    You probably want to get this from `Document.span_index`
+    rather than building it yourself.
+
+    :param annos: annotations to index (those without a text span
+                  are left out)
+    """
+    def __init__(self, annos):
+        self._annos = []
+        self._spans = []
+        entries = []
+        for anno in annos:
+            span = anno.text_span()
+            if span is None:
+                continue
+            entries.append((span.char_start, span.char_end,
+                            len(self._annos)))
+            self._annos.append(anno)
+            self._spans.append(span)
+        entries.sort()
+        self._by_start = entries
+        self._starts = [e[0] for e in entries]
+        self._tree = _interval_tree(entries)
+
+    def __len__(self):
+        return len(self._annos)
+
+    def _select(self, entries, types):
+        """
+        Annotations for the given entries, in their original order,
+        restricted to the given types (if not None)
+        """
+        annos = [self._annos[i] for i in sorted(e[2] for e in entries)]
+        if types is None:
+            return annos
+        types = frozenset([types] if isinstance(types, six.string_types)
+                          else types)
+        return [x for x in annos if x.type in types]
+
+    def enclosing(self, span, types=None):
+        """
+        Annotations whose span encloses the given one
+        (see `Span.encloses`)
+
+        :param types: only return annotations of these types
+        :type types: iterable(string) or string
+        """
+        end = span.char_end
+        return self._select((e for e in _stab(self._tree, span.char_start)
+                             if e[1] >= end),
+                            types)
+
+    def enclosed_by(self, span, types=None):
+        """
+        Annotations whose span is enclosed by the given one
+
+        :param types: only return annotations of these types
+        :type types: iterable(string) or string
+        """
+        lo = bisect_left(self._starts, span.char_start)
+        hi = bisect_right(self._starts, span.char_end)
+        end = span.char_end
+        return self._select((e for e in self._by_start[lo:hi]
+                             if e[1] <= end),
+                            types)
+
+    def overlapping(self, span, types=None):
+        """
+        Annotations whose span overlaps the given one
+        (see `Span.overlaps`)
+
+        :param types: only return annotations of these types
+        :type types: iterable(string) or string
+        """
+        # those that started by the time the span did (and are still
+        # going), and those that start within it
+        candidates = _stab(self._tree, span.char_start)
+        lo = bisect_right(self._starts, span.char_start)
+        hi = bisect_right(self._starts, span.char_end)
+        candidates.extend(self._by_start[lo:hi])
+        return self._select((e for e in candidates
+                             if span.overlaps(self._spans[e[2]])),
+                            types)
+
+
 class Document(Standoff):
     """
     A single (sub)-document.
 
     This can be seen as collections of unit, relation, and schema annotations
     """
+    _span_index = None  # (version, SpanIndex)
+    _objects = None  # (version, dict)
+    _all_objects = None  # (version, dict to lists, see `all_by_id`)
+    _views = None  # (version, dict)
+    _shared = _IdentitySet()  # annotations shared with another doc
+
     def __init__(self, units, relations, schemas, text):
         Standoff.__init__(self, None)
 
         self.units = units
         self.relations = relations
         self.schemas = schemas
-        objects = {}
-
-        for i in self.units:
-            objects[i.local_id()] = i
-        for i in self.relations:
-            objects[i.local_id()] = i
-        for i in self.schemas:
-            objects[i.local_id()] = i
+        objects = self._mk_objects()
 
         for anno in self.relations:
             anno.fleshout(objects)
@@ -481,6 +963,230 @@ class Document(Standoff):
             anno.fleshout(objects)
 
         self._text = text
+        self._version = _Version()
+        self._share_version()
+        self._objects = (self._version.value, objects)
+
+    def _mk_objects(self):
+        """
+        Dictionary from local identifier to annotation
+        """
+        objects = {}
+        for anno in chain(self.units, self.relations, self.schemas):
+            objects[anno.local_id()] = anno
+        return objects
+
+    def _share_version(self):
+        """
+        Point our relations and schemas at our edit counter (leaving
+        alone the ones we share with the document we overlay, which
+        we do not modify)
+        """
+        shared = self._shared
+        for anno in chain(self.relations, self.schemas):
+            if anno not in shared:
+                anno._version = self._version
+
+    def bump_version(self):
+        """
+        Note that this document has been modified in place (annotations
+        added or removed, spans moved, relations or schemas pointed at
+        other annotations), so that the terminals and text spans
+        remembered for it and its relations and schemas get recomputed.
+
+        Code that edits documents (eg. the `stac-edit` commands) must
+        call this after doing so.
+        """
+        if self._version is None:
+            self._version = _Version()
+        self._version.bump()
+        self._share_version()
+
+    def overlay(self):
+        """
+        Copy-on-write copy of this document: a document of the same
+        type that shares the text and annotations of this one until
+        you `own` them, which makes it much cheaper than a
+        `copy.deepcopy` if you only mean to modify a few annotations.
+
+        The annotation lists themselves are not shared, so you can add
+        and remove annotations in the overlay freely. What you must
+        not do is modify a shared annotation in place (from either
+        document); ask the overlay to `own` it first
+        """
+        doc = copy.copy(self)
+        doc.units = list(self.units)
+        doc.relations = list(self.relations)
+        doc.schemas = list(self.schemas)
+        return doc
+
+    def __copy__(self):
+        # a shallow copy gets its own edit counter (and indices), and
+        # treats the annotations it shares with us as `overlay` does,
+        # so that bumping its version leaves ours alone
+        doc = self.__class__.__new__(self.__class__)
+        doc.__dict__.update(self.__getstate__())
+        doc.__dict__.pop('_memo', None)
+        doc._shared = self._shared.union(self.annotations())
+        doc._version = _Version()
+        return doc
+
+    def own(self, anno):
+        """
+        Version of an annotation in this document that you can safely
+        modify in place: the annotation itself, unless it is shared
+        with another document (see `overlay`), in which case we put a
+        shallow copy of it in its place and return that.
+
+        As for any other modification, call `bump_version` when you
+        are done
+
+        :rtype: Annotation
+        """
+        if anno not in self._shared:
+            return anno
+        if isinstance(anno, Relation):
+            annos = self.relations
+        elif isinstance(anno, Schema):
+            annos = self.schemas
+        else:
+            annos = self.units
+        mine = copy.copy(anno)
+        # nothing that either of us might modify in place is shared
+        mine.span = copy.copy(anno.span)
+        mine.features = copy.copy(anno.features)
+        mine.metadata = copy.copy(anno.metadata)
+        if isinstance(anno, Schema):
+            mine.units = copy.copy(anno.units)
+            mine.relations = copy.copy(anno.relations)
+            mine.schemas = copy.copy(anno.schemas)
+            mine.members = copy.copy(anno.members)
+        mine._memo = None
+        mine._version = self._version
+        annos[annos.index(anno)] = mine
+        return mine
+
+    def __getstate__(self):
+        # the indices are rebuilt on demand; no need to copy them around
+        state = self.__dict__.copy()
+        state.pop('_span_index', None)
+        state.pop('_objects', None)
+        state.pop('_all_objects', None)
+        state.pop('_views', None)
+        return state
+
+    def by_id(self, local_id):
+        """
+        The annotation in this document with the given local
+        identifier (see `Annotation.local_id`), or None if there
+        is none. Identifiers should be unique, but if not, relations
+        win over units, and schemas over both (as in `fleshout`).
+
+        This is a dictionary lookup, kept in step with the document
+        as long as you call `bump_version` after modifying it
+        (including renaming annotations)
+        """
+        version = self.version
+        if self._objects is None or self._objects[0] is not version:
+            self._objects = (version, self._mk_objects())
+        return self._objects[1].get(local_id)
+
+    def all_by_id(self, local_id):
+        """
+        All the annotations in this document with the given local
+        identifier, in the same order as `annotations`. There should
+        be at most one, but code that is about to modify the document
+        (eg. the `stac-edit` commands) should check rather than
+        rely on `by_id` picking one.
+
+        Like `by_id`, this is a dictionary lookup, kept in step with
+        the document by `bump_version`
+
+        :rtype: [Annotation]
+        """
+        version = self.version
+        if self._all_objects is None or\
+                self._all_objects[0] is not version:
+            objects = {}
+            for anno in self.annotations():
+                objects.setdefault(anno.local_id(), []).append(anno)
+            self._all_objects = (version, objects)
+        return list(self._all_objects[1].get(local_id, []))
+
+    @property
+    def span_index(self):
+        """
+        `SpanIndex` over the units of this document, built the first
+        time you ask for it, and again after `bump_version`
+        """
+        version = self.version
+        if self._span_index is None or self._span_index[0] is not version:
+            self._span_index = (version, SpanIndex(self.units))
+        return self._span_index[1]
+
+    def _current_views(self):
+        """
+        Dictionary of views (see `view` and `units_of_type`) for the
+        current version of this document
+        """
+        version = self.version
+        if self._views is None or self._views[0] is not version:
+            self._views = (version, {})
+        return self._views[1]
+
+    def view(self, pred):
+        """
+        Annotations in this document that satisfy the given predicate
+        (eg. `educe.stac.is_edu`), in the same order as `annotations`.
+
+        The selection is made the first time you ask for it, and again
+        after `bump_version`, so this is meant for predicates that only
+        look at the annotation itself and that you use over and over
+        (module-level functions rather than lambdas)
+
+        :rtype: [Annotation]
+        """
+        views = self._current_views()
+        if pred not in views:
+            views[pred] = [x for x in self.annotations() if pred(x)]
+        return list(views[pred])
+
+    def units_of_type(self, types):
+        """
+        Units in this document with the given type(s), sorted by span.
+        Like `view`, this is remembered until `bump_version`.
+
+        :param types: type, or types of units to return
+        :type types: iterable(string) or string
+
+        :rtype: [Unit]
+        """
+        views = self._current_views()
+        by_type = views.get('units by type')
+        if by_type is None:
+            by_type = {}
+            for unit in sorted(self.units, key=lambda x: x.span):
+                by_type.setdefault(unit.type, []).append(unit)
+            views['units by type'] = by_type
+        if isinstance(types, six.string_types):
+            return list(by_type.get(types, []))
+        types = frozenset(types)
+        if types not in views:
+            # (ties in document order, as for a single type)
+            wanted = [x for x in self.units if x.type in types]
+            views[types] = sorted(wanted, key=lambda x: x.span)
+        return list(views[types])
+
+    @property
+    def version(self):
+        """
+        Token which changes whenever `bump_version` is called (and
+        only then), so that you can tell if a document was modified
+        since you last looked at it. Compare tokens with `is`
+        """
+        if self._version is None:
+            self._version = _Version()
+        return self._version.value
 
     def annotations(self):
         """
@@ -0,0 +1,260 @@
+# Author: Eric Kow
+# License: BSD3
+
+"""
+Persistent on-disk cache of parsed corpus files
+
+Reading a corpus mostly amounts to parsing the same unchanged files
+over and over again. A `ParseCache` saves the result of parsing a
+file (or tuple of files, eg. a Glozz .aa/.ac pair) as a pickle, and
+hands it back the next time we are asked to read the same files,
+provided that none of them have been modified in the meantime.
+
+You normally would not use this directly, but via the `cache_dir`
+parameter to `educe.corpus.Reader`
+"""
+
+from __future__ import print_function
+from collections import OrderedDict
+import hashlib
+import os
+import tempfile
+
+from six.moves import cPickle as pickle
+
+CACHE_FORMAT_VERSION = 2
+"""
+Bump this whenever the in-memory representation of documents
+changes in a way that would make older cache entries unreadable
+(or worse, silently wrong)
+"""
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'educe')
+
+_SUFFIX = '.pickle'
+
+
+def _stamp(path):
+    """
+    What we take into account when deciding if a file has changed
+    """
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_mtime, stat.st_size)
+
+
+def _reader_name(read_file):
+    """
+    Fully qualified name of a reader function
+    """
+    return '%s.%s' % (read_file.__module__, read_file.__name__)
+
+
+class ParseCache(object):
+    """
+    Cache of parsed corpus files in a directory.
+
+    Each entry is a pickle of a small header (the format version,
+    the reader function, and the path, mtime and size of each input
+    file) followed by the parsed object itself. Entries are keyed
+    on the reader and the input paths, so an out of date entry is
+    simply overwritten the next time the files are read.
+
+    We can also hold on to anything else computed from the files
+    (see `fetch`), in which case the reader function is replaced
+    by some other name for the computation.
+
+    :param cache_dir: directory to store entries in (created
+                      if needed)
+    :type  cache_dir: string
+    """
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def _entry_path(self, name, paths):
+        """
+        Path to the entry for the given name/files combination
+        """
+        key = '\0'.join([str(CACHE_FORMAT_VERSION), name] +
+                        [os.path.abspath(p) for p in paths])
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest + _SUFFIX)
+
+    @staticmethod
+    def _header(name, paths):
+        """
+        Header we expect to see in a fresh cache entry
+        """
+        return (CACHE_FORMAT_VERSION,
+                name,
+                tuple(_stamp(p) for p in paths))
+
+    def read(self, read_file, paths):
+        """
+        Return `read_file(*paths)`, from the cache if we have a fresh
+        entry for it, or by actually reading the files (and saving
+        the result) otherwise
+        """
+        if not isinstance(paths, tuple):
+            paths = (paths,)
+        return self.fetch(_reader_name(read_file), paths,
+                          lambda: read_file(*paths))
+
+    def fetch(self, name, paths, compute):
+        """
+        Return `compute()`, from the cache if we have a fresh entry
+        for it, or by actually calling it (and saving the result)
+        otherwise.
+
+        This is `read` for things that we work out from files
+        rather than parse out of them (eg. graph snapshots, see
+        `educe.stac.graph.graph_snapshots`): the entry is only
+        good for as long as none of the files change.
+
+        :param name: what sort of thing we compute (entries with
+                     different names do not clash, even on the same
+                     files); eg. the fully qualified name of the
+                     function that does the work
+        :type  name: string
+
+        :param paths: the files the result depends on (None entries
+                      are ignored)
+        :type  paths: tuple of strings
+
+        :param compute: function with no arguments
+        """
+        return self.fetch_many(name, {None: paths},
+                               lambda _: {None: compute()})[None]
+
+    def fetch_many(self, name, paths, compute):
+        """
+        Like `fetch`, for several results at once, so that the ones
+        we have no fresh entries for can be worked out together (eg.
+        reading their files in a single `slurp`).
+
+        :param paths: dictionary from each key to the files its
+                      result depends on
+        :type  paths: dict
+
+        :param compute: function from a list of keys (those we need
+                        results for) to a dictionary from each of
+                        them to its result
+
+        :returns: dictionary from each key in `paths` to its result
+                  (in the same order)
+        """
+        results = {}
+        missing = []
+        for key, key_paths in paths.items():
+            real_paths = [p for p in key_paths if p is not None]
+            header = self._header(name, real_paths)
+            entry_path = self._entry_path(name, real_paths)
+            result = self._load(entry_path, header)
+            if result is None:
+                missing.append((key, entry_path, header))
+            else:
+                results[key] = result
+        if missing:
+            computed = compute([key for key, _, _ in missing])
+            for key, entry_path, header in missing:
+                results[key] = computed[key]
+                self._save(entry_path, header, computed[key])
+        return OrderedDict((k, results[k]) for k in paths)
+
+    @staticmethod
+    def _load(entry_path, header):
+        """
+        Return the contents of a cache entry if it exists and matches
+        the header we want (None otherwise)
+        """
+        if not os.path.exists(entry_path):
+            return None
+        try:
+            with open(entry_path, 'rb') as stream:
+                if pickle.load(stream) != header:
+                    return None
+                return pickle.load(stream)
+        except Exception:  # pylint: disable=broad-except
+            return None  # corrupt or incompatible entry: treat as stale
+
+    @staticmethod
+    def _save(entry_path, header, result):
+        """
+        Write a cache entry. We write to a temporary file first so
+        that concurrent readers never see a partial entry
+        """
+        entry_dir = os.path.dirname(entry_path)
+        if not os.path.exists(entry_dir):
+            try:
+                os.makedirs(entry_dir)
+            except OSError:  # somebody else made it first?
+                if not os.path.isdir(entry_dir):
+                    raise
+        fd, tmp_path = tempfile.mkstemp(dir=entry_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as stream:
+            pickle.dump(header, stream, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(result, stream, pickle.HIGHEST_PROTOCOL)
+        os.rename(tmp_path, entry_path)
+
+    def entries(self):
+        """
+        Paths to all the entries in the cache
+        """
+        if not os.path.isdir(self.cache_dir):
+            return []
+        return sorted(os.path.join(dname, f)
+                      for dname, _, fnames in os.walk(self.cache_dir)
+                      for f in fnames if f.endswith(_SUFFIX))
+
+    def stats(self):
+        """
+        Return a dictionary summarising the state of the cache:
+
+        * entries: number of entries
+        * stale: entries whose source files have changed (or gone
+          away), or which were written by another version of educe
+        * bytes: total size of the entries on disk
+        """
+        count = 0
+        stale = 0
+        size = 0
+        for entry_path in self.entries():
+            count += 1
+            size += os.path.getsize(entry_path)
+            if not self._is_fresh(entry_path):
+                stale += 1
+        return {'entries': count,
+                'stale': stale,
+                'bytes': size}
+
+    @staticmethod
+    def _is_fresh(entry_path):
+        """
+        True if the cache entry is still good (only reads the header)
+        """
+        try:
+            with open(entry_path, 'rb') as stream:
+                version, _, stamps = pickle.load(stream)
+        except Exception:  # pylint: disable=broad-except
+            return False
+        if version != CACHE_FORMAT_VERSION:
+            return False
+        for path, mtime, size in stamps:
+            try:
+                if _stamp(path) != (path, mtime, size):
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def clear(self, stale_only=False):
+        """
+        Delete entries from the cache (just the stale ones if
+        `stale_only`). Return the number of entries deleted
+        """
+        deleted = 0
+        for entry_path in self.entries():
+            if stale_only and self._is_fresh(entry_path):
+                continue
+            os.remove(entry_path)
+            deleted += 1
+        return deleted
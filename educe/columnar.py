@@ -0,0 +1,383 @@
+# Author: Eric Kow
+# License: BSD3
+
+"""
+Columnar representation of a corpus, for bulk analytics
+
+Corpus-wide statistics (how many EDUs of each dialogue act, how many
+relations per annotator, etc) only need a small part of what we
+normally read into memory: spans, types, a few features and the
+links between annotations. This module flattens a slurped corpus of
+`educe.annotation.Document` (eg. STAC) into a handful of numpy
+arrays ::
+
+    corpus = reader.slurp()
+    ccorpus = educe.columnar.from_corpus(corpus)
+    ccorpus.save('corpus.npz')
+
+    ccorpus = educe.columnar.load('corpus.npz')  # memory-mapped
+    print(ccorpus.count_types(kind=educe.columnar.KIND_RELATION))
+
+Each annotation in the corpus is a row in the annotation table. The
+rows for a document are contiguous, and follow the same order as
+`Document.annotations()` (units, then relations, then schemas).
+
+Arrays
+------
+Lists of strings are saved as string tables: a `NAME_data` array
+of UTF-8 bytes and a `NAME_offsets` array such that string `i` is
+`NAME_data[NAME_offsets[i]:NAME_offsets[i+1]]`. Use
+`ColumnarCorpus.strings` to get them back as a list.
+
+key_doc, key_subdoc, key_stage, key_annotator
+    (string tables, one per document) the components of the
+    document's `FileId` (None is saved as the empty string)
+doc_offsets
+    (one per document, plus one) annotation rows for document `i` are
+    `doc_offsets[i]:doc_offsets[i+1]`
+types
+    (string table) annotation type names; annotations refer to
+    them by index
+anno_doc, anno_kind, anno_type, anno_start, anno_end
+    (one per annotation) document index, kind (see `KIND_UNIT`, etc),
+    type index, and text span (-1 if the annotation has no span)
+rel_anno, rel_source, rel_target
+    (one per relation) annotation rows of the relation and its
+    endpoints (-1 if the endpoint is missing)
+schema_anno, schema_offsets, schema_members
+    (one per schema) annotation row of the schema; the rows of its
+    members are `schema_members[schema_offsets[i]:schema_offsets[i+1]]`
+feature_keys, feature_values, feat_anno, feat_key, feat_value
+    the features side table (`feature_keys` and `feature_values`
+    are string tables): one row per feature of each annotation,
+    with its key and value (indices into `feature_keys` and
+    `feature_values`; -1 if the value is None)
+"""
+
+from __future__ import print_function
+from collections import Counter
+import struct
+import zipfile
+
+import numpy as np
+
+from .corpus import FileId
+
+KIND_UNIT = 0
+KIND_RELATION = 1
+KIND_SCHEMA = 2
+
+_KEY_FIELDS = ['doc', 'subdoc', 'stage', 'annotator']
+
+_INDEX_DTYPE = np.int32
+
+# fixed part of a zip local file header (we need the variable part's
+# length to find out where the member data starts)
+_ZIP_LOCAL_HEADER = struct.Struct('<4s5H3L2H')
+
+
+class _Interner(object):
+    """
+    Assign consecutive integer ids to strings as we see them
+    """
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+
+    def __call__(self, name):
+        if name not in self.ids:
+            self.ids[name] = len(self.names)
+            self.names.append(name)
+        return self.ids[name]
+
+
+def _string_table(name, strings):
+    """
+    Arrays for a string table (see module documentation)
+
+    :rtype: dict(string, numpy.ndarray)
+    """
+    encoded = [(u'%s' % s).encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(x) for x in encoded])
+    data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    return {name + '_data': data,
+            name + '_offsets': offsets}
+
+
+def _span_of(anno):
+    """
+    (start, end) of an annotation, or (-1, -1) if it has none
+    """
+    try:
+        span = anno.text_span()
+    except (AttributeError, TypeError, ValueError):  # eg. dangling member
+        span = None
+    if span is None:
+        return -1, -1
+    return span.char_start, span.char_end
+
+
+def from_corpus(corpus):
+    """
+    Convert a corpus (dictionary from `FileId` to fleshed out
+    `educe.annotation.Document`) to its columnar representation.
+    Documents are laid out in sorted key order.
+
+    :rtype: ColumnarCorpus
+    """
+    types = _Interner()
+    fkeys = _Interner()
+    fvalues = _Interner()
+    keys = sorted(corpus)
+
+    doc_offsets = [0]
+    annos = ([], [], [], [], [])  # doc, kind, type, start, end
+    rels = ([], [], [])  # anno, source, target
+    schemas = ([], [0], [])  # anno, offsets, members
+    feats = ([], [], [])  # anno, key, value
+
+    for i, key in enumerate(keys):
+        doc = corpus[key]
+        base = doc_offsets[-1]
+        rows = {}
+        kinds = [(KIND_UNIT, doc.units),
+                 (KIND_RELATION, doc.relations),
+                 (KIND_SCHEMA, doc.schemas)]
+        for kind, doc_annos in kinds:
+            for anno in doc_annos:
+                row = base + len(rows)
+                rows[anno.local_id()] = row
+                start, end = _span_of(anno)
+                for column, val in zip(annos,
+                                       [i, kind, types(anno.type),
+                                        start, end]):
+                    column.append(val)
+                for fkey, fval in sorted((anno.features or {}).items()):
+                    feats[0].append(row)
+                    feats[1].append(fkeys(fkey))
+                    feats[2].append(-1 if fval is None else fvalues(fval))
+        for rel in doc.relations:
+            rels[0].append(rows[rel.local_id()])
+            rels[1].append(rows.get(rel.span.t1, -1))
+            rels[2].append(rows.get(rel.span.t2, -1))
+        for schema in doc.schemas:
+            members = sorted(rows[m] for m in schema.span if m in rows)
+            schemas[0].append(rows[schema.local_id()])
+            schemas[2].extend(members)
+            schemas[1].append(len(schemas[2]))
+        doc_offsets.append(base + len(rows))
+
+    def ints(vals, dtype=_INDEX_DTYPE):
+        "index array"
+        return np.array(vals, dtype=dtype)
+
+    arrays = {'doc_offsets': ints(doc_offsets),
+              'anno_doc': ints(annos[0]),
+              'anno_kind': ints(annos[1], dtype=np.int8),
+              'anno_type': ints(annos[2]),
+              'anno_start': ints(annos[3]),
+              'anno_end': ints(annos[4]),
+              'rel_anno': ints(rels[0]),
+              'rel_source': ints(rels[1]),
+              'rel_target': ints(rels[2]),
+              'schema_anno': ints(schemas[0]),
+              'schema_offsets': ints(schemas[1]),
+              'schema_members': ints(schemas[2]),
+              'feat_anno': ints(feats[0]),
+              'feat_key': ints(feats[1]),
+              'feat_value': ints(feats[2])}
+    arrays.update(_string_table('types', types.names))
+    arrays.update(_string_table('feature_keys', fkeys.names))
+    arrays.update(_string_table('feature_values', fvalues.names))
+    for field in _KEY_FIELDS:
+        arrays.update(_string_table('key_' + field,
+                                    [getattr(k, field) or ''
+                                     for k in keys]))
+    return ColumnarCorpus(arrays)
+
+
+class ColumnarCorpus(object):
+    """
+    Columnar view of a corpus (see module documentation for the
+    arrays it contains, which you can get at with `ccorpus['name']`).
+
+    You would normally get one of these from `from_corpus` or `load`
+
+    :param arrays: dictionary from array name to numpy array
+    :type  arrays: dict(string, numpy.ndarray)
+    """
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self._strings = {}
+        self._keys = None
+        self._type_ids = None
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def __len__(self):
+        return len(self.arrays['doc_offsets']) - 1
+
+    def strings(self, name):
+        """
+        Contents of a string table (eg. 'types'), as a list
+        """
+        if name not in self._strings:
+            data = self.arrays[name + '_data'].tobytes()
+            offsets = self.arrays[name + '_offsets'].tolist()
+            self._strings[name] = [data[start:end].decode('utf-8')
+                                   for start, end in zip(offsets,
+                                                         offsets[1:])]
+        return self._strings[name]
+
+    @property
+    def keys(self):
+        """
+        `FileId` for each document, in document index order
+        """
+        if self._keys is None:
+            columns = [[f or None for f in self.strings('key_' + field)]
+                       for field in _KEY_FIELDS]
+            self._keys = [FileId(*fields) for fields in zip(*columns)]
+        return self._keys
+
+    def rows(self, doc):
+        """
+        Annotation rows for the document with the given index
+
+        :rtype: slice
+        """
+        offsets = self.arrays['doc_offsets']
+        return slice(int(offsets[doc]), int(offsets[doc + 1]))
+
+    def type_ids(self, names):
+        """
+        Array of type ids for the given type names (names that do
+        not occur in the corpus are ignored)
+        """
+        if self._type_ids is None:
+            self._type_ids = dict((t, i) for i, t in
+                                  enumerate(self.strings('types')))
+        return np.array([self._type_ids[n] for n in names
+                         if n in self._type_ids], dtype=_INDEX_DTYPE)
+
+    def mask(self, kind=None, types=None, exclude=None):
+        """
+        Boolean array selecting the annotations of the given kind
+        (eg. `KIND_UNIT`), whose type is in `types` and not in
+        `exclude` (each of these is optional)
+        """
+        mask = np.ones(len(self.arrays['anno_kind']), dtype=bool)
+        if kind is not None:
+            mask &= self.arrays['anno_kind'] == kind
+        if types is not None:
+            mask &= np.isin(self.arrays['anno_type'], self.type_ids(types))
+        if exclude is not None:
+            mask &= ~np.isin(self.arrays['anno_type'],
+                             self.type_ids(exclude))
+        return mask
+
+    def feature(self, key):
+        """
+        Value of a feature for each annotation, as an array of indices
+        into `strings('feature_values')` (-1 if the annotation does not have the
+        feature or if its value is None)
+        """
+        column = np.full(len(self.arrays['anno_kind']), -1,
+                         dtype=_INDEX_DTYPE)
+        fkeys = self.strings('feature_keys')
+        if key in fkeys:
+            sel = self.arrays['feat_key'] == fkeys.index(key)
+            column[self.arrays['feat_anno'][sel]] =\
+                self.arrays['feat_value'][sel]
+        return column
+
+    def count_types(self, mask=None, kind=None):
+        """
+        Number of annotations of each type (optionally just those
+        selected by a boolean `mask` and/or of the given kind)
+
+        :rtype: Counter(string, int)
+        """
+        sel = self.mask(kind=kind)
+        if mask is not None:
+            sel &= mask
+        types = self.strings('types')
+        counts = np.bincount(self.arrays['anno_type'][sel],
+                             minlength=len(types))
+        return Counter(dict((types[i], int(counts[i]))
+                            for i in np.flatnonzero(counts)))
+
+    def save(self, path):
+        """
+        Save the arrays to a single (uncompressed) `.npz` file, which
+        `load` can memory-map
+        """
+        with open(path, 'wb') as stream:
+            np.savez(stream, **self.arrays)
+
+
+def is_columnar_file(path):
+    """
+    True if the path looks like a columnar corpus file (as opposed
+    to, say, a corpus directory)
+    """
+    return path is not None and zipfile.is_zipfile(path)
+
+
+def _memmap_member(stream, path, info):
+    """
+    Memory-map the array in an uncompressed npz member, or return
+    None if we can't (we then fall back to reading it)
+    """
+    if info.compress_type != zipfile.ZIP_STORED:
+        return None
+    stream.seek(info.header_offset)
+    header = _ZIP_LOCAL_HEADER.unpack(stream.read(_ZIP_LOCAL_HEADER.size))
+    name_len, extra_len = header[-2:]
+    stream.seek(info.header_offset + _ZIP_LOCAL_HEADER.size +
+                name_len + extra_len)
+    version = np.lib.format.read_magic(stream)
+    if version == (1, 0):
+        shape, fortran, dtype = np.lib.format.read_array_header_1_0(stream)
+    elif version == (2, 0):
+        shape, fortran, dtype = np.lib.format.read_array_header_2_0(stream)
+    else:
+        return None
+    if dtype.hasobject:
+        return None
+    if not all(shape):  # can't mmap zero bytes
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r',
+                     offset=stream.tell(),
+                     shape=shape,
+                     order='F' if fortran else 'C')
+
+
+def load(path, mmap=True):
+    """
+    Load a columnar corpus saved with `ColumnarCorpus.save`.
+
+    By default, the arrays are memory-mapped (read-only) rather than
+    read, so that opening even a large corpus is close to free, and
+    only the columns you actually touch are paged in.
+
+    :rtype: ColumnarCorpus
+    """
+    if not mmap:
+        with np.load(path) as npz:
+            return ColumnarCorpus(dict((k, npz[k]) for k in npz.files))
+    arrays = {}
+    with zipfile.ZipFile(path) as zfile:
+        with open(path, 'rb') as stream:
+            for info in zfile.infolist():
+                name = info.filename
+                if name.endswith('.npy'):
+                    name = name[:-len('.npy')]
+                arr = _memmap_member(stream, path, info)
+                if arr is None:
+                    with zfile.open(info) as member:
+                        arr = np.lib.format.read_array(member)
+                arrays[name] = arr
+    return ColumnarCorpus(arrays)
@@ -17,9 +17,26 @@ Corpus management
 # the above. Give us a mapping from FileId to filepaths and we
 # do the rest.
 
+from collections import OrderedDict
+from multiprocessing import Pool
+import hashlib
+import json
+import os
 import sys
+import tempfile
+import time
 
-class FileId:
+from educe.cache import ParseCache
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+_FILEID_FIELDS = frozenset(['doc', 'subdoc', 'stage', 'annotator'])
+
+
+class FileId(object):
     """
     Information needed to uniquely identify an annotation file.
 
@@ -48,12 +65,27 @@ class FileId:
         generated this annoation file
     :type annotator: string
     """
+    __slots__ = ('doc', 'subdoc', 'stage', 'annotator', '_key', '_hash')
+
     def __init__(self, doc, subdoc, stage, annotator):
        self.doc=doc
        self.subdoc=subdoc
        self.stage=stage
        self.annotator=annotator
 
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if name in _FILEID_FIELDS:
+            # field changed (eg. on a copy): tuple/hash are stale
+            object.__setattr__(self, '_key', None)
+
+    def __getstate__(self):
+        # not the cached hash: string hashes vary from process to process
+        return (self.doc, self.subdoc, self.stage, self.annotator)
+
+    def __setstate__(self, state):
+        FileId.__init__(self, *state)
+
     def __str__(self):
         return "%s [%s] %s %s" % (self.doc, self.subdoc, self.stage, self.annotator)
 
@@ -61,11 +93,21 @@ class FileId:
     def _tuple(self):
         """
         For internal use by __hash__, __eq__, etc
+
+        Corpus dictionaries hash their keys all the time, so we
+        compute the tuple (and its hash) once, until a field changes
         """
-        return (self.doc, self.subdoc, self.stage, self.annotator)
+        key = self._key
+        if key is None:
+            key = (self.doc, self.subdoc, self.stage, self.annotator)
+            object.__setattr__(self, '_key', key)
+            object.__setattr__(self, '_hash', hash(key))
+        return key
 
     def __hash__(self):
-        return hash(self._tuple())
+        if self._key is None:
+            self._tuple()
+        return self._hash
 
     def __eq__(self, other):
         return self._tuple() == other._tuple()
@@ -125,9 +167,14 @@ class Reader:
 
     This is an abstract class; you should use the version from a
     data-set, eg. `educe.stac.Reader` instead
+
+    :param cache_dir: if set, save parsed files in (and load them
+                      back from) this directory; see `educe.cache`
+    :type  cache_dir: string
     """
-    def __init__(self, dir):
+    def __init__(self, dir, cache_dir=None):
         self.rootdir=dir
+        self.cache = ParseCache(cache_dir) if cache_dir else None
 
     def files(self):
         """
@@ -139,7 +186,7 @@ class Reader:
         Derived classes
         """
 
-    def slurp(self, cfiles=None, verbose=False):
+    def slurp(self, cfiles=None, verbose=False, jobs=1):
         """
         Read the entire corpus if `cfiles` is `None` or else the
         subset specified by `cfiles`.
@@ -151,24 +198,341 @@ class Reader:
 
         :param verbose: print what we're reading to stderr
         :type  verbose: bool
+
+        :param jobs: number of processes to parse files with
+                     (1 to stay in this process, 0 or `None` for
+                     one per CPU)
+        :type  jobs: int
         """
         if cfiles is None:
             subcorpus=self.files()
         else:
             subcorpus=cfiles
-        return self.slurp_subcorpus(subcorpus, verbose)
+        return self.slurp_subcorpus(subcorpus, verbose, jobs=jobs)
 
-    def slurp_subcorpus(self, cfiles, verbose=False):
+    def open_lazy(self, cfiles=None, max_resident=None):
+        """
+        Like `slurp`, but rather than reading everything up front,
+        return a `LazyCorpus`: a mapping from FileId to document which
+        only reads a document when it is first looked up, and which
+        keeps at most `max_resident` documents in memory at a time.
+
+        :param cfiles: a dictionary like what `Corpus.files` would return
+        :type  cfiles: dict
+
+        :param max_resident: maximum number of (unpinned) documents
+                             to keep around (`None` for no limit)
+        :type  max_resident: int
+        """
+        if cfiles is None:
+            cfiles = self.files()
+        return LazyCorpus(self, cfiles, max_resident=max_resident)
+
+    def slurp_subcorpus(self, cfiles, verbose=False, jobs=1):
         """
         Derived classes should implement this function
+        (see `_slurp_with` for a helper)
         """
         return {}
 
+    def _slurp_with(self, read_file, cfiles, verbose=False, jobs=1,
+                    set_origin=True):
+        """
+        Helper for `slurp_subcorpus`: read each entry of `cfiles`
+        with `read_file`, possibly fanning the work out to a pool
+        of `jobs` processes.
+
+        The result has the same keys as `cfiles`, in the same order,
+        whether or not we read in parallel.
+
+        :param read_file: function taking the filepath(s) associated
+                          with a FileId (as positional arguments) and
+                          returning a document. It must be a module
+                          level function so that it can be pickled
+                          for the process pool
+        :type  read_file: function
+
+        :param set_origin: call `set_origin` on each document with
+                           its FileId
+        :type  set_origin: bool
+        """
+        keys = list(cfiles.keys())
+        tasks = [(read_file, cfiles[k], self.cache) for k in keys]
+        pool = None
+        if jobs == 1 or len(tasks) < 2:
+            results = (_read_one(t) for t in tasks)
+        else:
+            pool = Pool(processes=jobs or None)
+            results = pool.imap(_read_one, tasks)
+
+        corpus = {}
+        counter = 0
+        try:
+            for k, annotations in zip(keys, results):
+                if verbose:
+                    sys.stderr.write("\rSlurping corpus dir [%d/%d]" %
+                                     (counter, len(cfiles)))
+                if set_origin:
+                    annotations.set_origin(k)
+                corpus[k] = annotations
+                counter = counter+1
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        if verbose:
+            sys.stderr.write("\rSlurping corpus dir [%d/%d done]\n" %
+                             (counter, len(cfiles)))
+        return corpus
+
     def filter(self, d, pred):
         """
         Convenience function equivalent to ::
 
             { k:v for k,v in d.items() if pred(k) }
+
+        If `d` is a `LazyCorpus`, return a `LazyCorpus` on the
+        matching keys instead (reading nothing)
         """
+        if isinstance(d, LazyCorpus):
+            return d.restrict(pred)
         return dict([(k,v) for k,v in d.items() if pred(k)])
 
+
+class LazyCorpus(Mapping):
+    """
+    Read-only mapping from FileId to document (see `Reader.open_lazy`).
+
+    Documents are read (via the reader's `slurp_subcorpus`) the first
+    time they are looked up. Once more than `max_resident` of them
+    are in memory, the least recently used ones are dropped, to be
+    read again if they are needed later. Iterating over the keys,
+    `in`, and `len` never read anything.
+
+    Documents which you are modifying should be pinned (see `pin`),
+    lest they be evicted and your changes lost.
+
+    :param reader: the reader to read documents with
+    :type  reader: `Reader`
+
+    :param cfiles: a dictionary like what `Corpus.files` would return
+    :type  cfiles: dict
+
+    :param max_resident: maximum number of documents to keep around,
+                         pinned ones included (`None` for no limit).
+                         Pinned documents are never dropped, so
+                         pinning more than this goes over the limit
+    :type  max_resident: int
+    """
+    def __init__(self, reader, cfiles, max_resident=None):
+        if max_resident is not None and max_resident < 1:
+            raise ValueError("max_resident must be at least 1")
+        self.reader = reader
+        self.cfiles = cfiles
+        self.max_resident = max_resident
+        self._resident = OrderedDict()
+        self._pinned = set()
+
+    def __getitem__(self, key):
+        if key in self._resident:
+            doc = self._resident.pop(key)
+        elif key in self.cfiles:
+            doc = self.reader.slurp_subcorpus({key: self.cfiles[key]})[key]
+        else:
+            raise KeyError(key)
+        self._resident[key] = doc  # most recently used goes last
+        self._evict()
+        return doc
+
+    def __iter__(self):
+        return iter(self.cfiles)
+
+    def __len__(self):
+        return len(self.cfiles)
+
+    def __contains__(self, key):
+        return key in self.cfiles
+
+    def _evict(self):
+        """
+        Drop least recently used documents until we are within our
+        limit (or only have pinned documents left)
+        """
+        if self.max_resident is None:
+            return
+        excess = len(self._resident) - self.max_resident
+        if excess <= 0:
+            return
+        victims = [k for k in self._resident if k not in self._pinned]
+        for key in victims[:excess]:
+            del self._resident[key]
+
+    def resident(self):
+        """
+        Keys of the documents currently held in memory, from least
+        to most recently used
+        """
+        return list(self._resident.keys())
+
+    def pin(self, key):
+        """
+        Read the document for the given key (if needed), and keep
+        it in memory until it is `unpin`ned. Return the document
+        """
+        # pin first, so that reading it cannot evict it
+        self._pinned.add(key)
+        try:
+            return self[key]
+        except KeyError:
+            self._pinned.discard(key)
+            raise
+
+    def unpin(self, key):
+        """
+        Allow the document for the given key to be evicted again
+        """
+        self._pinned.discard(key)
+        self._evict()
+
+    def restrict(self, pred):
+        """
+        A `LazyCorpus` on only those keys satisfying `pred`.
+        Documents we already have in memory are shared with it
+        (but not pins)
+        """
+        cfiles = self.reader.filter(self.cfiles, pred)
+        sub = LazyCorpus(self.reader, cfiles, max_resident=self.max_resident)
+        for key, doc in self._resident.items():
+            if key in cfiles:
+                sub._resident[key] = doc
+        sub._evict()
+        return sub
+
+
+def _read_one(task):
+    """
+    Read a single corpus entry for `Reader._slurp_with`.
+    This lives at the module level so that the process pool
+    can pickle it.
+
+    :param task: reader function, the filepath (or tuple of
+                 filepaths) to apply it to, and the `ParseCache`
+                 to go through (if any)
+    """
+    read_file, paths, cache = task
+    if cache is not None:
+        return cache.read(read_file, paths)
+    elif isinstance(paths, tuple):
+        return read_file(*paths)
+    else:
+        return read_file(paths)
+
+
+class DirectoryIndex(object):
+    """
+    Persistent record of the directory listings we need to find the
+    files in a corpus, saved in the cache directory (see `educe.cache`)
+    under a name derived from the absolute path of the corpus root.
+
+    Each listing is stored along with the modification time of its
+    directory, so on later runs we only need to call `os.listdir`
+    on directories that have changed since (a directory's mtime
+    changes when entries are added, removed or renamed in it). This
+    matters on network filesystems, where listing a directory is
+    much more expensive than checking its mtime.
+
+    Directories modified in the last couple of seconds are rescanned
+    regardless, as their mtime may not yet reflect every change.
+
+    Without a cache directory, nothing is saved and every directory
+    is listed afresh.
+
+    :param rootdir: corpus root
+    :type  rootdir: string
+
+    :param cache_dir: where to save the index (None for nowhere)
+    :type  cache_dir: string
+
+    :param rescan: ignore any saved listings (but still save
+                   fresh ones)
+    :type  rescan: bool
+    """
+    INDEX_SUBDIR = 'index'
+    VERSION = 1
+    RACY_SECONDS = 2
+
+    def __init__(self, rootdir, cache_dir=None, rescan=False):
+        self.rootdir = rootdir
+        if cache_dir is None:
+            self.filename = None
+        else:
+            root = os.path.abspath(rootdir)
+            digest = hashlib.sha1(root.encode('utf-8')).hexdigest()
+            self.filename = os.path.join(cache_dir, self.INDEX_SUBDIR,
+                                         digest + '.json')
+        self._old = {} if rescan else self._load()
+        self._new = {}
+
+    def _load(self):
+        """
+        Saved listings (empty if there are none we can use)
+        """
+        if self.filename is None:
+            return {}
+        try:
+            with open(self.filename) as stream:
+                saved = json.load(stream)
+        except (IOError, OSError, ValueError):
+            return {}
+        if not isinstance(saved, dict) or saved.get('version') != self.VERSION:
+            return {}
+        if saved.get('root') != os.path.abspath(self.rootdir):
+            return {}
+        return saved.get('listings', {})
+
+    def listdir(self, path):
+        """
+        Names of the entries in a directory, like `os.listdir`, or
+        None if the path is not a directory
+        """
+        key = os.path.relpath(path, self.rootdir)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return None
+        saved = self._old.get(key)
+        if saved is not None and saved[0] == mtime:
+            self._new[key] = saved
+            return saved[1]
+        try:
+            names = os.listdir(path)
+        except OSError:
+            names = None
+        if time.time() - mtime < self.RACY_SECONDS:
+            mtime = None
+        self._new[key] = [mtime, names]
+        return names
+
+    def save(self):
+        """
+        Write the listings we used this time round back to the index
+        file (if we have somewhere to put it, and can write there)
+        """
+        if self.filename is None or self._new == self._old:
+            return
+        contents = {'version': self.VERSION,
+                    'root': os.path.abspath(self.rootdir),
+                    'listings': self._new}
+        index_dir = os.path.dirname(self.filename)
+        try:
+            if not os.path.isdir(index_dir):
+                os.makedirs(index_dir)
+            fd, tmp_path = tempfile.mkstemp(dir=index_dir, suffix='.tmp')
+        except (IOError, OSError):
+            return
+        try:
+            with os.fdopen(fd, 'w') as stream:
+                json.dump(contents, stream)
+            os.rename(tmp_path, self.filename)
+        except (IOError, OSError):
+            os.remove(tmp_path)
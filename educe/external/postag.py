@@ -23,7 +23,8 @@ from itertools import islice
 import codecs
 
 from educe.annotation import Span, Standoff
-from educe.internalutil import ifilterfalse
+from educe.internalutil import (ifilterfalse,
+                                get_slots_state, set_slots_state)
 
 # I don't yet see how "too few public methods" is helpful
 # pylint: disable=R0903
@@ -46,10 +47,15 @@ class RawToken(object):
     """
     A token with a part of speech tag associated with it
     """
+    __slots__ = ('word', 'tag')
+
     def __init__(self, word, tag):
         self.word = word
         self.tag = tag
 
+    __getstate__ = get_slots_state
+    __setstate__ = set_slots_state
+
     def __str__(self):
         return self.word + "/" + self.tag
 
@@ -62,6 +68,8 @@ class Token(RawToken, Standoff):
     A token with a part of speech tag and some character offsets
     associated with it.
     """
+    __slots__ = ('origin', 'span')
+
     def __init__(self, tok, span):
         RawToken.__init__(self, tok.word, tok.tag)
         Standoff.__init__(self)
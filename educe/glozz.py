@@ -10,20 +10,26 @@ You're likely most interested in
 """
 
 from __future__ import print_function
-from xml.dom import minidom
 import codecs
 import xml.etree.ElementTree as ET
 import sys
 
 from educe.annotation import *
-from educe.internalutil import on_single_element, linebreak_xml
+from educe.internalutil import (on_single_element, linebreak_xml,
+                                intern_string, EduceXmlException)
 
 
 if sys.version > '3':
     long = int
 
 
-_MINIDOM_ZERO = len(minidom.Document().toxml(encoding='utf-8')) + 1
+_INTERN_MAX_LENGTH = 64
+"""
+Feature and metadata values up to this length are interned as
+we read them (longer ones are likely to be free text, and unique)
+"""
+
+
 _GLOZZ_DECL = '<?xml version="1.0" encoding="UTF-8" standalone="no"?>'
 
 class GlozzOutputSettings:
@@ -149,7 +155,7 @@ def read_node(node, context=None):
 
     if node.tag == 'annotations':
         hashcode = get_one('metadata', '', 'annotations')
-        if hashcode is '':
+        if hashcode == '':
             hashcode = None
         units    = get_all('unit')
         rels     = get_all('relation')
@@ -228,52 +234,355 @@ def read_node(node, context=None):
         return Unit(unit_id, span, unit_type, fs, metadata=metadata)
 
 
+# ---------------------------------------------------------------------
+# streaming reader
+#
+# This does the same job as read_node, but in a single pass over the
+# file with `ET.iterparse`, building each unit/relation/schema as soon
+# as we have seen the end of its element, and then throwing the
+# element away
+# ---------------------------------------------------------------------
+
+def _only_children(node, tags):
+    """
+    Dictionary from tag to the child of the node with that tag (for
+    each of the given tags we find). Like `on_single_element`, we
+    complain if there is more than one such child
+    """
+    found = {}
+    for child in node:
+        tag = child.tag
+        if tag in tags:
+            if tag in found:
+                raise EduceXmlException("Found more than one node "
+                                        "with name %s" % tag)
+            found[tag] = child
+    return found
+
+
+def _required(found, tag):
+    """
+    The element for tag in the results of `_only_children`,
+    complaining if it is missing
+    """
+    node = found.get(tag)
+    if node is None:
+        raise EduceXmlException("Expected but did not find any nodes "
+                                "with name %s" % tag)
+    return node
+
+
+def _read_characterisation(node):
+    """
+    (type, features) from a characterisation element
+    """
+    found = _only_children(node, ('featureSet', 'type'))
+    fs_node = found.get('featureSet')
+    features = {}
+    if fs_node is not None:
+        for feat in fs_node:
+            if feat.tag == 'feature':
+                text = feat.text
+                value = text.strip() if text else None
+                features[intern_string(feat.attrib['name'])] =\
+                    intern_string(value, _INTERN_MAX_LENGTH)
+    anno_type = intern_string(_required(found, 'type').text.strip())
+    return anno_type, features
+
+
+def _read_metadata(node):
+    """
+    Metadata dictionary from a (per-annotation) metadata element
+    """
+    if node is None:
+        return {}
+    return dict((intern_string(t.tag),
+                 intern_string(t.text.strip(), _INTERN_MAX_LENGTH))
+                for t in node)
+
+
+def _read_single_position(node):
+    """
+    Offset from a start or end element
+    """
+    found = _only_children(node, ('singlePosition',))
+    return int(_required(found, 'singlePosition').attrib['index'])
+
+
+def _read_annotation_parts(node):
+    """
+    Id, type, features, positioning element and metadata common to
+    all annotations
+    """
+    found = _only_children(node, ('characterisation', 'positioning',
+                                  'metadata'))
+    anno_type, features = \
+        _read_characterisation(_required(found, 'characterisation'))
+    positioning = _required(found, 'positioning')
+    metadata = _read_metadata(found.get('metadata'))
+    return node.attrib['id'], anno_type, features, positioning, metadata
+
+
+def _read_unit(node):
+    "Unit from a unit element"
+    unit_id, unit_type, features, positioning, metadata =\
+        _read_annotation_parts(node)
+    found = _only_children(positioning, ('start', 'end'))
+    span = Span(_read_single_position(_required(found, 'start')),
+                _read_single_position(_required(found, 'end')))
+    return Unit(unit_id, span, unit_type, features, metadata=metadata)
+
+
+def _read_relation(node):
+    "Relation from a relation element"
+    rel_id, rel_type, features, positioning, metadata =\
+        _read_annotation_parts(node)
+    terms = [t.attrib['id'] for t in positioning if t.tag == 'term']
+    if len(terms) != 2:
+        raise GlozzException("Was expecting exactly 2 terms, "
+                             "but got %d" % len(terms))
+    span = RelSpan(terms[0], terms[1])
+    return Relation(rel_id, span, rel_type, features, metadata=metadata)
+
+
+def _read_schema(node):
+    "Schema from a schema element"
+    anno_id, anno_type, features, positioning, metadata =\
+        _read_annotation_parts(node)
+    members = {'embedded-unit': [],
+               'embedded-relation': [],
+               'embedded-schema': []}
+    for child in positioning:
+        if child.tag in members:
+            members[child.tag].append(child.attrib['id'])
+    return Schema(anno_id,
+                  frozenset(members['embedded-unit']),
+                  frozenset(members['embedded-relation']),
+                  frozenset(members['embedded-schema']),
+                  anno_type, features, metadata=metadata)
+
+
+def iter_read_annotations(source):
+    """
+    Read the contents of a Glozz annotation file in one streaming
+    pass, returning the same `(hashcode, units, relations, schemas)`
+    tuple that `read_node` would on the parsed document.
+
+    :param source: filename or file object
+    """
+    hashcode = None
+    seen_hashcode = False
+    units = []
+    rels = []
+    schemas = []
+    root = None
+    depth = 0
+    for event, elem in ET.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = elem
+                if root.tag != 'annotations':
+                    raise GlozzException("Was expecting an annotations "
+                                         "element, but got %s" % root.tag)
+            depth += 1
+            continue
+        depth -= 1
+        if depth != 1:
+            continue
+        # an immediate child of annotations (we have all of it)
+        tag = elem.tag
+        if tag == 'unit':
+            units.append(_read_unit(elem))
+        elif tag == 'relation':
+            rels.append(_read_relation(elem))
+        elif tag == 'schema':
+            schemas.append(_read_schema(elem))
+        elif tag == 'metadata':
+            if seen_hashcode:
+                raise EduceXmlException("Found more than one node "
+                                        "with name metadata")
+            seen_hashcode = True
+            hashcode = elem.attrib['corpusHashcode'] or None
+        root.clear()
+    return (hashcode, units, rels, schemas)
+
+
 def read_annotation_file(anno_filename, text_filename=None):
     """
     Read a single glozz annotation file and its corresponding text
     (if any).
     """
-    tree = ET.parse(anno_filename)
-    (hashcode, units, rels, schemas) = read_node(tree.getroot())
+    (hashcode, units, rels, schemas) = iter_read_annotations(anno_filename)
     text = None
     if text_filename is not None:
         with codecs.open(text_filename, 'r', 'utf-8') as tf:
             text = tf.read()
     return GlozzDocument(hashcode, units, rels, schemas, text)
 
+_HASHCODE_MODULUS = long(99999999)
+_HASHCODE_BLOCK_SIZE = 1 << 20
+
+
 def hashcode(f):
     """
     Hashcode mechanism as documented in the Glozz manual appendix.
     Hint, using cStringIO to get the hashcode for a string
 
+    The hashcode is the length of the file, and the product of all
+    its bytes modulo 99999999. Multiplication being commutative, we
+    need not walk the bytes in order: for each block we read, we just
+    count how many times each distinct byte occurs, and then raise
+    each byte to its count (modulo 99999999) at the end.
+
     :type  s: file (object)
     """
-    code = long(1)
+    counts = {}
     length = 0
-    byte = f.read(1)
-    while byte:
-        length += 1
-        if byte and byte != 0:
-            code *= ord(byte)
-            code =  code % long(99999999)
-        byte = f.read(1)
+    block = f.read(_HASHCODE_BLOCK_SIZE)
+    while block:
+        length += len(block)
+        for unit in set(block):
+            counts[unit] = counts.get(unit, 0) + block.count(unit)
+        block = f.read(_HASHCODE_BLOCK_SIZE)
+    code = long(1)
+    for unit, count in counts.items():
+        # bytes yield ints on Python 3; str/unicode yield characters
+        value = unit if isinstance(unit, int) else ord(unit)
+        code = code * pow(value, count, _HASHCODE_MODULUS)
+        code = code % _HASHCODE_MODULUS
     return str(length) + '-' + str(code)
 
+
+def read_hashcode(anno_filename):
+    """
+    Corpus hashcode recorded in a Glozz annotation file (None if there
+    isn't one). This only reads as far as the hashcode itself, which
+    comes before any annotations
+    """
+    depth = 0
+    for event, elem in ET.iterparse(anno_filename, events=('start', 'end')):
+        if event == 'start':
+            depth += 1
+            if depth == 2 and elem.tag != 'metadata':
+                return None  # annotations start: no hashcode
+        else:
+            depth -= 1
+            if depth == 1 and elem.tag == 'metadata':
+                return elem.attrib['corpusHashcode'] or None
+    return None
+
+# ---------------------------------------------------------------------
+# streaming writer
+#
+# We used to build an ElementTree, serialise it, reparse it with
+# minidom and pretty print that, because minidom's output layout is
+# the closest to Glozz's own (one element per line, no indentation,
+# text-only elements on a single line). We now write that layout
+# directly, reproducing the round trip's quirks along the way so
+# that rewritten files stay byte-for-byte the same
+# ---------------------------------------------------------------------
+
+def _escape_xml(data):
+    """
+    Escape character data (or attribute values) as minidom does
+    """
+    return data.replace("&", "&amp;").replace("<", "&lt;").\
+        replace("\"", "&quot;").replace(">", "&gt;")
+
+
+def _xml_leaf(tag, text=None, attrs=()):
+    """
+    A single line XML element with (optionally) some text and no
+    child elements.
+
+    Newlines in the text are dropped (and stray carriage returns turn
+    into newlines), as they were in the minidom round trip
+    """
+    attr_str = ''.join(' %s="%s"' % (k, _escape_xml(v)) for k, v in attrs)
+    if text:
+        text = text.replace('\n', '').replace('\r', '\n')
+    if text:
+        return '<%s%s>%s</%s>\n' % (tag, attr_str, _escape_xml(text), tag)
+    else:
+        return '<%s%s/>\n' % (tag, attr_str)
+
+
+def _xml_node(tag, children, attrs=()):
+    """
+    An XML element with the given (already serialised) child elements
+    """
+    if not children:
+        return _xml_leaf(tag, attrs=attrs)
+    attr_str = ''.join(' %s="%s"' % (k, _escape_xml(v)) for k, v in attrs)
+    return '<%s%s>\n%s</%s>\n' % (tag, attr_str, ''.join(children), tag)
+
+
+def _glozz_positioning_xml(anno, tag):
+    """
+    Serialised positioning element for an annotation
+    """
+    if tag == 'unit':
+        start = _xml_node('start', [_xml_leaf('singlePosition', attrs=[
+            ('index', str(anno.span.char_start))])])
+        end = _xml_node('end', [_xml_leaf('singlePosition', attrs=[
+            ('index', str(anno.span.char_end))])])
+        children = [start, end]
+    elif tag == 'relation':
+        children = [_xml_leaf('term', attrs=[('id', str(anno.span.t1))]),
+                    _xml_leaf('term', attrs=[('id', str(anno.span.t2))])]
+    elif tag == 'schema':
+        children = \
+            [_xml_leaf('embedded-unit', attrs=[('id', str(x))])
+             for x in sorted(anno.units)] +\
+            [_xml_leaf('embedded-relation', attrs=[('id', str(x))])
+             for x in sorted(anno.relations)] +\
+            [_xml_leaf('embedded-schema', attrs=[('id', str(x))])
+             for x in sorted(anno.schemas)]
+    else:
+        raise Exception("Don't know how to emit XML for non "
+                        "unit/relation annotations (%s)" % tag)
+    return _xml_node('positioning', children)
+
+
+def _glozz_annotation_xml(anno, tag, settings):
+    """
+    Serialised XML for a single annotation (see
+    `glozz_annotation_to_xml`)
+    """
+    metadata = anno.metadata
+    features = anno.features
+    meta = _xml_node('metadata',
+                     [_xml_leaf(k, metadata[k])
+                      for k in ordered_keys(settings.md_order, metadata)])
+    fset = _xml_node('featureSet',
+                     [_xml_leaf('feature', features[k], [('name', k)])
+                      for k in ordered_keys(settings.fs_order, features)])
+    char = _xml_node('characterisation',
+                     [_xml_leaf('type', anno.type), fset])
+    return _xml_node(tag,
+                     [meta, char, _glozz_positioning_xml(anno, tag)],
+                     attrs=[('id', anno.local_id())])
+
+
 def write_annotation_file(anno_filename, doc, settings=default_output_settings):
     """
     Write a GlozzDocument to XML in the given path
     """
-
-    elem = doc.to_xml(settings=settings)
-    string1 = ET.tostring(elem, 'utf-8')
-    # contortion 1: write, then read and print from minidom to match
-    # whitespace on closing tags (we're trying to match glozz output
-    # as much as possible so as to avoid introducing spurious
-    # differences when automatically rewriting glozz data files)
-    reparsed = minidom.parseString(string1.replace('\n', ''))
-    string2 = reparsed.toprettyxml(indent="", encoding='utf-8')
-    # contortion 2: chop off XML declaration and use one which more
-    # closely matches Glozz
-    with codecs.open(anno_filename, 'wb', 'utf-8') as fout:
-        print(_GLOZZ_DECL, file=fout)
-        fout.write(string2[_MINIDOM_ZERO:])
+    with open(anno_filename, 'wb') as fout:
+        def write(string):
+            "write a chunk"
+            fout.write(string.encode('utf-8'))
+        write(_GLOZZ_DECL + '\n')
+        if doc.hashcode is None and not doc.annotations():
+            write(_xml_leaf('annotations'))
+            return
+        write('<annotations>\n')
+        if doc.hashcode is not None:
+            write(_xml_leaf('metadata', attrs=[('corpusHashcode',
+                                                doc.hashcode)]))
+        for tag, annos in [('unit', doc.units),
+                           ('relation', doc.relations),
+                           ('schema', doc.schemas)]:
+            for anno in annos:
+                write(_glozz_annotation_xml(anno, tag, settings))
+        write('</annotations>\n')
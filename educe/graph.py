@@ -14,6 +14,9 @@ Classes of interest:
   You probably want a project-specific variant to get more
   helpful graphs, see eg. `educe.stac.Graph.DotGraph`
 
+* GraphSnapshot: picklable version of a `Graph`, to save
+  and load back instead of building the graph again
+
 .. _hypergraphs:
 
 Educe hypergraphs
@@ -95,14 +98,15 @@ Classes
 """
 
 from __future__ import print_function
-import copy
+import bisect
 import collections
 import textwrap
 
 import pydot
-import pygraph.classes.hypergraph as gr
 import pygraph.classes.digraph    as dgr
-from pygraph.algorithms import accessibility
+
+from educe.annotation import (Document, Unit, Relation, Schema,
+                              Span, RelSpan)
 
 # pylint: disable=too-few-public-methods, star-args
 
@@ -193,7 +197,287 @@ class AttrsMixin():
         else:
             return self.mirror(x)
 
-class Graph(gr.hypergraph, AttrsMixin):
+class Hypergraph(object):
+    """
+    Hypergraph with adjacency held in dictionaries: for each node, the
+    hyperedges it is linked to; for each hyperedge, the nodes it links
+    (in the order they were linked, as we use this to tell the source
+    of a relation from its target). Each node and hyperedge also has a
+    dictionary of attributes.
+
+    The dictionaries are `OrderedDict`s, so that nodes, hyperedges,
+    links and attributes come back in the order they were added,
+    whatever the Python version.
+
+    This mirrors the part of the python-graph `hypergraph` API that
+    educe uses (including the `(key, value)` pairs interface to
+    attributes), so it can stand in for it.
+
+    We also count the changes made to the graph, so that subclasses
+    can tell when to throw away anything they worked out from it
+    (see `Graph._cdu_tree`)
+    """
+    def __init__(self):
+        # node -> {hyperedge: None} (ordered set)
+        self._node_links = collections.OrderedDict()
+        # hyperedge -> [node]
+        self._edge_links = collections.OrderedDict()
+        # node/hyperedge -> {key: value}
+        self._node_attrs = collections.OrderedDict()
+        self._edge_attrs = collections.OrderedDict()
+        self._edits = 0  # number of changes so far
+
+    def __iter__(self):
+        return iter(self._node_links)
+
+    def __len__(self):
+        return len(self._node_links)
+
+    def __getitem__(self, node):
+        return self.neighbors(node)
+
+    def order(self):
+        """
+        Number of nodes in the graph
+        """
+        return len(self._node_links)
+
+    def nodes(self):
+        """
+        List of nodes in the graph
+        """
+        return list(self._node_links)
+
+    def hyperedges(self):
+        """
+        List of hyperedges in the graph
+        """
+        return list(self._edge_links)
+
+    def edges(self):
+        """
+        List of hyperedges in the graph (same as `hyperedges`)
+        """
+        return list(self._edge_links)
+
+    def has_node(self, node):
+        """
+        True if the graph has this node
+        """
+        return node in self._node_links
+
+    def has_hyperedge(self, hyperedge):
+        """
+        True if the graph has this hyperedge
+        """
+        return hyperedge in self._edge_links
+
+    def has_edge(self, hyperedge):
+        """
+        True if the graph has this hyperedge (same as `has_hyperedge`)
+        """
+        return hyperedge in self._edge_links
+
+    def add_node(self, node):
+        """
+        Add a node to the graph (it must not already be there)
+        """
+        if node in self._node_links:
+            raise ValueError("Node %s already in graph" % node)
+        self._node_links[node] = collections.OrderedDict()
+        self._node_attrs[node] = collections.OrderedDict()
+        self._edits += 1
+
+    def add_nodes(self, nodes):
+        """
+        Add each of the given nodes to the graph
+        """
+        for node in nodes:
+            self.add_node(node)
+
+    def add_hyperedge(self, hyperedge):
+        """
+        Add a hyperedge to the graph (or do nothing if it is already
+        there)
+        """
+        if hyperedge not in self._edge_links:
+            self._edge_links[hyperedge] = []
+            self._edge_attrs[hyperedge] = collections.OrderedDict()
+            self._edits += 1
+
+    def add_edge(self, hyperedge):
+        """
+        Add a hyperedge to the graph (same as `add_hyperedge`)
+        """
+        self.add_hyperedge(hyperedge)
+
+    def del_node(self, node):
+        """
+        Delete a node, and its links, from the graph
+        """
+        if node in self._node_links:
+            for edge in self._node_links.pop(node):
+                self._edge_links[edge].remove(node)
+            del self._node_attrs[node]
+            self._edits += 1
+
+    def del_hyperedge(self, hyperedge):
+        """
+        Delete a hyperedge, and its links, from the graph
+        """
+        if hyperedge in self._edge_links:
+            for node in self._edge_links.pop(hyperedge):
+                del self._node_links[node][hyperedge]
+            del self._edge_attrs[hyperedge]
+            self._edits += 1
+
+    def del_edge(self, hyperedge):
+        """
+        Delete a hyperedge (same as `del_hyperedge`)
+        """
+        self.del_hyperedge(hyperedge)
+
+    def link(self, node, hyperedge):
+        """
+        Link a node to a hyperedge
+        """
+        edges = self._node_links[node]
+        if hyperedge in edges:
+            raise ValueError("Link (%s, %s) already in graph" %
+                             (node, hyperedge))
+        edges[hyperedge] = None
+        self._edge_links[hyperedge].append(node)
+        self._edits += 1
+
+    def unlink(self, node, hyperedge):
+        """
+        Remove the link between a node and a hyperedge
+        """
+        del self._node_links[node][hyperedge]
+        self._edge_links[hyperedge].remove(node)
+        self._edits += 1
+
+    def has_link(self, node, hyperedge):
+        """
+        True if the node is linked to the hyperedge
+        """
+        return hyperedge in self._node_links.get(node, ())
+
+    def links(self, obj):
+        """
+        Nodes linked by a hyperedge (in the order they were linked),
+        or hyperedges linked to a node.
+
+        If an object is both a node and a hyperedge, we take it to
+        be a hyperedge
+        """
+        if obj in self._edge_links:
+            return self._edge_links[obj]
+        else:
+            return list(self._node_links[obj])
+
+    def neighbors(self, node):
+        """
+        Nodes that share a hyperedge with this one
+        """
+        res = set()
+        for edge in self._node_links[node]:
+            res.update(self._edge_links[edge])
+        res.discard(node)
+        return list(res)
+
+    def node_attributes(self, node):
+        """
+        Attributes of a node, as a list of `(key, value)` pairs
+        """
+        return list(self._node_attrs[node].items())
+
+    def edge_attributes(self, hyperedge):
+        """
+        Attributes of a hyperedge, as a list of `(key, value)` pairs
+        """
+        return list(self._edge_attrs[hyperedge].items())
+
+    def add_node_attribute(self, node, attr):
+        """
+        Set a node attribute from a `(key, value)` pair
+        """
+        key, value = attr
+        self._node_attrs[node][key] = value
+        self._edits += 1
+
+    def add_node_attributes(self, node, attrs):
+        """
+        Set node attributes from `(key, value)` pairs
+        """
+        self._node_attrs[node].update(attrs)
+        self._edits += 1
+
+    def add_edge_attribute(self, hyperedge, attr):
+        """
+        Set a hyperedge attribute from a `(key, value)` pair
+        """
+        key, value = attr
+        self._edge_attrs[hyperedge][key] = value
+        self._edits += 1
+
+    def add_edge_attributes(self, hyperedge, attrs):
+        """
+        Set hyperedge attributes from `(key, value)` pairs
+        """
+        self._edge_attrs[hyperedge].update(attrs)
+        self._edits += 1
+
+
+class _CduTree(object):
+    """
+    How the CDUs in a graph nest: the CDU (hyperedge) that immediately
+    contains each node, if any, and the deep members of each CDU
+    (worked out the first time we are asked for them).
+
+    This is only good for as long as the graph is left alone, so you
+    want to get it from `Graph._cdu_tree`, which builds a new one
+    when the graph changes. Subclasses can also `memo` anything else
+    they work out about CDUs (eg. their heads) in it, to be thrown
+    away at the same time.
+    """
+    def __init__(self, graph):
+        self.graph = graph
+        cdus = frozenset(e for e in graph.hyperedges() if graph.is_cdu(e))
+        self.parent = {}  # node -> CDU hyperedge
+        # (not `links`, which would give us the links of an edge
+        # if it had the same name as the node)
+        # pylint: disable=protected-access
+        for node, edges in graph._node_links.items():
+            for edge in edges:
+                if edge in cdus:
+                    self.parent[node] = edge
+                    break
+        self.memo = {}
+        self._deep = {}  # CDU hyperedge -> frozenset of nodes
+
+    def deep_members(self, cdu):
+        """
+        Members of a CDU, of the CDUs among them, and so forth
+        (see `Graph.cdu_members`)
+
+        :param cdu: CDU hyperedge
+        """
+        if cdu in self._deep:
+            return self._deep[cdu]
+        graph = self.graph
+        # (in case of cycles)
+        self._deep[cdu] = frozenset()
+        members = set()
+        for mem in graph.links(cdu):
+            members.add(mem)
+            if graph.is_cdu(mem):
+                members.update(self.deep_members(graph.edgeform(mem)))
+        self._deep[cdu] = frozenset(members)
+        return self._deep[cdu]
+
+
+class Graph(Hypergraph, AttrsMixin):
     """
     Hypergraph representation of discourse structure.
     See the section on Educe hypergraphs_
@@ -223,9 +507,13 @@ class Graph(gr.hypergraph, AttrsMixin):
 
     """
 
+    # CDU nesting as of some number of edits to the graph
+    # (edits, _CduTree), see `_cdu_tree`
+    _cdu_memo = None
+
     def __init__(self):
         AttrsMixin.__init__(self)
-        gr.hypergraph.__init__(self)
+        Hypergraph.__init__(self)
 
     @classmethod
     def from_doc(cls, corpus, doc_key,
@@ -260,15 +548,14 @@ class Graph(gr.hypergraph, AttrsMixin):
         grph.doc = doc
 
         # objects that are pointed to by a relations or schemas
-        included = []
-        included.extend(x.local_id() for x in doc.units
-                        if could_include(x))
+        included = set(x.local_id() for x in doc.units
+                       if could_include(x))
         for anno in doc.relations:
             if pred(anno):
-                included.extend([anno.span.t1, anno.span.t2])
+                included.update([anno.span.t1, anno.span.t2])
         for anno in doc.schemas:
             if pred(anno):
-                included.extend(anno.span)
+                included.update(anno.span)
 
         nodes = []
         edges = []
@@ -286,8 +573,7 @@ class Graph(gr.hypergraph, AttrsMixin):
         for node, attrs in nodes:
             if not grph.has_node(node):
                 grph.add_node(node)
-                for anno in attrs.items():
-                    grph.add_node_attribute(node, anno)
+                grph.add_node_attributes(node, attrs.items())
             else:
                 raise DuplicateIdException(node)
 
@@ -300,6 +586,68 @@ class Graph(gr.hypergraph, AttrsMixin):
 
         return grph
 
+    def snapshot(self):
+        """
+        Return a `GraphSnapshot` of this graph, which you can pickle
+        and turn back into a graph later with `from_snapshot`
+        """
+        return GraphSnapshot(self)
+
+    @classmethod
+    def from_snapshot(cls, snapshot, corpus=None):
+        """
+        Return a graph from a snapshot of it (see `snapshot`),
+        pointing at the annotations of the document it was taken
+        from. This is much cheaper than building the graph again
+        with `from_doc`, as we only need to look up each annotation
+        by its id.
+
+        The document must be the same as when the snapshot was
+        taken (see `educe.stac.graph.graph_snapshots` for snapshots
+        that are kept up to date with the corpus files).
+
+        :param snapshot: snapshot of a graph of this class
+        :type  snapshot: `GraphSnapshot`
+
+        :param corpus: educe corpus dictionary with the document
+            the snapshot was taken from; if None, we rebuild the
+            document from the skeleton in the snapshot
+            (see `GraphSnapshot.document`)
+        :type  corpus: dict from `FileId` to documents
+        """
+        if corpus is None:
+            corpus = {snapshot.doc_key: snapshot.document()}
+        grph = cls()
+        doc = corpus[snapshot.doc_key]
+        grph.corpus = corpus
+        grph.doc_key = snapshot.doc_key
+        grph.doc = doc
+
+        def annotation(local_id):
+            "annotation a node or edge points to"
+            anno = doc.by_id(local_id)
+            if anno is None:
+                oops = 'There is no annotation with id %s [snapshot]' %\
+                    local_id
+                raise Exception(oops)
+            return anno
+
+        for node, local_id, attrs in snapshot.nodes:
+            grph.add_node(node)
+            grph.add_node_attributes(node, attrs)
+            grph.add_node_attribute(node, ('annotation',
+                                           annotation(local_id)))
+
+        for edge, local_id, attrs, links in snapshot.edges:
+            grph.add_edge(edge)
+            grph.add_edge_attributes(edge, attrs)
+            grph.add_edge_attribute(edge, ('annotation',
+                                           annotation(local_id)))
+            for lnk in links:
+                grph.link(lnk, edge)
+
+        return grph
+
     def copy(self, nodeset=None):
         """
         Return a copy of the graph, optionally restricted to a subset
@@ -323,6 +671,43 @@ class Graph(gr.hypergraph, AttrsMixin):
         :param nodeset: only copy nodes with these names
         :type  nodeset: iterable of strings
         """
+        return self._copy_subgraph(self._copy_index(), nodeset)
+
+    def copy_many(self, nodesets):
+        """
+        Return a list of copies of the graph, one for each of the
+        given subsets of EDUs and CDUs (see `copy`).
+
+        This is cheaper than calling `copy` on each subset, as the
+        indexes on this graph that copying needs are only built
+        once. Each copy only costs as much as the part of the graph
+        it covers.
+
+        :param nodesets: subsets of node names
+        :type  nodesets: iterable of iterables of strings
+        """
+        index = self._copy_index()
+        return [self._copy_subgraph(index, x) for x in nodesets]
+
+    def _copy_index(self):
+        """
+        Indexes needed to copy subgraphs of this graph: the position
+        of each node and each hyperedge (so that copies list them in
+        the same order as we do), and the hyperedges without links
+        (which get copied regardless)
+        """
+        node_pos = dict((n, i) for i, n in enumerate(self._node_links))
+        edge_pos = dict((e, i) for i, e in enumerate(self._edge_links))
+        unlinked = [e for e, links in self._edge_links.items()
+                    if not links]
+        return node_pos, edge_pos, unlinked
+
+    def _copy_subgraph(self, index, nodeset):
+        """
+        Copy of the graph restricted to a subset of nodes (see `copy`),
+        using the indexes returned by `_copy_index`
+        """
+        node_pos, edge_pos, unlinked = index
         g = self.__class__()
         g.corpus = self.corpus
         g.doc_key = self.doc_key
@@ -337,37 +722,45 @@ class Graph(gr.hypergraph, AttrsMixin):
         for x in cdus:
             nodes_wanted.update(self.cdu_members(x, deep=True))
 
-        def is_wanted_edge(e):
-            return all([l in nodes_wanted for l in self.links(e)])
+        # we want all hyperedges whose links are in our copy set,
+        # which grows as we take in the mirror nodes of the edges
+        # we want; so count the links missing for each edge that
+        # touches the copy set, and take edges when they hit 0
+        # (each link is examined once, when its node comes in)
+        missing = {}
+        worklist = list(unlinked)
+
+        def take_node(node):
+            "count the links of a node now in the copy set"
+            for e in self._node_links.get(node, ()):
+                if e not in missing:
+                    missing[e] = len(self._edge_links[e])
+                missing[e] -= 1
+                if missing[e] == 0:
+                    worklist.append(e)
+
+        for n in nodes_wanted:
+            take_node(n)
 
-        # keep expanding the copyable edge list until we've
-        # covered everything that exclusively points
-        # (indirectly or otherwise) to our copy set
-        keep_growing = True
-        edges_remaining = self.hyperedges()
         edges_wanted = set()
-        while keep_growing:
-            keep_growing = False
-            for e in edges_remaining:
-                if is_wanted_edge(e):
-                    edges_wanted.add(e)
-                    nodes_wanted.add(self.mirror(e)) # obligatory node mirror
-                    edges_remaining.remove(e)
-                    keep_growing = True
-
-        for n in self.nodes():
-            if n in nodes_wanted:
-                g.add_node(n)
-                for kv in self.node_attributes(n):
-                    g.add_node_attribute(n,kv)
-
-        for e in self.hyperedges():
-            if e in edges_wanted:
-                g.add_hyperedge(e)
-                for kv in self.edge_attributes(e):
-                    g.add_edge_attribute(e,kv)
-                for l in self.links(e):
-                    g.link(l,e)
+        while worklist:
+            e = worklist.pop()
+            edges_wanted.add(e)
+            mirror = self.mirror(e) # obligatory node mirror
+            if mirror not in nodes_wanted:
+                nodes_wanted.add(mirror)
+                take_node(mirror)
+
+        for n in sorted((n for n in nodes_wanted if n in node_pos),
+                        key=node_pos.__getitem__):
+            g.add_node(n)
+            g.add_node_attributes(n, self._node_attrs[n].items())
+
+        for e in sorted(edges_wanted, key=edge_pos.__getitem__):
+            g.add_hyperedge(e)
+            g.add_edge_attributes(e, self._edge_attrs[e].items())
+            for l in self._edge_links[e]:
+                g.link(l, e)
 
         return g
 
@@ -378,53 +771,70 @@ class Graph(gr.hypergraph, AttrsMixin):
         Each connected component set can be passed to `self.copy()`
         to be copied as a subgraph.
 
-        This builds on python-graph's version of a function with the
-        same name but also adds awareness of our conventions about there
-        being both a node/edge for relations/CDUs.
+        Nodes are connected if they are linked by the same hyperedge.
+        We also follow our conventions about there being both a
+        node and an edge for relations/CDUs: anything connected *via*
+        the edge is also considered as connected *to* its mirror node.
         """
-        ccs = accessibility.connected_components(self)
+        parent = dict((n, n) for n in self._node_links)
+
+        def find(node):
+            "representative of the node's component (path halving)"
+            while parent[node] != node:
+                parent[node] = parent[parent[node]]
+                node = parent[node]
+            return node
+
+        def union(node1, node2):
+            "merge the components of two nodes"
+            root1 = find(node1)
+            root2 = find(node2)
+            if root1 != root2:
+                parent[root2] = root1
+
+        for links in self._edge_links.values():
+            for lnk in links[1:]:
+                union(links[0], lnk)
+        for node in self._node_links:
+            edge = self._attrs(node).get('mirror')
+            if edge in self._edge_links:
+                for lnk in self._edge_links[edge][:1]:
+                    union(node, lnk)
+
         subgraphs = collections.defaultdict(set)
-        for node, i in ccs.items():
-            subgraphs[i].add(node)
-
-        # the basic idea here: if any member of connected component is
-        # one of our hybrid node/edge creatures, we need to help the
-        # graph library recognise that that anything connected *via*
-        # the edge should also be considered as connected *to* the
-        # edge, so we merge the components
-        eaten = set()
-        merged = {}
-        prior = subgraphs.keys()
-        while sorted(merged.keys()) != prior:
-            prior = sorted(merged.keys())
-            merged = {}
-            for k in subgraphs:
-                if k in eaten:
-                    continue
-                subg = subgraphs[k]
-                merged[k] = copy.copy(subg)
-                for n in subg:
-                    e = self.mirror(n)
-                    if e is not None:
-                        links = set(self.links(e))
-                        for k2 in subgraphs.keys():
-                            links2 = subgraphs[k2]
-                            if k2 != k and not links2.isdisjoint(links):
-                                eaten.add(k2)
-                                merged[k] |= links2
-            subgraphs = merged
-
-        ccs = frozenset([frozenset(v) for v in subgraphs.values()])
-        return ccs
+        for node in self._node_links:
+            subgraphs[find(node)].add(node)
+        return frozenset(frozenset(v) for v in subgraphs.values())
+
+    def node_attributes_dict(self, x):
+        return dict(self._node_attrs[x])
+
+    def edge_attributes_dict(self, x):
+        return dict(self._edge_attrs[x])
 
     def _attrs(self, x):
-        if self.has_edge(x):
-            return self.edge_attributes_dict(x)
-        elif self.has_node(x):
-            return self.node_attributes_dict(x)
+        # (the dictionaries themselves, so no copying on every
+        # `type`, `annotation` or `mirror` lookup)
+        if x in self._edge_attrs:
+            return self._edge_attrs[x]
+        elif x in self._node_attrs:
+            return self._node_attrs[x]
         else:
             raise Exception('Tried to get attributes of non-existing object ' + str(x))
 
+    def _set_annotation(self, x, anno):
+        """
+        Point a node or edge, and its mirror image if any, at a
+        different annotation object (eg. a copy of the one it had)
+        """
+        for y in [x, self.mirror(x)]:
+            if y is None:
+                continue
+            elif self.has_edge(y):
+                self.add_edge_attribute(y, ('annotation', anno))
+            else:
+                self.add_node_attribute(y, ('annotation', anno))
+
     def relations(self):
         """
         Set of relation edges representing the relations in the graph.
@@ -466,6 +876,17 @@ class Graph(gr.hypergraph, AttrsMixin):
         else:
             raise Exception("confused by relation edge with 3+ links")
 
+    def _cdu_tree(self):
+        """
+        The CDU nesting in this graph (see `_CduTree`), built when
+        first asked for, and again if the graph has changed since
+        """
+        memo = self._cdu_memo
+        if memo is None or memo[0] != self._edits:
+            memo = (self._edits, _CduTree(self))
+            self._cdu_memo = memo
+        return memo[1]
+
     def containing_cdu(self, node):
         """
         Given an EDU (or CDU, or relation instance), return immediate
@@ -473,10 +894,7 @@ class Graph(gr.hypergraph, AttrsMixin):
         If there is more than one containing CDU, return one of them
         arbitrarily.
         """
-        for node in self.links(self.nodeform(node)):
-            if self.is_cdu(node):
-                return node
-        return None
+        return self._cdu_tree().parent.get(self.nodeform(node))
 
     def containing_cdu_chain(self, node):
         """
@@ -484,12 +902,14 @@ class Graph(gr.hypergraph, AttrsMixin):
         containing CDU, the container's container, and forth.
         Return the empty list if no CDU contains this one.
         """
+        parent = self._cdu_tree().parent
         res = []
-        while node:
-            node = self.nodeform(node)
+        cdu = parent.get(self.nodeform(node))
+        while cdu:
+            node = self.nodeform(cdu)
             res.append(node)
-            node = self.containing_cdu(node)
-        return res[1:]  # drop the node itself
+            cdu = parent.get(node)
+        return res
 
     def cdu_members(self, cdu, deep=False):
         """
@@ -502,12 +922,7 @@ class Graph(gr.hypergraph, AttrsMixin):
         """
 
         if deep:
-            members = set()
-            for m in self.cdu_members(cdu):
-                members.add(m)
-                if self.is_cdu(m):
-                    members.update(self.cdu_members(m,deep))
-            return frozenset(members)
+            return self._cdu_tree().deep_members(self.edgeform(cdu))
         else:
             hyperedge = self.edgeform(cdu)
             return frozenset(self.links(hyperedge))
@@ -566,7 +981,97 @@ class Graph(gr.hypergraph, AttrsMixin):
         return self._mk_edge(anno, 'rel', members, mirrored=True)
 
     def _schema_edge(self, anno):
-        return self._mk_edge(anno, 'CDU', anno.span, mirrored=True)
+        # (schema spans are sets; we link their members in order
+        # so that the graph is the same on every run)
+        return self._mk_edge(anno, 'CDU', sorted(anno.span), mirrored=True)
+
+
+class GraphSnapshot(object):
+    """
+    Plain data version of a `Graph`, which is cheap to pickle and
+    to turn back into a graph (see `Graph.snapshot` and
+    `Graph.from_snapshot`).
+
+    Nodes and edges are kept in the order the graph has them, with
+    their attributes, except that they refer to their annotation by
+    its local id rather than holding on to the annotation object.
+
+    We also keep a skeleton of the whole document: its text, and
+    the id, type, span and features of every annotation in it (but
+    none of their metadata). This is enough for tools that only
+    care about the shape of the graph and the annotations in it
+    (eg. counting RFC violations) to work from snapshots without
+    reading the corpus again.
+
+    :param graph: graph to take a snapshot of
+    :type  graph: `Graph`
+    """
+    def __init__(self, graph):
+        self.doc_key = graph.doc_key
+        self.nodes = []  # [(node, local id, [(key, value)])]
+        self.edges = []  # [(edge, local id, [(key, value)], [node])]
+        # node and edge names come up several times each (mirrors,
+        # links); use the same string for each, so that pickle only
+        # writes it out once
+        names = {}
+
+        def name(x):
+            "the one copy of a name we use"
+            return names.setdefault(x, x)
+
+        def attr_items(attrs):
+            "attributes other than the annotation"
+            return [(k, name(v) if k == 'mirror' else v)
+                    for k, v in attrs.items() if k != 'annotation']
+
+        for node in graph.nodes():
+            attrs = graph._node_attrs[node]
+            self.nodes.append((name(node),
+                               attrs['annotation'].local_id(),
+                               attr_items(attrs)))
+        for edge in graph.hyperedges():
+            attrs = graph._edge_attrs[edge]
+            self.edges.append((name(edge),
+                               attrs['annotation'].local_id(),
+                               attr_items(attrs),
+                               [name(x) for x in graph.links(edge)]))
+        doc = graph.doc
+        self.units = [(x.local_id(), x.type,
+                       x.span.char_start, x.span.char_end,
+                       x.features)
+                      for x in doc.units]
+        self.relations = [(x.local_id(), x.type,
+                           x.span.t1, x.span.t2,
+                           x.features)
+                          for x in doc.relations]
+        self.schemas = [(x.local_id(), x.type,
+                         x.units, x.relations, x.schemas,
+                         x.features)
+                        for x in doc.schemas]
+        self.text = doc.text()
+
+    def document(self):
+        """
+        Rebuild a document from the skeleton we kept of the original
+        one, with its origin set to our `doc_key`.
+
+        The annotations in it are of the generic `educe.annotation`
+        classes, and have no metadata. Their features are copies,
+        so modifying them does not affect the snapshot.
+
+        :rtype: `educe.annotation.Document`
+        """
+        units = [Unit(i, Span(start, end), utype, dict(feats))
+                 for i, utype, start, end, feats in self.units]
+        relations = [Relation(i, RelSpan(t1, t2), rtype, dict(feats))
+                     for i, rtype, t1, t2, feats in self.relations]
+        schemas = [Schema(i, set(sunits), set(srels), set(sschemas),
+                          stype, dict(feats))
+                   for i, stype, sunits, srels, sschemas, feats
+                   in self.schemas]
+        doc = Document(units, relations, schemas, self.text)
+        doc.set_origin(self.doc_key)
+        return doc
 
 
 # ---------------------------------------------------------------------
@@ -853,20 +1358,22 @@ class DotGraph(pydot.Dot):
             self._add_edu(node)
 
         # Add nodes that have some sort of error condition or another
-        for edge in (self.core.relations() | self.core.cdus()):
+        # (going through edges in order of their names, so that we
+        # write the same dot source for the same graph every time)
+        for edge in sorted(self.core.relations() | self.core.cdus()):
             for node in self.core.links(edge):
                 if not (self.core.is_edu(node) or\
                         self.core.is_relation(node) or\
                         self.core.is_cdu(node)):
                     self._add_edu(node)
 
-        for edge in self.core.relations():
+        for edge in sorted(self.core.relations()):
             if edge in self.complex_rels:
                 self._add_complex_rel(edge)
             else:
                 self._add_simple_rel(edge)
 
-        for edge in self.core.cdus():
+        for edge in sorted(self.core.cdus()):
             if edge in self.contained_cdus:
                 continue
             elif edge in self.complex_cdus:
@@ -906,19 +1413,127 @@ class EnclosureGraph(dgr.digraph, AttrsMixin):
     * annotations - iterable of Annotation
     * key - disambiguation key for nodes with same span
             (annotation -> sort key)
+
+    If you edit the document, you can patch the graph with
+    `add_annotation`, `remove_annotation` and `update_span` rather than
+    building it again. These only reconnect the annotations that
+    overlap (or overlap annotations that overlap, etc) the one that
+    changed, and give the same graph as building it again would, with
+    any new annotations coming after the others.
+
+    You can also save the graph with `snapshot`, and pass the
+    result back in (along with the same annotations) to get the
+    graph back without working out what encloses what again.
     """
-    def __init__(self, annotations, key=None):
+    def __init__(self, annotations, key=None, snapshot=None):
         super(EnclosureGraph, self).__init__()
         AttrsMixin.__init__(self)
-        self._build_enclosure_graph(annotations, key)
+        if snapshot is None:
+            self._build_enclosure_graph(annotations, key)
+        else:
+            self._restore_enclosure_graph(annotations, key, snapshot)
 
     def _build_enclosure_graph(self, annotations, key=None):
         # text spans can be expensive to compute if there
         # are nested elements; cache them to avoid
         # recomputation
-        spans = {}
+        annotations = list(annotations)
+        self._key = key
+        self._spans = {}  # annotation -> text span
+        self._annos = {}  # node id -> annotation
+        self._ranks = {}  # annotation -> position in the order we got them
+        self._next_rank = 0
+        self._width = 0  # no annotation has been wider than this
         for anno in annotations:
-            spans[anno] = anno.text_span()
+            self._add_anno_node(anno)
+        self._index_starts()
+        self._connect(annotations)
+
+    def _restore_enclosure_graph(self, annotations, key, snapshot):
+        """
+        Set the graph up from a snapshot (see `snapshot`) rather than
+        by comparing the spans of the annotations
+        """
+        self._key = key
+        self._spans = {}
+        self._annos = {}
+        self._ranks = {}
+        self._next_rank = 0
+        self._width = 0
+        nodes, edges = snapshot
+        by_id = dict((self._mk_node_id(x), x) for x in annotations)
+        if len(by_id) != len(nodes):
+            raise Exception('Annotations do not match the enclosure '
+                            'graph snapshot (%d annotations for %d nodes)'
+                            % (len(by_id), len(nodes)))
+        for node in nodes:
+            if node not in by_id:
+                oops = 'There is no annotation with id %s [snapshot]' % node
+                raise Exception(oops)
+            self._add_anno_node(by_id[node])
+        self._index_starts()
+        for edge in edges:
+            self.add_edge(edge)
+
+    def snapshot(self):
+        """
+        Plain data version of this graph, which you can pickle, and
+        pass back in with the same annotations to rebuild the graph
+        (see the `snapshot` parameter to the constructor): the
+        nodes, in the order their annotations came in, and the
+        edges between them
+
+        :rtype: ([node], [(node, node)])
+        """
+        nodes = sorted(self.nodes(),
+                       key=lambda x: self._ranks[self._annos[x]])
+        return (nodes, sorted(self.edges()))
+
+    def _add_anno_node(self, anno):
+        """
+        Add the node for an annotation (not connected to anything)
+        """
+        node, attrs = self._mk_node(anno)
+        self.add_node(node)
+        for pair in attrs.items():
+            self.add_node_attribute(node, pair)
+        self._annos[node] = anno
+        span = anno.text_span()
+        self._spans[anno] = span
+        self._width = max(self._width, span.length())
+        self._ranks[anno] = self._next_rank
+        self._next_rank += 1
+
+    def _index_starts(self):
+        """
+        Index all our annotations by start (see `_region`)
+        """
+        self._by_start = sorted(self._index_entry(x) for x in self._spans)
+
+    def _index_entry(self, anno):
+        """
+        Entry for an annotation in the start index (by its span
+        as we last saw it): its start, its end, and its rank, which
+        no other annotation shares
+        """
+        span = self._spans[anno]
+        return (span.char_start, span.char_end, self._ranks[anno], anno)
+
+    def _unindex(self, anno):
+        """
+        Remove an annotation from the start index
+        """
+        entry = self._index_entry(anno)
+        del self._by_start[bisect.bisect_left(self._by_start, entry[:3])]
+
+    def _connect(self, annotations):
+        """
+        Add the edges between the given annotations (none of which
+        should have any edges yet)
+        """
+        key = self._key
+        spans = self._spans
+        anno_of = self._annos
 
         def can_enclose(anno1, anno2):
             span1 = spans[anno1]
@@ -945,34 +1560,171 @@ class EnclosureGraph(dgr.digraph, AttrsMixin):
                 # yucky extra step to also enclose subnodes
                 # of the same type (let these be on the same layer)
                 for id_kid in self.neighbors(id_mini):
-                    kid = self.annotation(id_kid)
+                    kid = anno_of[id_kid]
                     if kid.type == mini.type:
                         connect_to_enclosed(mega, kid)
             else:
                 id_mini = self._mk_node_id(mini)
                 for id_kid in self.neighbors(id_mini):
-                    kid = self.annotation(id_kid)
+                    kid = anno_of[id_kid]
                     connect_to_enclosed(mega, kid)
 
         of_width = collections.defaultdict(list)
         for anno in annotations:
-            node, attrs = self._mk_node(anno)
-            self.add_node(node)
-            for pair in attrs.items():
-                self.add_node_attribute(node, pair)
             of_width[spans[anno].length()].append(anno)
 
-        narrow = []
+        # We go from the narrowest annotations to the widest, connecting
+        # each one to the subgraphs of the narrower ones that are still
+        # visible (not enclosed by anything so far), in the order they
+        # became visible. Only visible annotations that overlap the
+        # current one can get connected to it, so we keep them sorted by
+        # start (with their rank in the visibility order as tie-breaker),
+        # and only look at those that start no earlier than the width of
+        # the current annotation before it.
+        visible = []  # (start, rank, annotation)
+        rank = 0
         for width in sorted(of_width):
-            mk_hidden = []
             layer = of_width[width]
-            narrow.extend(layer)
+            for anno in layer:
+                bisect.insort(visible, (spans[anno].char_start, rank, anno))
+                rank += 1
+            mk_hidden = {}
             for mega in layer:
-                for mini in narrow:
+                mspan = spans[mega]
+                lo = bisect.bisect_left(visible, (mspan.char_start - width,))
+                hi = bisect.bisect_right(visible, (mspan.char_end,
+                                                   float('inf')))
+                candidates = sorted((x for x in visible[lo:hi]
+                                     if spans[x[2]].char_end >=
+                                     mspan.char_start),
+                                    key=lambda x: x[1])
+                for _, mini_rank, mini in candidates:
                     connect_to_enclosed(mega, mini)
                     if can_enclose(mega, mini):
-                        mk_hidden.append(mini)
-            narrow = [x for x in narrow if x not in mk_hidden]
+                        mk_hidden[mini_rank] = mini
+            for mini_rank, mini in mk_hidden.items():
+                start = spans[mini].char_start
+                del visible[bisect.bisect_left(visible, (start, mini_rank))]
+
+    def _region(self, annotations):
+        """
+        The annotations in the graph which are connected to any of the
+        given ones through chains of overlapping annotations (the
+        given annotations included).
+
+        Annotations can only be connected in the graph (or have an
+        effect on each other's connections) if they overlap, so the
+        graph for a region does not depend on anything outside it
+        """
+        region = []
+        seen = set()
+        for anno in annotations:
+            if anno not in seen:
+                group = self._group(anno)
+                region.extend(group)
+                seen.update(group)
+        return region
+
+    def _group(self, anno):
+        """
+        The annotations connected to this one (see `_region`): those
+        that share some text with it, empty ones that sit within it
+        or at either end of it, and so on from there (empty ones at
+        the same offset are connected to each other).
+
+        Sweeping through the start index from left to right, where
+        empty annotations come before the others at the same offset,
+        an annotation joins the group so far iff it starts before the
+        group's end, or right at its end if either is empty. We start
+        the sweep as far to the left as an annotation that reaches
+        this one could start (nothing is wider than `self._width`),
+        and again from further to the left if it turns out that the
+        group starts before this one does.
+        """
+        entries = self._by_start
+        floor = self._spans[anno].char_start
+        while True:
+            # nothing before `lo` reaches `floor`, so the sweep gets
+            # any group that starts from `floor` onwards right
+            lo = bisect.bisect_left(entries, (floor - self._width,))
+            group = []
+            end = None
+            point_at_end = False
+            found = False
+            for start, stop, _, other in entries[lo:]:
+                empty = start == stop
+                if end is not None and (start < end or
+                                        (start == end and
+                                         (empty or point_at_end))):
+                    group.append(other)
+                    if stop > end:
+                        end = stop
+                        point_at_end = False
+                    point_at_end = point_at_end or (empty and start == end)
+                elif found:
+                    break
+                else:
+                    group = [other]
+                    group_start = start
+                    end = stop
+                    point_at_end = empty
+                found = found or other is anno
+            if group_start >= floor:
+                return group
+            floor = group_start
+
+    def _reconnect(self, annotations):
+        """
+        Drop and rebuild the edges between the annotations of a region
+        (see `_region`)
+        """
+        for anno in annotations:
+            node = self._mk_node_id(anno)
+            for kid in list(self.neighbors(node)):
+                self.del_edge((node, kid))
+        self._connect(sorted(annotations, key=self._ranks.__getitem__))
+
+    def add_annotation(self, anno):
+        """
+        Add an annotation to the graph, and reconnect the
+        annotations around it
+        """
+        self._add_anno_node(anno)
+        bisect.insort(self._by_start, self._index_entry(anno))
+        self._reconnect(self._region([anno]))
+
+    def remove_annotation(self, anno):
+        """
+        Remove an annotation from the graph, and reconnect the
+        annotations that were around it
+        """
+        region = [x for x in self._region([anno]) if x is not anno]
+        self._unindex(anno)
+        node = self._mk_node_id(anno)
+        self.del_node(node)
+        del self._annos[node]
+        del self._spans[anno]
+        del self._ranks[anno]
+        self._reconnect(region)
+
+    def update_span(self, anno):
+        """
+        Reconnect an annotation whose text span has changed (along
+        with the annotations around its old and new spans).
+
+        Bear in mind that you need to bump the document version
+        (`educe.annotation.Document.bump_version`) after changing a
+        span, or we may see the old one.
+        """
+        region = self._region([anno])
+        self._unindex(anno)
+        span = anno.text_span()
+        self._spans[anno] = span
+        self._width = max(self._width, span.length())
+        bisect.insort(self._by_start, self._index_entry(anno))
+        seen = set(region)
+        region.extend(x for x in self._region([anno]) if x not in seen)
+        self._reconnect(region)
 
     def _mk_node_id(self, anno):
         return anno.local_id()
@@ -22,11 +22,57 @@ if sys.version > '3':
     ifilter = filter
     ifilterfalse = itertools.filterfalse
     izip = zip
+    _intern = sys.intern
 
 else:
     ifilter = itertools.ifilter
     ifilterfalse = itertools.ifilterfalse
     izip = itertools.izip
+    _intern = intern
+
+
+def intern_string(string, max_length=None):
+    """
+    Return the interned version of a string, so that all the
+    annotations which share a type name, a feature name, etc. share
+    a single copy of it rather than each holding their own.
+
+    None, strings longer than `max_length` (if given), and unicode
+    strings on Python 2 (which cannot be interned) are returned
+    as they are.
+    """
+    if string is None or\
+            (max_length is not None and len(string) > max_length):
+        return string
+    try:
+        return _intern(string)
+    except TypeError:
+        return string
+
+
+def _all_slots(cls):
+    """
+    Slots declared by a class and its ancestors
+    """
+    return [k for c in cls.__mro__ for k in c.__dict__.get('__slots__', ())]
+
+
+def get_slots_state(obj):
+    """
+    `__getstate__` for classes with `__slots__` (which pickle protocols
+    0 and 1 would otherwise refuse). Includes the `__dict__` of
+    instances of subclasses that do not declare slots
+    """
+    state = dict(getattr(obj, '__dict__', {}))
+    state.update((k, getattr(obj, k)) for k in _all_slots(type(obj))
+                 if hasattr(obj, k))
+    return state
+
+
+def set_slots_state(obj, state):
+    "`__setstate__` counterpart to `get_slots_state`"
+    for key, val in state.items():
+        setattr(obj, key, val)
 
 
 class EduceXmlException(Exception):
@@ -7,7 +7,6 @@ PDTB Corpus management (re-exported by educe.pdtb)
 
 from glob import glob
 import os
-import sys
 
 from educe.corpus import FileId
 import educe.corpus
@@ -21,8 +20,8 @@ class Reader(educe.corpus.Reader):
     """
     See `educe.corpus.Reader` for details
     """
-    def __init__(self, corpusdir):
-        educe.corpus.Reader.__init__(self, corpusdir)
+    def __init__(self, corpusdir, cache_dir=None):
+        educe.corpus.Reader.__init__(self, corpusdir, cache_dir=cache_dir)
 
     def files(self):
         anno_files = {}
@@ -34,25 +33,13 @@ class Reader(educe.corpus.Reader):
             anno_files[k] = fname
         return anno_files
 
-    def slurp_subcorpus(self, cfiles, verbose=False):
+    def slurp_subcorpus(self, cfiles, verbose=False, jobs=1):
         """
         See `educe.rst_dt.parse` for a description of `RSTTree`
         """
-        corpus = {}
-        counter = 0
-        for k in cfiles.keys():
-            if verbose:
-                sys.stderr.write("\rSlurping corpus dir [%d/%d]" %
-                                 (counter, len(cfiles)))
-            fname = cfiles[k]
-            annotations = parse.parse(fname)
-            #annotations.set_origin(k)
-            corpus[k] = annotations
-            counter = counter+1
-        if verbose:
-            sys.stderr.write("\rSlurping corpus dir [%d/%d done]\n" %
-                             (counter, len(cfiles)))
-        return corpus
+        return self._slurp_with(parse.parse, cfiles,
+                                verbose=verbose, jobs=jobs,
+                                set_origin=False)
 
 
 def mk_key(doc):
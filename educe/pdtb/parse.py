@@ -40,6 +40,8 @@ import re
 import funcparserlib.parser   as fp
 import sys
 
+from educe.internalutil import intern_string
+
 if sys.version > '3':
     from functools import reduce
     from io import StringIO
@@ -554,10 +556,11 @@ _inferenceSite =\
 # features
 # ---------------------------------------------------------------------
 
-_Source      = _alphanum_str
-_Type        = _alphanum_str
-_Polarity    = _alphanum_str
-_Determinacy = _alphanum_str
+# short, endlessly repeated strings: worth sharing
+_Source      = _alphanum_str >> intern_string
+_Type        = _alphanum_str >> intern_string
+_Polarity    = _alphanum_str >> intern_string
+_Determinacy = _alphanum_str >> intern_string
 
 _attributionCoreFeatures =\
         _words(_intersperse(_comma,
@@ -570,14 +573,15 @@ _attributionFeatures =\
 
 # Expansion.Alternative.Chosen alternative =>
 # Expansion / Alternative / "Chosen alternative "
-_SemanticClassWord = _many_char(lambda x:x in [' ', '-'] or x.isalnum())
+_SemanticClassWord = _many_char(lambda x:x in [' ', '-'] or x.isalnum())\
+        >> intern_string
 _SemanticClassN = _sepby(_fullstop, _SemanticClassWord) >> SemClass
 _SemanticClass1 = _SemanticClassN
 _SemanticClass2 = _SemanticClassN
 _semanticClass  = _SemanticClass1 + fp.maybe(_sp + _comma + _sp + _SemanticClass2)
 
 # always followed by a comma (yeah, a bit clunky)
-_ConnHead = _skipto_mkstr(_comma)
+_ConnHead = _skipto_mkstr(_comma) >> intern_string
 _Conn1    = _ConnHead
 _Conn2    = _ConnHead
 
@@ -78,6 +78,7 @@ class TweakedToken(RawToken):
     These tweaked tokens are only used to obtain a span within the text
     you are trying to align against; they can be subsequently discarded.
     """
+    __slots__ = ('tweaked_word', 'offset')
 
     def __init__(self, word, tag, tweaked_word=None, prefix=None):
         tweak = word if tweaked_word is None else tweaked_word
@@ -6,7 +6,6 @@ Corpus management (re-exported by educe.rst_dt)
 """
 
 import os
-import sys
 from glob import glob
 from os.path import dirname
 from os.path import join
@@ -32,8 +31,8 @@ class Reader(educe.corpus.Reader):
     """
     See `educe.corpus.Reader` for details
     """
-    def __init__(self, corpusdir):
-        educe.corpus.Reader.__init__(self, corpusdir)
+    def __init__(self, corpusdir, cache_dir=None):
+        educe.corpus.Reader.__init__(self, corpusdir, cache_dir=cache_dir)
 
     def files(self, exclude_file_docs=False):
         """
@@ -58,24 +57,12 @@ class Reader(educe.corpus.Reader):
             anno_files[k] = (fname, text_file)
         return anno_files
 
-    def slurp_subcorpus(self, cfiles, verbose=False):
+    def slurp_subcorpus(self, cfiles, verbose=False, jobs=1):
         """
         See `educe.rst_dt.parse` for a description of `RSTTree`
         """
-        corpus = {}
-        counter = 0
-        for k in cfiles.keys():
-            if verbose:
-                sys.stderr.write("\rSlurping corpus dir [%d/%d]" %
-                                 (counter, len(cfiles)))
-            annotations = parse.read_annotation_file(*cfiles[k])
-            annotations.set_origin(k)
-            corpus[k] = annotations
-            counter = counter+1
-        if verbose:
-            sys.stderr.write("\rSlurping corpus dir [%d/%d done]\n" %
-                             (counter, len(cfiles)))
-        return corpus
+        return self._slurp_with(parse.read_annotation_file, cfiles,
+                                verbose=verbose, jobs=jobs)
 
 
 def mk_key(doc):
@@ -107,12 +94,14 @@ class RstDtParser(object):
     def __init__(self, corpus_dir, args, coarse_rels=False,
                  exclude_file_docs=False):
         # TODO: kill `args`
-        self.reader = Reader(corpus_dir)
+        self.reader = Reader(corpus_dir,
+                             cache_dir=args.__dict__.get('cache_dir'))
         # pre-load corpus
         anno_files_unfltd = self.reader.files(exclude_file_docs)
         is_interesting = educe.util.mk_is_interesting(args)
         anno_files = self.reader.filter(anno_files_unfltd, is_interesting)
-        self.corpus = self.reader.slurp(anno_files, verbose=True)
+        self.corpus = self.reader.slurp(anno_files, verbose=True,
+                                        jobs=args.__dict__.get('jobs', 1))
         # setup label converter for the desired granularity
         # 'fine' means we don't change anything
         if coarse_rels:
@@ -7,6 +7,7 @@ from __future__ import print_function
 import copy
 import itertools
 
+from educe.annotation import SpanArray
 from educe.external.postag import Token
 from educe.util import relative_indices
 from .text import Sentence, Paragraph, clean_edu_text
@@ -15,25 +16,40 @@ from .annotation import EDU
 
 # helpers for _align_with_doc_structure
 
-def containing(span):
+def _shaved(span, text):
     """
-    span -> anno -> bool
-
-    if this annotation encloses the given span
+    Copy of a (sloppy) EDU span, shaved of one character on each
+    side and of any whitespace left at either end
     """
-    return lambda x: x.text_span().encloses(span)
-
-
-def _filter0(pred, iterable):
+    span = copy.copy(span)
+    span.char_start += 1
+    span.char_end -= 1
+    etext = text[span.char_start:span.char_end]
+    # kill left whitespace
+    span.char_start += len(etext) - len(etext.lstrip())
+    etext = etext.lstrip()
+    # kill right whitespace
+    span.char_end -= len(etext) - len(etext.rstrip())
+    return span
+
+
+def _align_enclosing(edus, annos, text):
     """
-    First item that satisifies a predicate in a given
-    iterable, otherwise None
+    For each EDU, the index of the first annotation (eg. paragraph)
+    that encloses it, or None if there is none.
+
+    Sloppy EDUs happen; if we can't find an enclosing annotation,
+    we try again after shaving off some characters
     """
-    for item in iterable:
-        if pred(item):
-            return item
-    else:
-        return None
+    anno_spans = SpanArray.from_annotations(annos)
+    res = []
+    for edu, idx in zip(edus, anno_spans.enclosing(
+            SpanArray.from_annotations(edus)).tolist()):
+        if idx < 0:
+            espan = _shaved(edu.text_span(), text)
+            idx = int(anno_spans.enclosing([espan])[0])
+        res.append(idx if idx >= 0 else None)  # TODO or -1 or ...
+    return res
 
 
 class DocumentPlus(object):
@@ -136,39 +152,7 @@ class DocumentPlus(object):
             edu2para = []
             edu2para.append(0)  # left padding
             # align the other EDUs
-            for edu in edus[1:]:
-                espan = edu.text_span()
-                # find enclosing paragraph
-                para = _filter0(containing(espan), paragraphs)
-                # sloppy EDUs happen; try shaving off some characters
-                # if we can't find a paragraph
-                if para is None:
-                    # DEBUG
-                    if False:
-                        print('WP ({}) : {}'.format(self.grouping, edu))
-                    # end DEBUG
-                    espan = copy.copy(espan)
-                    espan.char_start += 1
-                    espan.char_end -= 1
-                    etext = text[espan.char_start:espan.char_end]
-                    # kill left whitespace
-                    espan.char_start += len(etext) - len(etext.lstrip())
-                    etext = etext.lstrip()
-                    # kill right whitespace
-                    espan.char_end -= len(etext) - len(etext.rstrip())
-                    etext = etext.rstrip()
-                    # try again
-                    para = _filter0(containing(espan), paragraphs)
-                    # DEBUG
-                    if False:
-                        if para is None:
-                            print('EP ({}): {}'.format(self.grouping, edu))
-                    # end DEBUG
-
-                # update edu to paragraph mapping
-                para_idx = (paragraphs.index(para) if para is not None
-                            else None)  # TODO or -1 or ...
-                edu2para.append(para_idx)
+            edu2para.extend(_align_enclosing(edus[1:], paragraphs, text))
 
         self.edu2para = edu2para
 
@@ -190,39 +174,8 @@ class DocumentPlus(object):
             edu2raw_sent = []
             edu2raw_sent.append(0)  # left padding
             # align the other EDUs
-            for edu in edus[1:]:
-                espan = edu.text_span()
-                # find enclosing raw sentence
-                sent = _filter0(containing(espan), raw_sentences)
-                # sloppy EDUs happen; try shaving off some characters
-                # if we can't find a sentence
-                if sent is None:
-                    # DEBUG
-                    if False:
-                        print('WP ({}) : {}'.format(self.grouping, edu))
-                    # end DEBUG
-                    espan = copy.copy(espan)
-                    espan.char_start += 1
-                    espan.char_end -= 1
-                    etext = text[espan.char_start:espan.char_end]
-                    # kill left whitespace
-                    espan.char_start += len(etext) - len(etext.lstrip())
-                    etext = etext.lstrip()
-                    # kill right whitespace
-                    espan.char_end -= len(etext) - len(etext.rstrip())
-                    etext = etext.rstrip()
-                    # try again
-                    sent = _filter0(containing(espan), raw_sentences)
-                    # DEBUG
-                    if False:
-                        if sent is None:
-                            print('EP ({}): {}'.format(self.grouping, edu))
-                    # end DEBUG
-
-                # update edu to sentence mapping
-                raw_sent_idx = (raw_sentences.index(sent) if sent is not None
-                                else None)  # TODO or -1 or ... ?
-                edu2raw_sent.append(raw_sent_idx)
+            edu2raw_sent.extend(_align_enclosing(edus[1:], raw_sentences,
+                                                 text))
 
         self.edu2raw_sent = edu2raw_sent
 
@@ -276,10 +229,10 @@ class DocumentPlus(object):
         edu2tokens.append(tok_idcs)
 
         # regular EDUs
+        tok_spans = SpanArray.from_annotations(tokens[1:])
         for edu in edus[1:]:
-            tok_idcs = [tok_idx
-                        for tok_idx, tok in enumerate(tokens[1:], start=1)
-                        if tok.overlaps(edu)]
+            tok_idcs = (tok_spans.overlapping_indices(edu.text_span())
+                        + 1).tolist()
             # TODO store the index of the first token of each EDU
             # this will be useful for future features
             edu2tokens.append(tok_idcs)
@@ -307,10 +260,14 @@ class DocumentPlus(object):
         edu2sent.append(0)
 
         # regular EDUs
+        tree_ids = [tree_idx
+                    for tree_idx, tree in enumerate(syn_trees[1:], start=1)
+                    if tree is not None]
+        tree_spans = SpanArray.from_annotations(syn_trees[i]
+                                                for i in tree_ids)
         for edu in edus[1:]:
-            tree_idcs = [tree_idx
-                         for tree_idx, tree in enumerate(syn_trees[1:], start=1)
-                         if tree is not None and tree.overlaps(edu)]
+            tree_idcs = [tree_ids[i] for i in
+                         tree_spans.overlapping_indices(edu.text_span())]
 
             if len(tree_idcs) == 1:
                 tree_idx = tree_idcs[0]
@@ -25,7 +25,7 @@ from .annotation import\
     RSTContext, RSTTree, SimpleRSTTree
 from .rst_wsj_corpus import load_rst_wsj_corpus_text_file
 from ..external.postag import generic_token_spans
-from ..internalutil import treenode
+from ..internalutil import intern_string, treenode
 
 
 # pre-processing leaves
@@ -110,7 +110,8 @@ def _parse_node(descr, span):
         _edu_span.append(_edu_span[0])
     edu_span = (int(_edu_span[0]),
                 int(_edu_span[1]))
-    return Node(nuclearity, edu_span, span, rel)
+    return Node(intern_string(nuclearity), edu_span, span,
+                intern_string(rel))
 
 
 def _preprocess(tstr):
@@ -19,9 +19,11 @@ def read_corpus(args, verbose=True):
     Read the section of the corpus specified in the command line arguments.
     """
     is_interesting = educe.util.mk_is_interesting(args)
-    reader = educe.rst_dt.Reader(args.corpus)
+    reader = educe.rst_dt.Reader(args.corpus,
+                                 cache_dir=args.__dict__.get('cache_dir'))
     anno_files = reader.filter(reader.files(), is_interesting)
-    return reader.slurp(anno_files, verbose)
+    return reader.slurp(anno_files, verbose,
+                        jobs=args.__dict__.get('jobs', 1))
 
 
 def get_output_dir(args):
@@ -237,13 +237,16 @@ def is_dialogue(annotation):
         annotation.type == 'Dialogue'
 
 
+_NON_EDU_TYPES = frozenset(STRUCTURE_TYPES + RESOURCE_TYPES +
+                           PREFERENCE_TYPES)
+
+
 def is_edu(annotation):
     """
     See Unit typology above
     """
-    blacklist = STRUCTURE_TYPES + RESOURCE_TYPES + PREFERENCE_TYPES
     return isinstance(annotation, Unit) and\
-        annotation.type not in blacklist
+        annotation.type not in _NON_EDU_TYPES
 
 
 def is_relation_instance(annotation):
@@ -341,9 +344,7 @@ def twin_from(doc, anno):
     Given a document and an annotation, return the first annotation in
     the document with a matching local identifier.
     """
-    anno_local_id = anno.local_id()
-    twins = [u for u in doc.annotations()
-             if u.local_id() == anno_local_id]
+    twins = doc.all_by_id(anno.local_id())
     return twins[0] if twins else None
 
 
@@ -7,9 +7,8 @@ import copy
 import itertools as itr
 import warnings
 
-from educe.annotation import Span
-from .annotation import (is_edu, is_cdu, is_dialogue, is_turn,
-                         split_turn_text)
+from educe.annotation import Document, Span, SpanIndex
+from .annotation import (is_edu, is_cdu, is_turn, split_turn_text)
 from .annotation import speaker as anno_speaker
 from .graph import WrappedToken, EnclosureGraph
 
@@ -59,6 +58,30 @@ def _blank_out(text, rejects):
     return text2
 
 
+def _turn_star_groups(dia_turns):
+    """Group the turns of a dialogue into runs of consecutive turns
+    by the same speaker (in textual order)
+
+    :rtype: [[Unit]]
+    """
+    dia_turns = sorted(dia_turns, key=lambda x: x.text_span())
+    return [list(turns) for _, turns in itr.groupby(dia_turns, anno_speaker)]
+
+
+def _turn_stars(doc, dialogue):
+    """Return the tstar turns of a single dialogue, as
+    `merge_turn_stars` would make them, but without copying
+    the whole document (and leaving its text alone)
+    """
+    tstars = []
+    for turns in _turn_star_groups(turns_in_span(doc,
+                                                 dialogue.text_span())):
+        tstar = copy.copy(turns[0])
+        tstar.span = Span.merge_all(x.text_span() for x in turns)
+        tstars.append(tstar)
+    return tstars
+
+
 def merge_turn_stars(doc):
     """Return a copy of the document in which consecutive turns
     by the same speaker have been merged.
@@ -77,19 +100,20 @@ def merge_turn_stars(doc):
         return start, start + len(prefix)
 
     doc = copy.deepcopy(doc)
-    dialogues = sorted([x for x in doc.units if is_dialogue(x)],
-                       key=lambda x: x.text_span())
+    dialogues = doc.units_of_type('Dialogue')
+    # (before we start modifying the document)
+    all_dia_turns = [turns_in_span(doc, dia.text_span())
+                     for dia in dialogues]
     rejects = []  # spans for the "deleted" turns' prefixes
-    for dia in dialogues:
-        dia_turns = sorted(turns_in_span(doc, dia.text_span()),
-                           key=lambda x: x.text_span())
-        for _, turns in itr.groupby(dia_turns, anno_speaker):
-            turns = list(turns)
+    for dia_turns in all_dia_turns:
+        for turns in _turn_star_groups(dia_turns):
             tstar = turns[0]
             tstar.span = Span.merge_all(x.text_span() for x in turns)
             rejects.extend(turns[1:])
-            for anno in turns[1:]:
-                doc.units.remove(anno)
+    # (in one pass, rather than a list.remove per turn)
+    rejected = frozenset(id(x) for x in rejects)
+    doc.units[:] = [x for x in doc.units if id(x) not in rejected]
+    doc.bump_version()
     # pylint: disable=protected-access
     doc._text = _blank_out(doc._text, [prefix_span(x) for x in rejects])
     # pylint: enable=protected-access
@@ -176,7 +200,8 @@ class Context(object):
                 raise Exception(oops)
 
     @classmethod
-    def _for_edu(cls, enclosure, doc_turns, doc_tstars, edu):
+    def _for_edu(cls, enclosure, doc_turns, tstars, edu,
+                 turn_edus, dialogue_turns):
         """Extract the context for a single EDU, but with the benefit of an
         enclosure graph to avoid repeatedly combing over objects
 
@@ -185,50 +210,80 @@ class Context(object):
         enclosure: EnclosureGraph
 
         doc_turns: [Unit]
-            All turn-level annotations within a document. This is somewhat
-            redundant with the enclosure graph, but perhaps more convenient
-
-        doc_tstars: [Unit]
-            All turn star annotations within a document. Turn stars are not
-            native to the document and have to be computed separately.
-            For example, the will not be part of the enclosure graph
-            unless you apply a merge_turn_stars on it.
+            All turn-level annotations within a document, sorted by
+            first-widest span. This is somewhat redundant with the
+            enclosure graph, but perhaps more convenient. The same list
+            is shared by all contexts
+
+        tstars: SpanIndex
+            Index of the turn stars in the document (eg. the span index
+            of a merge_turn_stars copy of it). Turn stars are not native
+            to the document and have to be computed separately. For
+            example, the will not be part of the enclosure graph unless
+            you apply a merge_turn_stars on it.
 
         edu: Unit
+
+        turn_edus: dict(Unit, [Unit])
+            Sorted EDUs for each turn we have seen so far (we fill
+            this in as we go, so that all contexts of EDUs in the same
+            turn share the list)
+
+        dialogue_turns: dict(Unit, [Unit])
+            Likewise, sorted turns for each dialogue
         """
         turn = cls._the(edu, enclosure.outside(edu), 'Turn')
-        tstar = cls._the(edu, containing(edu.text_span(), doc_tstars), 'Turn')
-        t_edus = [x for x in enclosure.inside(turn) if is_edu(x)]
-        assert t_edus
+        tstar = cls._the(edu,
+                         tstars.enclosing(edu.text_span(), types='Turn'),
+                         'Turn')
+        if turn not in turn_edus:
+            t_edus = [x for x in enclosure.inside(turn) if is_edu(x)]
+            assert t_edus
+            turn_edus[turn] = sorted_first_widest(t_edus)
         dialogue = cls._the(edu, enclosure.outside(turn), 'Dialogue')
-        d_turns = [x for x in enclosure.inside(dialogue) if is_turn(x)]
-        assert d_turns
+        if dialogue not in dialogue_turns:
+            d_turns = [x for x in enclosure.inside(dialogue) if is_turn(x)]
+            assert d_turns
+            dialogue_turns[dialogue] = sorted_first_widest(d_turns)
         tokens = [wrapped.token for wrapped in enclosure.inside(edu)
                   if isinstance(wrapped, WrappedToken)]
         return cls(turn=turn,
                    tstar=tstar,
-                   turn_edus=sorted_first_widest(t_edus),
+                   turn_edus=turn_edus[turn],
                    dialogue=dialogue,
-                   dialogue_turns=sorted_first_widest(d_turns),
-                   doc_turns=sorted_first_widest(doc_turns),
+                   dialogue_turns=dialogue_turns[dialogue],
+                   doc_turns=doc_turns,
                    tokens=tokens)
 
     @classmethod
-    def for_edus(cls, doc, postags=None):
+    def for_edus(cls, doc, postags=None, enclosure=None):
         """
         Return a dictionary of context objects for each EDU in the document
 
+        Parameters
+        ----------
+        enclosure: EnclosureGraph, optional
+            Enclosure graph for the document, if you already have one
+            (eg. because you mean to keep it up to date as you edit the
+            document, see `refresh`). Otherwise we build it, with the
+            postags if any.
+
         Returns
         -------
         contexts: dict(educe.glozz.Unit, Context)
 
-            A dictionary with a context For each EDU in the document
+            A dictionary with a context For each EDU in the document.
+            Contexts of EDUs in the same turn (resp. dialogue) share
+            the same `turn_edus` (resp. `dialogue_turns`) list, and
+            all of them share `doc_turns`, so do not modify these
         """
-        if postags:
+        if enclosure is not None:
+            egraph = enclosure
+        elif postags:
             egraph = EnclosureGraph(doc, postags)
         else:
             egraph = EnclosureGraph(doc)
-        doc_turns = [x for x in doc.units if is_turn(x)]
+        doc_turns = sorted_first_widest(doc.view(is_turn))
         # pylint: disable=bare-except
         # TODO: it would be nice if merge_turn_stars could return a
         # smaller exception for its difficulties
@@ -241,12 +296,86 @@ class Context(object):
             warnings.warn(oops)
             tstar_doc = doc
         # pylint: enable=bare-except
-        tstars = [x for x in tstar_doc.units if is_turn(x)]
+        tstars = tstar_doc.span_index
+        turn_edus = {}
+        dialogue_turns = {}
         contexts = {}
-        for edu in doc.units:
-            if not is_edu(edu):
-                continue
-            contexts[edu] = cls._for_edu(egraph, doc_turns, tstars, edu)
+        for edu in doc.view(is_edu):
+            contexts[edu] = cls._for_edu(egraph, doc_turns, tstars, edu,
+                                         turn_edus, dialogue_turns)
+        return contexts
+
+    @classmethod
+    def refresh(cls, contexts, doc, enclosure, spans):
+        """
+        Update a dictionary of contexts (from `for_edus`) in place after
+        editing the document, recomputing only the contexts of the EDUs
+        whose turn or dialogue may have changed: new EDUs, and those
+        which, or whose dialogue, touch any of the edited spans. EDUs
+        that are no longer in the document are dropped.
+
+        Parameters
+        ----------
+        enclosure: EnclosureGraph
+            Enclosure graph for the document, already brought up to
+            date (see `educe.graph.EnclosureGraph.add_annotation` and
+            friends)
+
+        spans: iterable(Span)
+            The text spans that were edited: the old and the new spans
+            of any annotation that was added, removed or moved
+
+        Returns
+        -------
+        contexts: dict(educe.glozz.Unit, Context)
+            The same dictionary
+        """
+        spans = list(spans)
+
+        def touched(span):
+            "if the span touches (overlaps or abuts) an edited span"
+            return any(span.char_start <= x.char_end and
+                       x.char_start <= span.char_end for x in spans)
+
+        edus = doc.view(is_edu)
+        current = set(edus)
+        for edu in list(contexts):
+            if edu not in current:
+                del contexts[edu]
+        doc_turns = sorted_first_widest(doc.view(is_turn))
+        stale = [edu for edu in edus
+                 if edu not in contexts or
+                 touched(edu.text_span()) or
+                 touched(contexts[edu].dialogue.text_span())]
+        for ctx in contexts.values():
+            ctx.doc_turns = doc_turns
+        if not stale:
+            return contexts
+
+        # turn stars for the dialogues that the stale EDUs are in now
+        dialogues = set()
+        for edu in stale:
+            for dia in doc.span_index.enclosing(edu.text_span(),
+                                                types='Dialogue'):
+                dialogues.add(dia)
+        tstars = []
+        for dia in dialogues:
+            # pylint: disable=bare-except
+            try:
+                tstars.extend(_turn_stars(doc, dia))
+            except:
+                # as in for_edus
+                oops = "Could not merge turn stars for dialogue %s in doc: %s"\
+                    % (dia.identifier(), doc.origin)
+                warnings.warn(oops)
+                tstars.extend(turns_in_span(doc, dia.text_span()))
+            # pylint: enable=bare-except
+        tstars = SpanIndex(tstars)
+        turn_edus = {}
+        dialogue_turns = {}
+        for edu in stale:
+            contexts[edu] = cls._for_edu(enclosure, doc_turns, tstars, edu,
+                                         turn_edus, dialogue_turns)
         return contexts
 
 
@@ -270,7 +399,12 @@ def enclosed(span, annos):
     """
     Given an iterable of standoff, pick just those that are
     enclosed by the given span (ie. are smaller and within)
+
+    If given a document instead, we look up its units in its
+    `span_index`
     """
+    if isinstance(annos, Document):
+        return annos.span_index.enclosed_by(span)
     return [anno for anno in annos if span.encloses(anno.span)]
 
 
@@ -278,7 +412,12 @@ def containing(span, annos):
     """
     Given an iterable of standoff, pick just those that
     enclose/contain the given span (ie. are bigger and around)
+
+    If given a document instead, we look up its units in its
+    `span_index`
     """
+    if isinstance(annos, Document):
+        return annos.span_index.enclosing(span)
     return [anno for anno in annos if anno.span.encloses(span)]
 
 
@@ -287,7 +426,7 @@ def edus_in_span(doc, span):
     Given an document and a text span return the EDUs the
     document contains in that span
     """
-    return [anno for anno in enclosed(span, doc.units)
+    return [anno for anno in enclosed(span, doc)
             if is_edu(anno)]
 
 
@@ -296,5 +435,4 @@ def turns_in_span(doc, span):
     Given a document and a text span, return the turns that the
     document contains in that span
     """
-    return [anno for anno in enclosed(span, doc.units)
-            if is_turn(anno)]
+    return doc.span_index.enclosed_by(span, types='Turn')
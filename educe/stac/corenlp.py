@@ -42,8 +42,7 @@ def turn_id_text(doc):
     Return a list of (turn ids, text) tuples
     in span order (no speaker)
     """
-    turns = sorted(filter(stac.is_turn, doc.units),
-                   key=lambda k: k.text_span())
+    turns = doc.units_of_type('Turn')
     return [(stac.turn_id(turn),
              stac.split_turn_text(doc.text(turn.text_span()))[1])
             for turn in turns]
@@ -70,7 +69,7 @@ def run_pipeline(corpus, outdir, corenlp_dir, split=False):
         turns = []
         for k in corpus:
             if k.doc == d:
-                turns.extend(list(filter(stac.is_turn, corpus[k].units)))
+                turns.extend(corpus[k].view(stac.is_turn))
         turn_ids  = [ int(t.features['Identifier']) for t in turns ]
         digits[d] = max(2,int(math.ceil(math.log10(max(turn_ids)))))
 
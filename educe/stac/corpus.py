@@ -5,17 +5,16 @@
 Corpus layout conventions (re-exported by educe.stac)
 """
 
-from collections import OrderedDict
+from collections import OrderedDict, defaultdict
 from glob import glob
 import copy
 import os
 import re
-import sys
 
-from educe.corpus import FileId
+from educe.corpus import DirectoryIndex, FileId
 import educe.corpus
 import educe.glozz as glozz
-from .annotation import STAC_OUTPUT_SETTINGS
+from .annotation import STAC_OUTPUT_SETTINGS, twin_from
 
 # pylint: disable=too-few-public-methods
 
@@ -24,13 +23,23 @@ class Reader(educe.corpus.Reader):
     """
     See `educe.corpus.Reader` for details
     """
-    def __init__(self, corpusdir):
-        educe.corpus.Reader.__init__(self, corpusdir)
-
-    def files(self):
+    def __init__(self, corpusdir, cache_dir=None):
+        educe.corpus.Reader.__init__(self, corpusdir, cache_dir=cache_dir)
+
+    def files(self, rescan=False):
+        """
+        See `educe.corpus.Reader.files`
+
+        If we have a cache directory, we remember the directory listings
+        from one call to the next in an index there (see
+        `educe.corpus.DirectoryIndex`), and only list directories that
+        have been modified since. Pass `rescan=True` to ignore the index
+        and list everything
+        """
         corpus = OrderedDict()
-        full_glob = os.path.join(self.rootdir, '*')
-        anno_glob = '*.aa'
+        cache_dir = self.cache.cache_dir if self.cache else None
+        index = DirectoryIndex(self.rootdir, cache_dir=cache_dir,
+                               rescan=rescan)
 
         def register(stage, annotator, anno_file):
             """
@@ -52,38 +61,32 @@ class Reader(educe.corpus.Reader):
                                 "the form doc_subdocument: %s", subdoc)
             corpus[file_id] = (anno_file, text_file)
 
-        for doc_dir in sorted(glob(full_glob)):
-            doc = os.path.basename(doc_dir)
+        def anno_files(anno_dir):
+            """
+            Annotation files in a directory (as with `glob(*.aa)`)
+            """
+            return [os.path.join(anno_dir, f)
+                    for f in _visible(index.listdir(anno_dir))
+                    if f.endswith('.aa')]
+
+        for doc in sorted(_visible(index.listdir(self.rootdir))):
+            doc_dir = os.path.join(self.rootdir, doc)
             for stage in ['unannotated', 'units', 'discourse']:
                 stage_dir = os.path.join(doc_dir, stage)
                 if stage == 'unannotated':
-                    unannotated_files = glob(os.path.join(stage_dir,
-                                                          anno_glob))
-                    for anno_file in unannotated_files:
+                    for anno_file in anno_files(stage_dir):
                         register(stage, None, anno_file)
-                elif os.path.exists(stage_dir):
-                    for annotator in os.listdir(stage_dir):
+                else:
+                    for annotator in index.listdir(stage_dir) or []:
                         anno_dir = os.path.join(stage_dir, annotator)
-                        anno_files = glob(os.path.join(anno_dir, anno_glob))
-                        for anno_file in anno_files:
+                        for anno_file in anno_files(anno_dir):
                             register(stage, annotator, anno_file)
+        index.save()
         return corpus
 
-    def slurp_subcorpus(self, cfiles, verbose=False):
-        corpus = {}
-        counter = 0
-        for k in cfiles.keys():
-            if verbose:
-                sys.stderr.write("\rSlurping corpus dir [%d/%d]" %
-                                 (counter, len(cfiles)))
-            annotations = glozz.read_annotation_file(*cfiles[k])
-            annotations.set_origin(k)
-            corpus[k] = annotations
-            counter = counter+1
-        if verbose:
-            sys.stderr.write("\rSlurping corpus dir [%d/%d done]\n" %
-                             (counter, len(cfiles)))
-        return corpus
+    def slurp_subcorpus(self, cfiles, verbose=False, jobs=1):
+        return self._slurp_with(glozz.read_annotation_file, cfiles,
+                                verbose=verbose, jobs=jobs)
 
 
 class LiveInputReader(Reader):
@@ -97,8 +100,8 @@ class LiveInputReader(Reader):
     stage is `'unannotated'`
     """
 
-    def __init__(self, corpusdir):
-        Reader.__init__(self, corpusdir)
+    def __init__(self, corpusdir, cache_dir=None):
+        Reader.__init__(self, corpusdir, cache_dir=cache_dir)
 
     def files(self):
         corpus = {}
@@ -113,6 +116,14 @@ class LiveInputReader(Reader):
         return corpus
 
 
+def _visible(names):
+    """
+    Non-hidden directory entries (as `glob` would return),
+    given a possibly None listing
+    """
+    return [x for x in names or [] if not x.startswith('.')]
+
+
 def id_to_path(k):
     """
     Given a fleshed out FileId (none of the fields are None),
@@ -122,7 +133,7 @@ def id_to_path(k):
     this path
     """
     for field in ["doc", "stage"]:
-        if k.__dict__[field] is None:
+        if getattr(k, field) is None:
             raise Exception("Need all FileId fields to be set"
                             " (%s is unset)" % field)
     root = k.doc
@@ -173,3 +184,49 @@ def twin_key(key, stage):
     if stage == 'unannotated':
         key2.annotator = None
     return key2
+
+
+class TwinIndex(object):
+    """
+    Index of a corpus by document, subdocument and stage, for
+    finding the equivalent of a document (or of an annotation,
+    by local identifier) in some other stage without scanning the
+    corpus.
+
+    :param corpus: dictionary from `FileId` to document
+    """
+    def __init__(self, corpus):
+        self.corpus = corpus
+        self._keys = defaultdict(list)
+        for key in corpus:
+            self._keys[(key.doc, key.subdoc, key.stage)].append(key)
+
+    def twin_key(self, key, stage):
+        """
+        Key for the document in the given stage corresponding to this
+        one, or None if the corpus has no such document.
+
+        This is the one with the same annotator (see `twin_key`),
+        except if the key has no annotator (eg. unannotated stage),
+        in which case we return the first one we have
+        """
+        if key.annotator is None:
+            keys = self._keys.get((key.doc, key.subdoc, stage))
+            return keys[0] if keys else None
+        key2 = twin_key(key, stage)
+        return key2 if key2 in self.corpus else None
+
+    def twin(self, anno, stage='units'):
+        """
+        Equivalent of an annotation (same local identifier) in
+        the given stage, or None if there is none (see
+        `educe.stac.annotation.twin`)
+
+        Note that the annotation's origin must be set
+        """
+        if anno.origin is None:
+            raise Exception('Annotation origin must be set')
+        key = self.twin_key(anno.origin, stage)
+        if key is None:
+            return None
+        return twin_from(self.corpus[key], anno)
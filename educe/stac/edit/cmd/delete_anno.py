@@ -10,7 +10,7 @@ from educe.stac.util.args import\
     add_usual_input_args, add_usual_output_args,\
     read_corpus, get_output_dir, announce_output_dir,\
     anno_id
-from educe.stac.util.glozz import anno_id_from_tuple, anno_id_to_tuple
+from educe.stac.util.glozz import anno_id_from_tuple
 from educe.stac.util.output import save_document
 
 
@@ -20,8 +20,7 @@ def _delete_in_doc(del_id, doc):
     NB: modifies doc
     """
     pretty_id = anno_id_from_tuple(del_id)
-    is_ok = lambda x: anno_id_to_tuple(x.local_id()) != del_id
-    matches = [x for x in doc.annotations() if not is_ok(x)]
+    matches = doc.all_by_id(pretty_id)
 
     if not matches:
         print("Skipping... no annotations found with id %s" % pretty_id,
@@ -30,9 +29,11 @@ def _delete_in_doc(del_id, doc):
     elif len(matches) > 1:
         sys.exit("Huh?! More than one annotation with id %s" % pretty_id)
 
+    is_ok = lambda x: x is not matches[0]
     doc.units = [x for x in doc.units if is_ok(x)]
     doc.relations = [x for x in doc.relations if is_ok(x)]
     doc.schemas = [x for x in doc.schemas if is_ok(x)]
+    doc.bump_version()
 
     def oops(reason):
         "quit because of illegal delete"
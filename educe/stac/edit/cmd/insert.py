@@ -63,7 +63,8 @@ def main(args):
     src_doc = src_corpus.values()[0]
 
     reader = educe.stac.Reader(args.corpus)
-    tgt_files = reader.filter(reader.files(), is_requested(args))
+    all_files = reader.files(rescan=args.__dict__.get('rescan', False))
+    tgt_files = reader.filter(all_files, is_requested(args))
     tgt_corpus = reader.slurp(tgt_files)
 
     renames = compute_renames(tgt_corpus, src_corpus)
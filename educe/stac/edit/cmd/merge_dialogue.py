@@ -9,7 +9,7 @@ from __future__ import print_function
 import copy
 import sys
 
-from educe.annotation import Span
+from educe.annotation import Span, Unit
 from educe.glozz import GlozzException
 
 from educe.stac.util.annotate import annotate_doc
@@ -24,13 +24,13 @@ from educe.stac.util.glozz import\
 from educe.stac.util.output import save_document
 
 
-def _get_annotation_with_id(sought_tuple, annotations):
+def _get_annotation_with_id(sought_tuple, doc):
     """
-    Given a tuple (author,creation_date), pick out the one annotation
-    whose id matches.  There must be exactly one.
+    Given a tuple (author,creation_date), pick out the one unit
+    in the document whose id matches.  There must be exactly one.
     """
     sought = anno_id_from_tuple(sought_tuple)
-    candidates = [x for x in annotations if x.local_id() == sought]
+    candidates = [x for x in doc.all_by_id(sought) if isinstance(x, Unit)]
     if len(candidates) == 1:
         return candidates[0]
     elif len(candidates) > 1:
@@ -100,7 +100,7 @@ def _merge_dialogues_in_document(sought, doc):
 
     NB: modifies the document
     """
-    dialogues_ = [_get_annotation_with_id(d, doc.units) for d in sought]
+    dialogues_ = [_get_annotation_with_id(d, doc) for d in sought]
     dialogues = sorted(dialogues_,
                        key=lambda x: x.text_span().char_start)
     combined = copy.deepcopy(dialogues[0])
@@ -116,6 +116,7 @@ def _merge_dialogues_in_document(sought, doc):
             break
     for dialogue in dialogues:
         doc.units.remove(dialogue)
+    doc.bump_version()
 
 
 # ---------------------------------------------------------------------
@@ -155,7 +156,7 @@ def commit_msg(args, corpus, k, sought):
     """
     doc = corpus[k]
     dstr = ", ".join(anno_id_from_tuple(x) for x in sought)
-    dialogues = [_get_annotation_with_id(d, doc.units) for d in sought]
+    dialogues = [_get_annotation_with_id(d, doc) for d in sought]
     if dialogues:
         title_fmt = u"{doc}_{subdoc}: merge dialogues{hint}"
         title_hint = " (turns %d-%d)" % tuple(args.turns) if args.turns else ""
@@ -102,6 +102,7 @@ def _actually_merge(tcache, edus, doc):
         if edu in doc.units:
             doc.units.remove(edu)
         retarget(doc, edu.local_id(), new_edu)
+    doc.bump_version()
 
 
 def _merge_edus(tcache, span, doc):
@@ -48,7 +48,8 @@ def read_source_corpus(args):
     Read the part of the corpus that we want to move from
     """
     reader = educe.stac.Reader(args.corpus)
-    src_files = reader.filter(reader.files(), is_requested(args))
+    all_files = reader.files(rescan=args.__dict__.get('rescan', False))
+    src_files = reader.filter(all_files, is_requested(args))
     return reader.slurp(src_files)
 
 
@@ -57,7 +58,8 @@ def read_target_corpus(args):
     Read the part of the corpus that we want to move to
     """
     reader = educe.stac.Reader(args.corpus)
-    tgt_files = reader.filter(reader.files(), is_target(args))
+    all_files = reader.files(rescan=args.__dict__.get('rescan', False))
+    tgt_files = reader.filter(all_files, is_target(args))
     return reader.slurp(tgt_files)
 
 # ---------------------------------------------------------------------
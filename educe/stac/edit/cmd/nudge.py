@@ -28,11 +28,8 @@ def _enclosing_turn_span(doc, span):
     Return the span for any turn annotations that enclose this span.
     If none are found, return the span itself
     """
-    def is_match(anno):
-        "enclosing turn"
-        return educe.stac.is_turn(anno) and anno.text_span().encloses(span)
-    spans = [span] + [u.text_span() for u in doc.units if is_match(u)]
-    return Span.merge_all(spans)
+    turns = doc.span_index.enclosing(span, types='Turn')
+    return Span.merge_all([span] + [u.text_span() for u in turns])
 
 
 def _is_nudge(offset):
@@ -173,6 +170,7 @@ def main(args):
                 anno.span = copy.deepcopy(new_span)
                 found = True
         if found:
+            new_doc.bump_version()
             diffs = _mini_diff(k, (old_doc, old_span), (new_doc, new_span))
             print("\n".join(diffs).encode('utf-8'), file=sys.stderr)
         else:
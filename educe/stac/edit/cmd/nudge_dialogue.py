@@ -125,11 +125,13 @@ def _nudge_dialogue(doc, tid, direction):
                  [x for x in doc.units if st.is_dialogue(x)])
 
     if direction == "up":
-        return _nudge_up(turn, dialogue, next_turn, prev_dialogue)
+        span = _nudge_up(turn, dialogue, next_turn, prev_dialogue)
     elif direction == "down":
-        return _nudge_down(turn, dialogue, prev_turn, next_dialogue)
+        span = _nudge_down(turn, dialogue, prev_turn, next_dialogue)
     else:
         raise Exception("Unknown direction " + direction)
+    doc.bump_version()
+    return span
 
 
 # ---------------------------------------------------------------------
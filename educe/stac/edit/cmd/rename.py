@@ -13,7 +13,7 @@ from educe.stac.util.args import\
     read_corpus, get_output_dir, announce_output_dir,\
     anno_id
 from educe.stac.util.doc import compute_renames, evil_set_id
-from educe.stac.util.glozz import anno_id_from_tuple, anno_id_to_tuple
+from educe.stac.util.glozz import anno_id_from_tuple
 from educe.stac.util.output import save_document
 
 
@@ -21,8 +21,7 @@ def _has_named_annotation(target, doc):
     """
     Return True if the given document has the target annotation
     """
-    return any(anno_id_to_tuple(x.local_id()) == target
-               for x in  doc.annotations())
+    return bool(doc.all_by_id(anno_id_from_tuple(target)))
 
 
 def _get_target(args, source, corpus):
@@ -54,9 +53,8 @@ def _rename_in_doc(source, target, doc):
 
     NB: modifies doc
     """
-    matches = [x for x in doc.annotations() if
-               anno_id_to_tuple(x.local_id()) == source]
     pretty_source = anno_id_from_tuple(source)
+    matches = doc.all_by_id(pretty_source)
     pretty_target = anno_id_from_tuple(target)
     target_author, target_date = target
 
@@ -79,6 +77,7 @@ def _rename_in_doc(source, target, doc):
         anno.units = replace_pointer(anno.units)
         anno.relations = replace_pointer(anno.relations)
         anno.schemas = replace_pointer(anno.schemas)
+    doc.bump_version()
 
 # ---------------------------------------------------------------------
 # command and options
@@ -80,5 +80,6 @@ def main(args):
             doc.units = _diff_friendly(doc.units)
             doc.relations = _diff_friendly(doc.relations)
             doc.schemas = _diff_friendly(doc.schemas)
+            doc.bump_version()
         save_document(output_dir, k, doc)
     announce_output_dir(output_dir)
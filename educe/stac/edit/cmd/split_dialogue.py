@@ -64,6 +64,7 @@ def _actually_split(tcache, doc, dialogue, turn):
     _set(tcache, span2, dialogue2)
     doc.units.append(dialogue2)
     dialogue2.features = {}
+    doc.bump_version()
 
 
 def _the(desc, items):
@@ -87,6 +87,7 @@ def _tweak_presplit(tcache, doc, spans):
                 units2.remove(unit)
                 units2.add(renames[unit])
         schema.units = units2
+    doc.bump_version()
 
 
 def _actually_split(tcache, doc, spans, edu):
@@ -129,6 +130,7 @@ def _actually_split(tcache, doc, spans, edu):
     doc.units.remove(edu)
     if want_cdu:
         doc.schemas.append(cdu)
+    doc.bump_version()
 
 
 def _split_edu(tcache, k, doc, spans):
@@ -29,7 +29,6 @@ feature-extraction
 # pylint: disable=too-few-public-methods
 
 from __future__ import print_function
-import copy
 import itertools as itr
 
 from educe.annotation import (Span, Unit)
@@ -217,6 +216,10 @@ def fuse_edus(discourse_doc, unit_doc, postags):
     """Return a copy of the discourse level doc, merging info
     from both the discourse and units stage.
 
+    The copy is an overlay of the discourse doc (see
+    `educe.annotation.Document.overlay`): it only copies the relations
+    that need to point to the new EDUs, and shares everything else.
+
     All EDUs will be converted to higher level EDUs.
 
     Notes
@@ -240,11 +243,10 @@ def fuse_edus(discourse_doc, unit_doc, postags):
       with automatically generated annotations, where all bets are off
       time-stamp wise).
     """
-    doc = copy.deepcopy(discourse_doc)
+    doc = discourse_doc.overlay()
 
     # first pass: create the EDU objects
-    annos = sorted([x for x in doc.units if is_edu(x)],
-                   key=lambda x: x.span)
+    annos = sorted(doc.view(is_edu), key=lambda x: x.span)
     replacements = {}
     for anno in annos:
         unit_anno = None if unit_doc is None else twin_from(unit_doc, anno)
@@ -253,21 +255,15 @@ def fuse_edus(discourse_doc, unit_doc, postags):
 
     # second pass: rewrite doc so that annotations that corresponds
     # to EDUs are replacement by their higher-level equivalents
-    edus = []
-    for anno in annos:
-        edu = replacements[anno]
-        edus.append(edu)
-        doc.units.remove(anno)
-        doc.units.append(edu)
-        for rel in doc.relations:
-            if rel.source == anno:
-                rel.source = edu
-            if rel.target == anno:
-                rel.target = edu
-        for schema in doc.schemas:
-            if anno in schema.units:
-                schema.units.remove(anno)
-                schema.units.append(edu)
+    # (schemas only refer to their members by id, so they stay as is)
+    edus = [replacements[anno] for anno in annos]
+    doc.units = [x for x in doc.units if x not in replacements] + edus
+    for rel in list(doc.relations):
+        if rel.source in replacements or rel.target in replacements:
+            rel = doc.own(rel)
+            rel.source = replacements.get(rel.source, rel.source)
+            rel.target = replacements.get(rel.target, rel.target)
+    doc.bump_version()
 
     # fourth pass: flesh out the EDUs with contextual info
     # now the EDUs should be work as contexts too
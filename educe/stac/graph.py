@@ -7,7 +7,7 @@
 STAC-specific conventions related to graphs.
 """
 
-import copy
+from collections import OrderedDict
 import re
 import textwrap
 
@@ -20,6 +20,9 @@ import educe.stac.annotation as stac_anno
 
 # pylint: disable=too-few-public-methods
 
+# what we call graph snapshots in the corpus cache (see `graph_snapshots`)
+_SNAPSHOT_NAME = 'educe.stac.graph.Graph.snapshot'
+
 # ---------------------------------------------------------------------
 #
 # ---------------------------------------------------------------------
@@ -74,27 +77,30 @@ class Graph(educe.graph.Graph):
         * If the CDU contains more than one head (annotation error)
           and if sloppy is True, return the textually leftmost one;
           otherwise, raise a MultiheadedCduException
+
+        Heads are remembered until the graph changes
         """
         if self.has_node(cdu):
             hyperedge = self.mirror(cdu)
         else:
             hyperedge = cdu
+        memo = self._cdu_tree().memo
+        if ('head', hyperedge, sloppy) in memo:
+            return memo['head', hyperedge, sloppy]
 
         members = self.cdu_members(cdu)
-        candidates = []
-        # pylint seems confused by our use of inheritence
+        # members that some other member of this CDU points to
+        pointed_to = set()
         for mem in members:
-            def points_to_me(lnk):
-                """some other member of this CDU points to me
-                via this link"""
-                return (lnk != hyperedge
-                        and self.is_relation(lnk)
-                        and self.links(lnk)[1] == mem
-                        and self.links(lnk)[0] in members)
-
-            pointed_to = any(points_to_me(l) for l in self.links(mem))
-            if not (self.is_relation(mem) or pointed_to):
-                candidates.append(mem)
+            for lnk in self.links(mem):
+                if lnk == hyperedge or not self.is_relation(lnk):
+                    continue
+                links = self.links(lnk)
+                if links[1] == mem and links[0] in members:
+                    pointed_to.add(mem)
+                    break
+        candidates = [mem for mem in members
+                      if not (self.is_relation(mem) or mem in pointed_to)]
 
         if sloppy and not candidates:
             # this can arise if the only members of the CDU form a loop
@@ -103,21 +109,26 @@ class Graph(educe.graph.Graph):
                     candidates.append(mem)
 
         if len(candidates) == 0:
-            return None
+            head = None
         elif len(candidates) == 1 or sloppy:
             cand = self.sorted_first_outermost(candidates)[0]
             if self.is_cdu(cand):
-                return self.mirror(cand)
+                head = self.mirror(cand)
             else:
-                return cand
+                head = cand
         else:
             raise MultiheadedCduException(cdu)
+        memo['head', hyperedge, sloppy] = head
+        return head
 
     def recursive_cdu_heads(self, sloppy=False):
         """
         A dictionary mapping each CDU to its recursive CDU
         head (see `cdu_head`)
         """
+        memo = self._cdu_tree().memo
+        if ('deep_heads', sloppy) in memo:
+            return dict(memo['deep_heads', sloppy])
         cache = {}
         def get_head(c):
             if c in cache:
@@ -136,18 +147,22 @@ class Graph(educe.graph.Graph):
                     return deep_hd
         for c in self.cdus():
             get_head(c)
-        return cache
+        memo['deep_heads', sloppy] = cache
+        return dict(cache)
 
     def without_cdus(self, sloppy=False):
         """
-        Return a deep copy of this graph with all CDUs removed.
+        Return a copy of this graph with all CDUs removed.
         Links involving these CDUs will point instead from/to
         their deep heads
 
-        We'll probably deprecate this function, since you could
-        just as easily call deepcopy yourself
+        The copy works on an overlay of the document (see
+        `educe.annotation.Document.overlay`), so it shares the
+        annotations that are left untouched with this graph,
+        and the corpus itself
         """
-        g2 = copy.deepcopy(self)
+        g2 = self.copy()
+        g2.doc = self.doc.overlay()
         g2.strip_cdus(sloppy)
         return g2
 
@@ -173,7 +188,7 @@ class Graph(educe.graph.Graph):
                 self.add_edge_attributes(e_edge, attrs)
                 for lnk in links:
                     lnk2 = heads[self.mirror(lnk)] if self.is_cdu(lnk) else lnk
-                    if e_edge in self.links(lnk2):
+                    if self.has_link(lnk2, e_edge):
                         # rare case where we have something that is pointing
                         # to itself
                         continue
@@ -185,17 +200,28 @@ class Graph(educe.graph.Graph):
         # to be on the safe side, we should also do similar link-rewriting
         # but on the underlying educe.annotation objects layer
         # (symptom of a yucky design) :-(
-        for rel in self.doc.relations:
+        # (only touching the relations that change, so that we leave
+        # alone the ones we share with the base of an overlay document)
+        for rel in list(self.doc.relations):
             if stac.is_relation_instance(rel):
                 src = rel.source
                 tgt = rel.target
                 src2 = anno_heads.get(src, src)
                 tgt2 = anno_heads.get(tgt, tgt)
-                rel.source = src2
-                rel.target = tgt2
-                rel.span = annotation.RelSpan(src2.local_id(), tgt2.local_id())
+                if src2 is src and tgt2 is tgt:
+                    continue
+                rel2 = self.doc.own(rel)
+                rel2.source = src2
+                rel2.target = tgt2
+                rel2.span = annotation.RelSpan(src2.local_id(),
+                                               tgt2.local_id())
+                edge = self._mk_edge_id(rel.local_id())
+                if rel2 is not rel and self.has_edge(edge) and\
+                        self.annotation(edge) is rel:
+                    self._set_annotation(edge, rel2)
         # remove the actual CDU objects too
         self.doc.schemas = [s for s in self.doc.schemas if not stac.is_cdu(s)]
+        self.doc.bump_version()
 
     # --------------------------------------------------
     # right frontier constraint
@@ -228,6 +254,40 @@ class Graph(educe.graph.Graph):
         return self.sorted_first_outermost(dus)
 
 
+def graph_snapshots(reader, anno_files, jobs=1):
+    """
+    Return a dictionary from FileId to a snapshot of the graph
+    (`Graph.from_doc`) of each document in `anno_files`
+    (see `educe.graph.GraphSnapshot`, and `Graph.from_snapshot`
+    to turn them back into graphs).
+
+    If the reader has a cache (see the `cache_dir` parameter to
+    `educe.stac.Reader`), we keep the snapshots in it alongside
+    the parsed documents, and only read the documents (and build
+    their graphs) whose files have changed since we last did so.
+
+    :param reader: reader for the corpus
+    :type  reader: `educe.stac.Reader`
+
+    :param anno_files: files to read, as returned by `reader.files()`
+    :type  anno_files: dict
+
+    :param jobs: number of processes to read the documents with
+                 (see `educe.corpus.Reader.slurp`)
+    :type  jobs: int
+    """
+    def compute(keys):
+        "snapshots of the graphs for some of the documents"
+        corpus = reader.slurp(OrderedDict((k, anno_files[k]) for k in keys),
+                              jobs=jobs)
+        return OrderedDict((k, Graph.from_doc(corpus, k).snapshot())
+                           for k in keys)
+
+    if reader.cache is None:
+        return compute(list(anno_files))
+    return reader.cache.fetch_many(_SNAPSHOT_NAME, anno_files, compute)
+
+
 class DotGraph(educe.graph.DotGraph):
     """
     A dot representation of this graph for visualisation.
@@ -404,13 +464,29 @@ class EnclosureGraph(educe.graph.EnclosureGraph):
     """
     _BLACKLIST = ["Preference", "Resource", "paragraph"]
 
-    def __init__(self, doc, postags=None):
+    def __init__(self, doc, postags=None, snapshot=None):
         annos = [anno for anno in doc.units
                  if anno.type not in EnclosureGraph._BLACKLIST]
         if postags:
             annos += [WrappedToken(tok) for tok in postags]
         super(EnclosureGraph, self).__init__(annos,
-                                             key=_stac_enclosure_ranking)
+                                             key=_stac_enclosure_ranking,
+                                             snapshot=snapshot)
+
+    # annotations of the blacklisted types are not in the graph,
+    # so editing them leaves it alone
+
+    def add_annotation(self, anno):
+        if anno.type not in EnclosureGraph._BLACKLIST:
+            super(EnclosureGraph, self).add_annotation(anno)
+
+    def remove_annotation(self, anno):
+        if anno.type not in EnclosureGraph._BLACKLIST:
+            super(EnclosureGraph, self).remove_annotation(anno)
+
+    def update_span(self, anno):
+        if anno.type not in EnclosureGraph._BLACKLIST:
+            super(EnclosureGraph, self).update_span(anno)
 
 
 class EnclosureDotGraph(educe.graph.EnclosureDotGraph):
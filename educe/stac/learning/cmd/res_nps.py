@@ -140,9 +140,12 @@ def _read_corpus_inputs(args):
     """
     is_interesting = mk_is_interesting(args,
                                        preselected={"stage": ["units"]})
-    reader = educe.stac.Reader(args.corpus)
-    anno_files = reader.filter(reader.files(), is_interesting)
-    corpus = reader.slurp(anno_files, verbose=True)
+    reader = educe.stac.Reader(args.corpus,
+                               cache_dir=args.__dict__.get('cache_dir'))
+    all_files = reader.files(rescan=args.__dict__.get('rescan', False))
+    anno_files = reader.filter(all_files, is_interesting)
+    corpus = reader.slurp(anno_files, verbose=True,
+                          jobs=args.__dict__.get('jobs', 1))
 
     postags = postag.read_tags(corpus, args.corpus)
     parses = corenlp.read_results(corpus, args.corpus)
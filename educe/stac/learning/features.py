@@ -30,7 +30,7 @@ from educe.stac.annotation import speaker, addressees, is_relation_instance
 from educe.stac.context import (enclosed,
                                 edus_in_span,
                                 turns_in_span)
-from educe.stac.corpus import (twin_key)
+from educe.stac.corpus import (twin_key, TwinIndex)
 from educe.learning.csv import tune_for_csv
 from educe.learning.util import tuple_feature, underscore
 import educe.corpus
@@ -198,13 +198,12 @@ def players_for_doc(corpus, kdoc):
     speakers = set()
     docs = [corpus[k] for k in corpus if k.doc == kdoc]
     for doc in docs:
-        for anno in doc.units:
-            if educe.stac.is_turn(anno):
-                turn_speaker = speaker(anno)
-                if turn_speaker:
-                    speakers.add(turn_speaker)
-            elif educe.stac.is_edu(anno):
-                speakers.update(player_addresees(anno))
+        for turn in doc.view(educe.stac.is_turn):
+            turn_speaker = speaker(turn)
+            if turn_speaker:
+                speakers.add(turn_speaker)
+        for edu in doc.view(educe.stac.is_edu):
+            speakers.update(player_addresees(edu))
     return frozenset(speakers)
 
 
@@ -1113,30 +1112,31 @@ class FeatureCache(dict):
 # ---------------------------------------------------------------------
 
 
-def _get_unit_key(inputs, key):
+def _get_unit_key(inputs, key, twins=None):
     """
     Given the key for what is presumably a discourse level or
     unannotated document, return the key for for its unit-level
     equivalent.
+
+    :param twins: index of `inputs.corpus`, if you have built one
+                  already
+    :type twins: `TwinIndex`
     """
-    if key.annotator is None:
-        twins = [k for k in inputs.corpus if
-                 k.doc == key.doc and
-                 k.subdoc == key.subdoc and
-                 k.stage == 'units']
-        return twins[0] if twins else None
-    else:
-        twin = copy.copy(key)
-        twin.stage = 'units'
-        return twin if twin in inputs.corpus else None
+    if twins is None:
+        twins = TwinIndex(inputs.corpus)
+    return twins.twin_key(key, 'units')
 
 
-def mk_env(inputs, people, key):
+def mk_env(inputs, people, key, twins=None):
     """
     Pre-process and bundle up a representation of the current document
+
+    :param twins: index of `inputs.corpus` (pass one in if you are
+                  doing this for many documents)
+    :type twins: `TwinIndex`
     """
     doc = inputs.corpus[key]
-    unit_key = _get_unit_key(inputs, key)
+    unit_key = _get_unit_key(inputs, key, twins)
     current =\
         DocumentPlus(key=key,
                      doc=doc,
@@ -1169,10 +1169,8 @@ def relation_dict(doc, quiet=False):
     other
     """
     relations = {}
-    for rel in doc.relations:
-        if not is_relation_instance(rel):
-            # might be the odd Anaphora link lying around
-            continue
+    # (skipping the odd Anaphora link lying around)
+    for rel in doc.view(is_relation_instance):
         pair = rel.source.identifier(), rel.target.identifier()
         if pair not in relations:
             relations[pair] = rel.type
@@ -1185,15 +1183,9 @@ def relation_dict(doc, quiet=False):
                               type2=relations[pair]),
                   file=sys.stderr)
     # generate fake root links
-    for anno in doc.units:
-        if not educe.stac.is_edu(anno):
-            continue
-        is_target = False
-        for rel in doc.relations:
-            if rel.target == anno:
-                is_target = True
-                break
-        if not is_target:
+    targets = set(rel.target for rel in doc.relations)
+    for anno in doc.view(educe.stac.is_edu):
+        if anno not in targets:
             key = ROOT, anno.identifier()
             relations[key] = ROOT
     return relations
@@ -1223,8 +1215,7 @@ def _mk_high_level_dialogues(current):
     """
     doc = current.doc
     # first pass: create the EDU objects
-    edus = sorted([x for x in doc.units if educe.stac.is_edu(x)],
-                  key=lambda x: x.span)
+    edus = sorted(doc.view(educe.stac.is_edu), key=lambda x: x.span)
     edus_in_dialogues = defaultdict(list)
     for edu in edus:
         edus_in_dialogues[edu.dialogue].append(edu)
@@ -1251,10 +1242,11 @@ def mk_envs(inputs, stage):
     have on a single document
     """
     people = get_players(inputs)
+    twins = TwinIndex(inputs.corpus)
     for key in inputs.corpus:
         if key.stage != stage:
             continue
-        yield mk_env(inputs, people, key)
+        yield mk_env(inputs, people, key, twins)
 
 
 def mk_high_level_dialogues(inputs, stage):
@@ -1291,7 +1283,7 @@ def extract_single_features(inputs, stage):
         # skip any documents which are not yet annotated
         if env.current.unitdoc is None:
             continue
-        edus = [unit for unit in doc.units if educe.stac.is_edu(unit)]
+        edus = doc.view(educe.stac.is_edu)
         for edu in edus:
             vec = SingleEduKeys(env.inputs)
             vec.fill(env.current, edu)
@@ -1400,10 +1392,12 @@ def read_corpus_inputs(args):
     """
     Read and filter the part of the corpus we want features for
     """
-    reader = educe.stac.Reader(args.corpus)
-    anno_files = reader.filter(reader.files(),
-                               mk_is_interesting(args, args.single))
-    corpus = reader.slurp(anno_files, verbose=True)
+    reader = educe.stac.Reader(args.corpus,
+                               cache_dir=args.__dict__.get('cache_dir'))
+    all_files = reader.files(rescan=args.__dict__.get('rescan', False))
+    anno_files = reader.filter(all_files, mk_is_interesting(args, args.single))
+    corpus = reader.slurp(anno_files, verbose=True,
+                          jobs=args.__dict__.get('jobs', 1))
 
     if not args.ignore_cdus:
         strip_cdus(corpus)
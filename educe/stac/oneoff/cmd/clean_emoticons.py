@@ -90,6 +90,7 @@ def absorb_emoticon(doc, stamp, penult, last):
     set_anno_date(penult, stamp)
     set_anno_author(penult, "stacutil")
     retarget(doc, old_id, penult)
+    doc.bump_version()
 
 
 def turns_with_final_emoticons(doc, tags):
@@ -148,6 +149,7 @@ def merge_final_emoticons(tcache, turn_spans, doc, tags):
         penult_edu = edus[-2]
         absorb_emoticon(doc, stamp, penult_edu, last_edu)
         doc.units.remove(last_edu)
+    doc.bump_version()
 
 
 def family_banner(doc, subdoc, keys):
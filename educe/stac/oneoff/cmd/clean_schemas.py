@@ -52,5 +52,7 @@ def main(args):
                 to_delete.append(sch)
         for sch in to_delete:
             doc.schemas.remove(sch)
+        if to_delete:
+            doc.bump_version()
         save_document(output_dir, key, doc)
     announce_output_dir(output_dir)
@@ -165,6 +165,7 @@ def _weave_docs(renames, src_doc, tgt_doc):
     for tgt_anno in structural_tgt_only:
         res_doc.units.remove(tgt_anno)
 
+    res_doc.bump_version()
     return res_doc
 
 
@@ -197,7 +198,8 @@ def read_augmented_corpus(args, verbose=True):
     is_interesting = mk_is_interesting(aug_args,
                                        preselected=preselection)
     reader = educe.stac.Reader(args.augmented)
-    anno_files = reader.filter(reader.files(), is_interesting)
+    all_files = reader.files(rescan=args.__dict__.get('rescan', False))
+    anno_files = reader.filter(all_files, is_interesting)
     return reader.slurp(anno_files, verbose)
 
 
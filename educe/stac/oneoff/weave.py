@@ -176,8 +176,8 @@ def compute_updates(src_doc, tgt_doc, matches):
     for src, tgt, size in matches:
         tgt_to_src = src - tgt
         res.shift_if_ge[tgt] = tgt_to_src  # case 1 and 2
-        src_annos = enclosed(Span(src, src + size), src_doc.units)
-        tgt_annos = enclosed(Span(tgt, tgt + size), tgt_doc.units)
+        src_annos = enclosed(Span(src, src + size), src_doc)
+        tgt_annos = enclosed(Span(tgt, tgt + size), tgt_doc)
         for src_anno in src_annos:
             res.expected_src_only.remove(src_anno)  # prune from case 5
             src_span = src_anno.text_span()
@@ -38,7 +38,7 @@ def extract_turns(doc):
     Return a string representation of the document's turn text
     for use by a tagger
     """
-    turns = sorted_by_span(filter(stac.is_turn, doc.units))
+    turns = doc.units_of_type('Turn')
     def ttext(turn):
         return stac.split_turn_text(doc.text(turn.text_span()))[1]
     return "\n".join(map(ttext, turns))
@@ -92,7 +92,7 @@ def read_tags(corpus, dir):
     pos_tags = {}
     for k in corpus:
         doc   = corpus[k]
-        turns = sorted_by_span(filter(stac.is_turn, doc.units))
+        turns = doc.units_of_type('Turn')
 
         tagged_file = tagger_file_name(k, dir)
         raw_toks    = ext.read_token_file(tagged_file)
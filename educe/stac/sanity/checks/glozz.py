@@ -4,7 +4,6 @@ Sanity checker: low-level Glozz errors
 
 from __future__ import print_function
 from collections import defaultdict
-import copy
 import sys
 
 from educe import stac
@@ -233,14 +232,15 @@ def overlapping(inputs, k, is_overlap):
     doc = inputs.corpus[k]
     contexts = inputs.contexts[k]
     annos = [x for x in doc.units if is_overlap(x)]
-    annos2 = copy.copy(annos)
+    done = set()  # ids of annotations already reported
     all_overlaps = {}
     for anno in sorted(annos, key=lambda x: x.text_span()):
-        overlaps = [anno2 for anno2 in annos2
-                    if anno2 is not anno
-                    and anno2.span.overlaps(anno.span)]
+        overlaps = [anno2 for anno2
+                    in doc.span_index.overlapping(anno.text_span())
+                    if anno2 is not anno and id(anno2) not in done
+                    and is_overlap(anno2)]
         if overlaps:
-            annos2.remove(anno)
+            done.add(id(anno))
             all_overlaps[anno] = overlaps
     return [OverlapItem(doc, contexts, anno, olaps)
             for anno, olaps in all_overlaps.items()]
@@ -313,11 +313,12 @@ def horrible_context_kludge(graph, simplified_graph, contexts):
     """
     # FIXME: this is pretty horrible
     #
-    # Problem is that simplified_graph is a deepcopy of
-    # the original (see implementation in educe without_cdus),
-    # which on the one hand is safer in some ways, but on the
-    # other hand means that we can't look up annotations in the
-    # original contexts dictionary.
+    # Problem is that simplified_graph is built on a copy of
+    # the original document (these days a copy-on-write overlay,
+    # see `educe.annotation.Document.overlay`), which on the one
+    # hand is safer in some ways, but on the other hand means that
+    # we can't always look up annotations in the original contexts
+    # dictionary.
     #
     # All this horribleness could be avoided if we had
     # persistent data structures everywhere :-(
@@ -367,7 +368,7 @@ def run(inputs, k):
             rfc_violations(inputs, k, graph),
             noisy=True)
 
-    simplified_doc = copy.deepcopy(doc)
+    simplified_doc = doc.overlay()
     simplified_inputs = copy.copy(inputs)
     simplified_inputs.corpus = {k: simplified_doc}
     simplified_graph = egr.Graph.from_doc(simplified_inputs.corpus, k)
@@ -16,7 +16,6 @@ import glob
 import itertools
 import os
 import shutil
-import subprocess
 import sys
 import tempfile
 
@@ -24,7 +23,8 @@ from educe import stac
 from educe.corpus import FileId
 from educe.stac import graph as egr
 from educe.stac.corpus import (METAL_STR, twin_key)
-from educe.stac.util.args import STAC_GLOBS
+from educe.stac.util.args import STAC_GLOBS, add_rescan_arg
+from educe.stac.util.output import GraphvizRenderer
 from educe.stac.context import Context
 from educe.stac.corenlp import (parsed_file_name)
 import educe.util
@@ -142,33 +142,33 @@ def generate_graphs(settings):
     report = settings.report
 
     # generate dot files
+    dot_sources = {}
     for k in discourse_only:
         try:
             gra = egr.DotGraph(egr.Graph.from_doc(settings.corpus, k))
             dot_file = report.subreport_path(k, '.dot')
             create_dirname(dot_file)
             if gra.get_nodes():
+                dot_sources[k] = gra.to_string()
                 with codecs.open(dot_file, 'w', encoding='utf-8') as fout:
-                    print(gra.to_string(), file=fout)
+                    print(dot_sources[k], file=fout)
         except egr.DuplicateIdException:
             warning = ("Couldn't graph %s because it has duplicate "
                        "annotation ids") % dot_file
             print(warning, file=sys.stderr)
 
     # attempt to graphviz them
-    try:
-        print("Generating graphs... (you can safely ^-C here)",
-              file=sys.stderr)
-        for k in discourse_only:
-            dot_file = report.subreport_path(k, '.dot')
-            svg_file = report.subreport_path(k, '.svg')
-            if fp.exists(dot_file) and settings.draw:
-                subprocess.call('dot -T svg -o %s %s' % (svg_file, dot_file),
-                                shell=True)
-    except OSError as oops:
-        print("Couldn't run graphviz. (%s)" % oops, file=sys.stderr)
-        print("You should install it for easier sanity check debugging.",
-              file=sys.stderr)
+    if not settings.draw:
+        return
+    print("Generating graphs... (you can safely ^-C here)",
+          file=sys.stderr)
+    renderer = GraphvizRenderer(settings.jobs)
+    for k in discourse_only:
+        if k in dot_sources:
+            renderer.render(report.subreport_path(k, '.dot'),
+                            report.subreport_path(k, '.svg'),
+                            dot_sources[k])
+    renderer.wait()
 
 # ---------------------------------------------------------------------
 # index
@@ -269,24 +269,29 @@ class SanityChecker(object):
         self.corpus_dir = args.corpus
         self.corpus = None
         self.contexts = None
-        self.__init_read_corpus(is_interesting, self.corpus_dir)
+        self.__init_read_corpus(is_interesting, self.corpus_dir,
+                                jobs=args.__dict__.get('jobs', 1),
+                                cache_dir=args.__dict__.get('cache_dir'),
+                                rescan=args.__dict__.get('rescan', False))
         self.__init_set_output(args.output)
         self.report = HtmlReport(self.anno_files, self.output_dir)
         self.draw = args.draw
+        self.jobs = args.__dict__.get('jobs', 1)
 
-    def __init_read_corpus(self, is_interesting, corpus_dir):
+    def __init_read_corpus(self, is_interesting, corpus_dir,
+                           jobs=1, cache_dir=None, rescan=False):
         """
         Read the corpus specified in our args
         """
-        reader = stac.Reader(corpus_dir)
-        all_files = reader.files()
+        reader = stac.Reader(corpus_dir, cache_dir=cache_dir)
+        all_files = reader.files(rescan=rescan)
         self.anno_files = reader.filter(all_files, is_interesting)
         interesting = self.anno_files.keys()
         for key in interesting:
             ukey = twin_key(key, 'unannotated')
             if ukey in all_files:
                 self.anno_files[ukey] = all_files[ukey]
-        self.corpus = reader.slurp(self.anno_files, verbose=True)
+        self.corpus = reader.slurp(self.anno_files, verbose=True, jobs=jobs)
         self.contexts = {k: Context.for_edus(self.corpus[k])
                          for k in self.corpus}
 
@@ -386,6 +391,9 @@ def main():
                             dest='draw', default=True,
                             help='Do not draw relations graph')
     educe.util.add_corpus_filters(arg_parser)
+    educe.util.add_jobs_arg(arg_parser)
+    educe.util.add_cache_arg(arg_parser)
+    add_rescan_arg(arg_parser)
     args = arg_parser.parse_args()
 
     if args.corpus and not fp.exists(args.corpus):
@@ -13,7 +13,10 @@ import sys
 import codecs
 import os.path
 import copy
+import pickle
+import shutil
 import subprocess
+import tempfile
 
 import educe.tests
 import educe.stac.graph as stac_gr
@@ -245,6 +248,47 @@ class CduHeadTest(unittest.TestCase):
         self.assertEqual(deep_heads[ids['c1']],
                          deep_heads[ids['c2']])
 
+    def test_cdu_head_after_changes(self):
+        "cdu[e1 -> e2 -> e3], then e2 -> e1 too"
+        doc = FakeDocument([edu1, edu2, edu3],
+                           [rel1, rel2],
+                           [cdu1])
+        k = FakeKey('cdu_head_test')
+        doc.fleshout(k)
+        gra = stac_gr.Graph.from_doc({k: doc}, k)
+        ids = graph_ids(gra)
+        self.assertEqual(ids['e1'], gra.cdu_head(ids['c1']))
+        self.assertEqual({ids['c1']: ids['e1']},
+                         gra.recursive_cdu_heads())
+        # a loop leaves us with no head
+        gra.add_edge('e_loop')
+        gra.add_edge_attributes('e_loop', gra.edge_attributes(ids['r-e1-e2']))
+        gra.link(ids['e2'], 'e_loop')
+        gra.link(ids['e1'], 'e_loop')
+        self.assertEqual(None, gra.cdu_head(ids['c1']))
+        self.assertEqual({}, gra.recursive_cdu_heads())
+
+    def test_without_cdus(self):
+        "x(ab), a -> b, x -> c"
+        lg, gra = mk_graphs('#Aabc / x(ab) / Sab xc')
+        rel_ab = lg.get_edge('a', 'b')
+        rel_xc = lg.get_edge('x', 'c')
+        gra2 = gra.without_cdus()
+        doc2 = gra2.doc
+        self.assertEqual(doc2.schemas, [])
+        # untouched relations are shared, the others are copied
+        self.assertIn(rel_ab, doc2.relations)
+        self.assertNotIn(rel_xc, doc2.relations)
+        rel_ac = doc2.by_id(rel_xc.local_id())
+        self.assertIs(rel_ac.source, lg.get_node('a'))
+        self.assertEqual(set(gra2.annotation(x) for x in gra2.relations()),
+                         set(doc2.relations))
+        # and the original is left alone
+        self.assertIs(rel_xc.source, lg.get_node('x'))
+        self.assertIn(rel_xc, gra.doc.relations)
+        self.assertEqual(len(gra.doc.schemas), 1)
+        self.assertEqual(len(gra.cdus()), 1)
+
 def test_first_outermost_dus_simple():
     edu1 = FakeEDU('e1',span=(1,2))
     edu2 = FakeEDU('e2',span=(1,3))
@@ -404,3 +448,439 @@ class ThreadedRfcTest(BasicRfcTest):
         multi_violations = self.violations(graph)
         self.assertNotIn(lg.get_edge('b', 'c'), multi_violations)
         self.assertNotIn(lg.get_edge('a', 'c'), multi_violations)
+
+# ---------------------------------------------------------------------
+# corpus reading
+# ---------------------------------------------------------------------
+
+SAMPLE_CORPUS = os.path.join(os.path.dirname(__file__),
+                             '..', '..', 'data', 'stac-sample')
+
+
+class SlurpTest(unittest.TestCase):
+    def test_parallel_slurp(self):
+        reader = stac.Reader(SAMPLE_CORPUS)
+        anno_files = reader.files()
+        serial = reader.slurp(anno_files)
+        parallel = reader.slurp(anno_files, jobs=2)
+        self.assertEqual(list(anno_files.keys()), list(serial.keys()))
+        self.assertEqual(list(serial.keys()), list(parallel.keys()))
+        for key in serial:
+            self.assertEqual(key, parallel[key].origin)
+            self.assertEqual(educe.tests.doc_signature(serial[key]),
+                             educe.tests.doc_signature(parallel[key]))
+
+    def test_lazy_corpus(self):
+        reader = stac.Reader(SAMPLE_CORPUS)
+        anno_files = reader.files()
+        eager = reader.slurp(anno_files)
+        lazy = reader.open_lazy(anno_files, max_resident=2)
+        keys = list(anno_files.keys())
+        # no reading just to look at keys
+        self.assertEqual(keys, list(lazy))
+        self.assertEqual(len(keys), len(lazy))
+        self.assertIn(keys[0], lazy)
+        units_only = reader.filter(lazy, lambda k: k.stage == 'units')
+        self.assertTrue(all(k.stage == 'units' for k in units_only))
+        self.assertEqual([], lazy.resident() + units_only.resident())
+
+        pinned = lazy.pin(keys[0])
+        for key in keys[1:4]:
+            self.assertEqual(educe.tests.doc_signature(eager[key]),
+                             educe.tests.doc_signature(lazy[key]))
+        self.assertEqual([keys[0], keys[3]], lazy.resident())
+        self.assertIs(pinned, lazy[keys[0]])
+        lazy.unpin(keys[0])
+        lazy[keys[4]]
+        self.assertEqual([keys[0], keys[4]], lazy.resident())
+
+    def test_lazy_pin_many(self):
+        reader = stac.Reader(SAMPLE_CORPUS)
+        anno_files = reader.files()
+        keys = list(anno_files.keys())[:3]
+        lazy = reader.open_lazy(anno_files, max_resident=2)
+        pinned = [lazy.pin(k) for k in keys]
+        # pinning more than max_resident keeps all of them around
+        self.assertEqual(keys, lazy.resident())
+        for key, doc in zip(keys, pinned):
+            self.assertIs(doc, lazy[key])
+        self.assertRaises(KeyError, lazy.pin, 'no such key')
+        for key in keys:
+            lazy.unpin(key)
+        self.assertEqual(keys[1:], lazy.resident())
+
+    def test_cached_slurp(self):
+        cache_dir = tempfile.mkdtemp()
+        try:
+            reader = stac.Reader(SAMPLE_CORPUS, cache_dir=cache_dir)
+            anno_files = reader.files()
+            uncached = stac.Reader(SAMPLE_CORPUS).slurp(anno_files)
+            cold = reader.slurp(anno_files)
+            stats = reader.cache.stats()
+            self.assertEqual(len(anno_files), stats['entries'])
+            self.assertEqual(0, stats['stale'])
+            warm = reader.slurp(anno_files, jobs=2)
+            for key in uncached:
+                self.assertEqual(educe.tests.doc_signature(uncached[key]),
+                                 educe.tests.doc_signature(cold[key]))
+                self.assertEqual(educe.tests.doc_signature(uncached[key]),
+                                 educe.tests.doc_signature(warm[key]))
+            self.assertEqual(len(anno_files), reader.cache.clear())
+            self.assertEqual(0, reader.cache.stats()['entries'])
+        finally:
+            shutil.rmtree(cache_dir)
+
+    def test_directory_index(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            corpus_dir = os.path.join(tmpdir, 'corpus')
+            cache_dir = os.path.join(tmpdir, 'cache')
+            shutil.copytree(SAMPLE_CORPUS, corpus_dir)
+            # no cache, no index
+            stac.Reader(corpus_dir).files()
+            self.assertFalse(os.path.exists(cache_dir))
+            root_listing = sorted(os.listdir(corpus_dir))
+            scanned = stac.Reader(corpus_dir,
+                                  cache_dir=cache_dir).files(rescan=True)
+            index = corpus.DirectoryIndex(corpus_dir, cache_dir=cache_dir)
+            self.assertTrue(os.path.exists(index.filename))
+            # the corpus itself is left alone
+            self.assertEqual(root_listing, sorted(os.listdir(corpus_dir)))
+            # and another copy of it gets its own index
+            other = corpus.DirectoryIndex(SAMPLE_CORPUS, cache_dir=cache_dir)
+            self.assertNotEqual(index.filename, other.filename)
+            indexed = stac.Reader(corpus_dir, cache_dir=cache_dir).files()
+            self.assertEqual(list(scanned.items()), list(indexed.items()))
+            # new files in a directory get picked up
+            unanno_dir = os.path.join(corpus_dir, 's1-league2-game1',
+                                      'unannotated')
+            for ext in ['.aa', '.ac']:
+                shutil.copy(os.path.join(unanno_dir,
+                                         's1-league2-game1_01' + ext),
+                            os.path.join(unanno_dir,
+                                         's1-league2-game1_99' + ext))
+            new_key = FileId('s1-league2-game1', '99', 'unannotated', None)
+            self.assertIn(new_key,
+                          stac.Reader(corpus_dir, cache_dir=cache_dir).files())
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+class ContextTest(unittest.TestCase):
+    def test_refresh(self):
+        from educe.stac.context import Context
+
+        def summary(contexts):
+            "what a context says, by EDU id"
+            return dict((edu.local_id(),
+                         (ctx.turn, ctx.tstar.local_id(),
+                          ctx.tstar.text_span(), ctx.turn_edus,
+                          ctx.dialogue, ctx.dialogue_turns, ctx.doc_turns))
+                        for edu, ctx in contexts.items())
+
+        slurped = stac.Reader(SAMPLE_CORPUS).slurp()
+        key = sorted(k for k in slurped if k.stage == 'units')[0]
+        doc = slurped[key]
+        egraph = stac_gr.EnclosureGraph(doc)
+        contexts = Context.for_edus(doc, enclosure=egraph)
+        edus = sorted(doc.view(stac.is_edu), key=lambda x: x.text_span())
+        # shrink one EDU, drop another and add a new one
+        old_span = edus[1].text_span()
+        edus[1].span = annotation.Span(old_span.char_start,
+                                       old_span.char_end - 1)
+        doc.units.remove(edus[2])
+        new_edu = copy.copy(edus[3])
+        new_edu._anno_id = 'new_edu'
+        new_edu.span = annotation.Span(new_edu.span.char_start,
+                                       new_edu.span.char_start + 2)
+        doc.units.append(new_edu)
+        doc.bump_version()
+        egraph.update_span(edus[1])
+        egraph.remove_annotation(edus[2])
+        egraph.add_annotation(new_edu)
+        refreshed = Context.refresh(contexts, doc, egraph,
+                                    [old_span, edus[2].text_span(),
+                                     new_edu.text_span()])
+        self.assertIs(contexts, refreshed)
+        self.assertNotIn(edus[2], contexts)
+        self.assertIn(new_edu, contexts)
+        self.assertEqual(summary(Context.for_edus(doc)), summary(contexts))
+
+    def test_shared_lists(self):
+        from educe.stac.context import Context, sorted_first_widest
+
+        slurped = stac.Reader(SAMPLE_CORPUS).slurp()
+        key = sorted(k for k in slurped if k.stage == 'units')[0]
+        doc = slurped[key]
+        contexts = Context.for_edus(doc)
+        turn_edus = {}
+        dialogue_turns = {}
+        for edu, ctx in contexts.items():
+            self.assertEqual(sorted_first_widest(doc.view(stac.is_turn)),
+                             ctx.doc_turns)
+            self.assertIn(edu, ctx.turn_edus)
+            self.assertIn(ctx.turn, ctx.dialogue_turns)
+            # one list per turn/dialogue, not per EDU
+            self.assertIs(turn_edus.setdefault(ctx.turn, ctx.turn_edus),
+                          ctx.turn_edus)
+            self.assertIs(dialogue_turns.setdefault(ctx.dialogue,
+                                                    ctx.dialogue_turns),
+                          ctx.dialogue_turns)
+        for turn, edus in turn_edus.items():
+            self.assertEqual(sorted_first_widest(edus), edus)
+            self.assertEqual(set(edus),
+                             set(e for e in contexts
+                                 if contexts[e].turn is turn))
+        self.assertTrue(len(turn_edus) < len(contexts))
+
+
+class DuplicateIdTest(unittest.TestCase):
+    def setUp(self):
+        self.edu1 = FakeEDU('a_1', span=(0, 4))
+        self.edu2 = FakeEDU('a_1', span=(5, 9))
+        self.edu3 = FakeEDU('a_2', span=(10, 14))
+        self.doc = annotation.Document([self.edu1, self.edu2, self.edu3],
+                                       [], [], 'why hello there')
+
+    def test_twin_from(self):
+        # the first one with that id
+        self.assertIs(self.edu1, stac.twin_from(self.doc, self.edu2))
+        self.assertIs(self.edu3, stac.twin_from(self.doc, self.edu3))
+
+    def test_edits_refuse_duplicates(self):
+        from educe.stac.edit.cmd.delete_anno import _delete_in_doc
+        from educe.stac.edit.cmd.rename import _rename_in_doc
+
+        self.assertRaises(SystemExit, _delete_in_doc, ('a', 1), self.doc)
+        self.assertRaises(SystemExit, _rename_in_doc,
+                          ('a', 1), ('a', 3), self.doc)
+        self.assertEqual(['a_1', 'a_1', 'a_2'],
+                         [x.local_id() for x in self.doc.units])
+        _rename_in_doc(('a', 2), ('a', 3), self.doc)
+        self.assertEqual('a_3', self.edu3.local_id())
+        _delete_in_doc(('a', 3), self.doc)
+        self.assertEqual([self.edu1, self.edu2], self.doc.units)
+
+
+class SnapshotTest(unittest.TestCase):
+    def graph_summary(self, graph):
+        "everything about a graph but its annotation objects"
+        def attrs(x):
+            res = graph.node_attributes_dict(x) if graph.has_node(x)\
+                else graph.edge_attributes_dict(x)
+            anno = res.pop('annotation')
+            return (res, anno.local_id(), anno.type, anno.text_span())
+        return ([(n, attrs(n)) for n in graph.nodes()],
+                [(e, attrs(e), graph.links(e)) for e in graph.hyperedges()])
+
+    def test_graph_snapshot(self):
+        reader = stac.Reader(SAMPLE_CORPUS)
+        anno_files = reader.filter(reader.files(),
+                                   lambda k: k.stage == 'discourse')
+        slurped = reader.slurp(anno_files)
+        for key in slurped:
+            graph = stac_gr.Graph.from_doc(slurped, key)
+            snapshot = pickle.loads(pickle.dumps(graph.snapshot()))
+            restored = stac_gr.Graph.from_snapshot(snapshot, slurped)
+            self.assertEqual(self.graph_summary(graph),
+                             self.graph_summary(restored))
+            for x in graph.nodes() + graph.hyperedges():
+                self.assertIs(graph.annotation(x), restored.annotation(x))
+            # without the document
+            skeletal = stac_gr.Graph.from_snapshot(snapshot)
+            self.assertEqual(key, skeletal.doc.origin)
+            self.assertEqual(self.graph_summary(graph),
+                             self.graph_summary(skeletal))
+            for rfc in [BasicRfc, ThreadedRfc]:
+                self.assertEqual(sorted(rfc(graph).violations()),
+                                 sorted(rfc(skeletal).violations()))
+
+    def test_cached_snapshots(self):
+        cache_dir = tempfile.mkdtemp()
+        try:
+            reader = stac.Reader(SAMPLE_CORPUS, cache_dir=cache_dir)
+            anno_files = reader.filter(reader.files(),
+                                       lambda k: k.stage == 'discourse')
+            cold = stac_gr.graph_snapshots(reader, anno_files)
+            # one entry for each document, one for each snapshot
+            self.assertEqual(2 * len(anno_files),
+                             reader.cache.stats()['entries'])
+            warm = stac_gr.graph_snapshots(reader, anno_files)
+            uncached = stac_gr.graph_snapshots(stac.Reader(SAMPLE_CORPUS),
+                                               anno_files)
+            self.assertEqual(list(anno_files), list(warm))
+            self.assertEqual(list(anno_files), list(uncached))
+            # only the snapshots we lack get worked out again, together
+            key = list(anno_files)[0]
+            os.remove(reader.cache._entry_path(stac_gr._SNAPSHOT_NAME,
+                                               anno_files[key]))
+            calls = []
+
+            def slurp(cfiles, **kwargs):
+                "record what we read"
+                calls.append((list(cfiles), kwargs.get('jobs')))
+                return stac.Reader.slurp(reader, cfiles, **kwargs)
+
+            reader.slurp = slurp
+            stac_gr.graph_snapshots(reader, anno_files, jobs=2)
+            self.assertEqual([([key], 2)], calls)
+            for key in anno_files:
+                expected = self.graph_summary(
+                    stac_gr.Graph.from_snapshot(uncached[key]))
+                for snapshots in [cold, warm]:
+                    graph = stac_gr.Graph.from_snapshot(snapshots[key])
+                    self.assertEqual(expected, self.graph_summary(graph))
+        finally:
+            shutil.rmtree(cache_dir)
+
+    def test_enclosure_snapshot(self):
+        slurped = stac.Reader(SAMPLE_CORPUS).slurp()
+        key = sorted(k for k in slurped if k.stage == 'units')[0]
+        doc = slurped[key]
+        egraph = stac_gr.EnclosureGraph(doc)
+        snapshot = pickle.loads(pickle.dumps(egraph.snapshot()))
+        restored = stac_gr.EnclosureGraph(doc, snapshot=snapshot)
+        self.assertEqual(sorted(egraph.nodes()), sorted(restored.nodes()))
+        self.assertEqual(sorted(egraph.edges()), sorted(restored.edges()))
+        # patching a restored graph works as usual
+        edu = max(doc.view(stac.is_edu), key=lambda x: x.text_span().length())
+        edu.span = annotation.Span(edu.span.char_start,
+                                   edu.span.char_end - 1)
+        doc.bump_version()
+        restored.update_span(edu)
+        self.assertEqual(sorted(stac_gr.EnclosureGraph(doc).edges()),
+                         sorted(restored.edges()))
+        # not the annotations we took the snapshot of
+        doc.units.remove(edu)
+        self.assertRaises(Exception, stac_gr.EnclosureGraph,
+                          doc, snapshot=snapshot)
+
+
+class TwinIndexTest(unittest.TestCase):
+    def test_twins(self):
+        slurped = stac.Reader(SAMPLE_CORPUS).slurp()
+        twins = stac.TwinIndex(slurped)
+        nchecked = 0
+        for key, doc in slurped.items():
+            for anno in doc.units:
+                self.assertEqual(twins.twin(anno, key.stage), anno)
+                # same as the scanning way
+                for stage in ['units', 'discourse']:
+                    twin = twins.twin(anno, stage)
+                    key2 = stac.twin_key(key, stage)
+                    if key.annotator is None or key2 not in slurped:
+                        continue
+                    expected = [x for x in slurped[key2].annotations()
+                                if x.local_id() == anno.local_id()]
+                    self.assertEqual(twin, expected[0] if expected else None)
+                    self.assertEqual(twin, stac.twin(slurped, anno, stage))
+                    nchecked += 1
+            if key.annotator is None:
+                expected = [k for k in slurped if k.doc == key.doc
+                            and k.subdoc == key.subdoc
+                            and k.stage == 'units']
+                self.assertEqual(twins.twin_key(key, 'units'),
+                                 expected[0] if expected else None)
+        self.assertTrue(nchecked > 0)
+
+
+class GraphvizRendererTest(unittest.TestCase):
+    def test_render(self):
+        from educe.stac.util.output import GraphvizRenderer
+        tmpdir = tempfile.mkdtemp()
+        old_path = os.environ.get('PATH', '')
+        try:
+            # stand-in for graphviz which logs what it draws
+            log_file = os.path.join(tmpdir, 'log')
+            fake_dot = os.path.join(tmpdir, 'dot')
+            with open(fake_dot, 'w') as stream:
+                print('#!/bin/sh', file=stream)
+                print('echo "$5" >> %s; cp "$5" "$4"' % log_file,
+                      file=stream)
+            os.chmod(fake_dot, 0o755)
+            os.environ['PATH'] = tmpdir + os.pathsep + old_path
+
+            def render(sources):
+                "draw svg files from the given dot sources"
+                renderer = GraphvizRenderer(jobs=2)
+                for name, source in sorted(sources.items()):
+                    dot_file = os.path.join(tmpdir, name + '.dot')
+                    with open(dot_file, 'w') as stream:
+                        print(source, file=stream)
+                    renderer.render(dot_file,
+                                    os.path.join(tmpdir, name + '.svg'),
+                                    source)
+                timings = renderer.wait(quiet=True)
+                with open(log_file) as stream:
+                    drawn = sorted(os.path.basename(l.strip())
+                                   for l in stream)
+                os.remove(log_file)
+                return drawn, timings
+
+            sources = dict(('g%d' % i, 'digraph { a%d -> b }' % i)
+                           for i in range(5))
+            drawn, timings = render(sources)
+            self.assertEqual(['g%d.dot' % i for i in range(5)], drawn)
+            self.assertEqual(5, len(timings))
+            with open(os.path.join(tmpdir, 'g3.svg')) as stream:
+                self.assertEqual(sources['g3'], stream.read().strip())
+            # only the graph that changed gets drawn again
+            sources['g3'] = 'digraph { c -> d }'
+            open(log_file, 'w').close()
+            drawn, timings = render(sources)
+            self.assertEqual(['g3.dot'], drawn)
+            self.assertEqual([None] * 4,
+                             [x for _, x in timings if x is None])
+        finally:
+            os.environ['PATH'] = old_path
+            shutil.rmtree(tmpdir)
+
+
+class ColumnarTest(unittest.TestCase):
+    def test_columnar_counts(self):
+        from educe import columnar
+        from educe.stac.util.cmd import count
+
+        def plain(counts):
+            "nested defaultdicts to comparable dicts"
+            return dict((k, dict(v)) for k, v in counts.items())
+
+        slurped = stac.Reader(SAMPLE_CORPUS).slurp()
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'corpus.npz')
+            columnar.from_corpus(slurped).save(path)
+            self.assertTrue(columnar.is_columnar_file(path))
+            self.assertFalse(columnar.is_columnar_file(SAMPLE_CORPUS))
+            ccorpus = columnar.load(path)
+            self.assertEqual(sorted(slurped), ccorpus.keys)
+            key = ccorpus.keys[3]
+            doc = slurped[key]
+            rows = ccorpus.rows(3)
+            types = ccorpus.strings('types')
+            self.assertEqual([x.type for x in doc.annotations()],
+                             [types[t] for t in ccorpus['anno_type'][rows]])
+            self.assertEqual([x.span.char_start for x in doc.units],
+                             list(ccorpus['anno_start'][rows]
+                                  [:len(doc.units)]))
+
+            docs = list(range(len(ccorpus)))
+            dcounts, gcounts, gcounts2 = count.count_by_docname(slurped)
+            c_dcounts, c_gcounts, c_gcounts2 =\
+                count.columnar_count_by_docname(ccorpus, docs)
+            self.assertEqual(dict(dcounts.total), dict(c_dcounts.total))
+            self.assertEqual(plain(dcounts.struct), plain(c_dcounts.struct))
+            for objs, cols in [(gcounts, c_gcounts), (gcounts2, c_gcounts2)]:
+                self.assertEqual(dict(objs.total), dict(cols.total))
+                self.assertEqual(sorted(sorted(c.items())
+                                        for c in objs.struct.values()),
+                                 sorted(sorted(c.items())
+                                        for c in cols.struct.values()))
+            acounts = count.count_by_annotator(slurped)
+            c_acounts = count.columnar_count_by_annotator(ccorpus, docs)
+            for field in acounts._fields:
+                self.assertEqual(plain(getattr(acounts, field)),
+                                 plain(getattr(c_acounts, field)))
+            del ccorpus  # release the memory maps
+        finally:
+            shutil.rmtree(tmpdir)
@@ -14,7 +14,9 @@ import tempfile
 
 from educe.stac.corpus import METAL_STR
 import educe.annotation
+import educe.columnar
 import educe.stac
+import educe.stac.graph
 import educe.util
 
 STAC_GLOBS = frozenset([
@@ -68,17 +70,39 @@ def read_corpus(args,
     """
     is_interesting = educe.util.mk_is_interesting(args,
                                                   preselected=preselected)
-    reader = educe.stac.Reader(args.corpus)
-    anno_files = reader.filter(reader.files(), is_interesting)
-    return reader.slurp(anno_files, verbose)
+    reader = educe.stac.Reader(args.corpus,
+                               cache_dir=args.__dict__.get('cache_dir'))
+    all_files = reader.files(rescan=args.__dict__.get('rescan', False))
+    anno_files = reader.filter(all_files, is_interesting)
+    return reader.slurp(anno_files, verbose,
+                        jobs=args.__dict__.get('jobs', 1))
+
+
+def read_graph_snapshots(args,
+                         preselected=None):
+    """
+    Snapshots of the graphs of the section of the corpus specified in
+    the command line arguments (see `educe.stac.graph.graph_snapshots`).
+    With `--cache-dir`, we only read the documents that have changed
+    since the last run.
+    """
+    is_interesting = educe.util.mk_is_interesting(args,
+                                                  preselected=preselected)
+    reader = educe.stac.Reader(args.corpus,
+                               cache_dir=args.__dict__.get('cache_dir'))
+    all_files = reader.files(rescan=args.__dict__.get('rescan', False))
+    anno_files = reader.filter(all_files, is_interesting)
+    return educe.stac.graph.graph_snapshots(reader, anno_files,
+                                            jobs=args.__dict__.get('jobs', 1))
 
 
 def read_corpus_with_unannotated(args, verbose=True):
     """
     Read the section of the corpus specified in the command line arguments.
     """
-    reader = educe.stac.Reader(args.corpus)
-    all_files = reader.files()
+    reader = educe.stac.Reader(args.corpus,
+                               cache_dir=args.__dict__.get('cache_dir'))
+    all_files = reader.files(rescan=args.__dict__.get('rescan', False))
     is_interesting = educe.util.mk_is_interesting(args)
     anno_files = reader.filter(all_files, is_interesting)
     unannotated_twins = frozenset(educe.stac.twin_key(k, 'unannotated')
@@ -86,7 +110,42 @@ def read_corpus_with_unannotated(args, verbose=True):
     for key in unannotated_twins:
         if key in all_files:
             anno_files[key] = all_files[key]
-    return reader.slurp(anno_files, verbose=verbose)
+    return reader.slurp(anno_files, verbose=verbose,
+                        jobs=args.__dict__.get('jobs', 1))
+
+
+def read_columnar_corpus(args,
+                         preselected=None,
+                         with_unannotated=False):
+    """
+    Load a columnar corpus file (see `educe.columnar`) given in
+    place of the corpus directory, and return it along with the
+    indices of the documents selected by the command line arguments
+    (plus their unannotated twins if `with_unannotated`)
+    """
+    ccorpus = educe.columnar.load(args.corpus)
+    is_interesting = educe.util.mk_is_interesting(args,
+                                                  preselected=preselected)
+    wanted = frozenset(k for k in ccorpus.keys if is_interesting(k))
+    if with_unannotated:
+        wanted |= frozenset(educe.stac.twin_key(k, 'unannotated')
+                            for k in wanted)
+    docs = [i for i, k in enumerate(ccorpus.keys) if k in wanted]
+    return ccorpus, docs
+
+
+def add_rescan_arg(parser):
+    """
+    Augment an argparser with a `--rescan` option to ignore the
+    corpus directory index (see `educe.stac.Reader.files`).
+    Read it back with `args.__dict__.get('rescan', False)`
+
+    In scripts with subcommands, the option belongs to the main
+    parser, so it must come before the subcommand name.
+    """
+    parser.add_argument('--rescan', action='store_true',
+                        help='list all corpus directories, ignoring '
+                        'the saved index; give it before any subcommand')
 
 
 def get_output_dir(args, default_overwrite=False):
@@ -7,12 +7,14 @@ stac-util subcommands
 
 # pylint: disable=redefined-builtin
 # (we have a command called filter)
-from . import (count,
+from . import (columnar,
+               count,
                count_rfc,
                count_shapes,
                filter,
                filter_graph,
                graph,
+               hashcode,
                text)
 
 # at the time of this writing argparse doesn't support a way to group
@@ -25,7 +27,9 @@ SUBCOMMAND_SECTIONS =\
        count,
        count_rfc,
        count_shapes,
-       graph]),
+       graph,
+       hashcode,
+       columnar]),
      ('Filters',
       [filter,
        filter_graph])]
@@ -0,0 +1,48 @@
+# Author: Eric Kow
+# License: CeCILL-B (French BSD3-like)
+
+"""
+Save the corpus in columnar form (see `educe.columnar`)
+
+Counting commands like `count` and `count-shapes` accept the
+resulting file in place of the corpus directory, which is much
+faster than reading the corpus itself
+"""
+
+from __future__ import print_function
+import sys
+
+from educe import columnar
+
+from ..args import (add_usual_input_args,
+                    read_corpus_with_unannotated)
+
+NAME = 'columnar'
+
+
+def config_argparser(parser):
+    """
+    Subcommand flags.
+
+    You should create and pass in the subparser to which the flags
+    are to be added.
+    """
+    add_usual_input_args(parser)
+    parser.add_argument('--output', '-o', metavar='FILE', required=True,
+                        help='output file (.npz)')
+    parser.set_defaults(func=main)
+
+
+def main(args):
+    """
+    Subcommand main.
+
+    You shouldn't need to call this yourself if you're using
+    `config_argparser`
+    """
+    corpus = read_corpus_with_unannotated(args, verbose=True)
+    ccorpus = columnar.from_corpus(corpus)
+    ccorpus.save(args.output)
+    print('Columnar corpus (%d documents, %d annotations) saved to %s' %
+          (len(ccorpus), len(ccorpus['anno_kind']), args.output),
+          file=sys.stderr)
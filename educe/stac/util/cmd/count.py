@@ -3,26 +3,43 @@
 
 """
 Show number of EDUs, turns, etc
+
+The corpus may also be given as a columnar corpus file (see the
+`columnar` command), which is much faster to count over
 """
 
 from __future__ import print_function
 from collections import defaultdict, namedtuple
 import copy
 
+import numpy as np
 from tabulate import tabulate
 
 from ..args import (add_usual_input_args,
+                    read_columnar_corpus,
                     read_corpus_with_unannotated)
 from ..doc import strip_fixme
 from educe.stac.context import (merge_turn_stars)
 from educe.util import concat
+from educe import columnar
 import educe.stac
 
+
+def _is_turn_star(anno):
+    "Turn star annotation (see `with_turn_stars`)"
+    return anno.type == 'Tstar'
+
+
+def _is_edu(anno):
+    "EDU, but not a turn star (which would otherwise pass for one)"
+    return educe.stac.is_edu(anno) and not _is_turn_star(anno)
+
+
 # we have an order on this, so no dict
 SEGMENT_CATEGORIES = [("dialogue", educe.stac.is_dialogue),
-                      ("turn star", lambda x: x.type == 'Tstar'),
+                      ("turn star", _is_turn_star),
                       ("turn", educe.stac.is_turn),
-                      ("edu", educe.stac.is_edu)]
+                      ("edu", _is_edu)]
 
 
 LINK_CATEGORIES = [("rel insts", educe.stac.is_relation_instance),
@@ -50,7 +67,7 @@ def rounded_mean_median(things):
     In Python 3 we should just use statistics
     """
     length = len(things)
-    middle = length / 2
+    middle = length // 2
     sorted_things = sorted(things)
     median = sorted_things[middle] if length % 2 else\
         (sorted_things[middle] + sorted_things[middle - 1]) / 2.0
@@ -194,6 +211,13 @@ def hinted_type(anno):
     """
     Type annotation
     """
+    return _hinted_type_name(anno.type)
+
+
+def _hinted_type_name(atype):
+    """
+    Type annotation, given the annotation type
+    """
 
     def tidy(types):
         "minor touchups"
@@ -222,7 +246,7 @@ def hinted_type(anno):
         else:
             return typ
 
-    return rewrite(squish(tidy(educe.stac.split_type(anno))))
+    return rewrite(squish(tidy(frozenset(atype.split("/")))))
 
 
 def tall_summary(s_counts, total=None):
@@ -256,6 +280,21 @@ PerDialogue = namedtuple("PerDialogue",
                          ["total", "struct"])
 
 
+def with_turn_stars(doc):
+    """
+    Shallow copy of a document with an extra 'Tstar' unit for each
+    turn star, ie. run of consecutive turns by the same speaker (see
+    `educe.stac.context.merge_turn_stars`)
+    """
+    tstars = merge_turn_stars(doc).view(educe.stac.is_turn)
+    for anno in tstars:
+        anno.type = 'Tstar'
+    sdoc = copy.copy(doc)
+    sdoc.units = doc.units + tstars
+    sdoc.bump_version()
+    return sdoc
+
+
 def count_by_docname(corpus):
     """
     Return variety of counts by
@@ -286,29 +325,22 @@ def count_by_docname(corpus):
         # min/max/mean/median etc
         dcounts.struct[kdoc]["subdoc"] += len(ksubdocs)
         for k in (k for k in unannotated_keys if k.doc == kdoc):
-            doc = corpus[k]
-            tstar_doc = merge_turn_stars(doc)
-            for anno in tstar_doc.units:
-                if educe.stac.is_turn(anno):
-                    anno.type = 'Tstar'
-                    doc.units.append(anno)
+            doc = with_turn_stars(corpus[k])
             count_segments(doc, dcounts.struct[kdoc])
+            count_segments(doc, dcounts.total)
             for dlg in doc.units:
                 if not educe.stac.is_dialogue(dlg):
                     continue
                 gdoc = copy.copy(doc)
-                gdoc.units = [x for x in doc.units if dlg.encloses(x)]
+                gdoc.units = doc.span_index.enclosed_by(dlg.text_span())
+                gdoc.bump_version()
                 count_segments(gdoc, gcounts.struct[dlg])
                 count_segments(gdoc, gcounts.total)
-                if len([x for x in gdoc.units if educe.stac.is_edu(x)]) < 2:
+                if len([x for x in gdoc.units if _is_edu(x)]) < 2:
                     continue
                 # dialogues with more than one EDU
                 count_segments(gdoc, gcounts2.struct[dlg])
                 count_segments(gdoc, gcounts2.total)
-
-    for k in unannotated_keys:
-        count(corpus[k], dict(SEGMENT_CATEGORIES),
-              counts=dcounts.total)
     return dcounts, gcounts, gcounts2
 
 
@@ -346,6 +378,181 @@ def count_by_annotator(corpus):
     return acounts
 
 
+# ---------------------------------------------------------------------
+# columnar counts
+# ---------------------------------------------------------------------
+
+
+def _add_counts(counts, more):
+    """
+    Increment the counts (only for nonzero increments, so that
+    empty categories do not show up, as with `count`)
+    """
+    for key, val in more.items():
+        if val:
+            counts[key] += int(val)
+
+
+def _columnar_masks(ccorpus):
+    """
+    Dictionary from segment category to mask over the annotations
+    of a columnar corpus (no turn stars; see `_columnar_segments`)
+    """
+    blacklist = (educe.stac.STRUCTURE_TYPES +
+                 educe.stac.RESOURCE_TYPES +
+                 educe.stac.PREFERENCE_TYPES)
+    unit = columnar.KIND_UNIT
+    return {"dialogue": ccorpus.mask(kind=unit, types=['Dialogue']),
+            "turn": ccorpus.mask(kind=unit, types=['Turn']),
+            "edu": ccorpus.mask(kind=unit, exclude=blacklist)}
+
+
+def _columnar_turn_stars(starts, ends, speakers, dialogues):
+    """
+    Spans of the turn stars in a document (see `with_turn_stars`),
+    given the spans and speakers of its turns, and the spans of
+    its dialogues
+
+    :rtype: (array(int), array(int))
+    """
+    keep = np.ones(len(starts), dtype=bool)
+    t_starts = starts.copy()
+    t_ends = ends.copy()
+    d_starts, d_ends = dialogues
+    for i in np.lexsort((d_ends, d_starts)):
+        inside = np.flatnonzero((starts >= d_starts[i]) &
+                                (ends <= d_ends[i]))
+        if not len(inside):
+            continue
+        inside = inside[np.lexsort((ends[inside], starts[inside]))]
+        firsts = np.ones(len(inside), dtype=bool)
+        firsts[1:] = speakers[inside][1:] != speakers[inside][:-1]
+        bounds = np.flatnonzero(firsts)
+        t_starts[inside[firsts]] = np.minimum.reduceat(starts[inside], bounds)
+        t_ends[inside[firsts]] = np.maximum.reduceat(ends[inside], bounds)
+        keep[inside[~firsts]] = False
+    return t_starts[keep], t_ends[keep]
+
+
+def _columnar_segments(ccorpus, doc, masks, speakers):
+    """
+    Dictionary from segment category to (starts, ends) arrays for
+    the segments of the given document
+    """
+    rows = ccorpus.rows(doc)
+    starts = ccorpus['anno_start'][rows]
+    ends = ccorpus['anno_end'][rows]
+    segments = {}
+    for cat, mask in masks.items():
+        sel = mask[rows]
+        segments[cat] = (starts[sel], ends[sel])
+    turns = masks["turn"][rows]
+    segments["turn star"] = _columnar_turn_stars(starts[turns],
+                                                 ends[turns],
+                                                 speakers[rows][turns],
+                                                 segments["dialogue"])
+    return segments
+
+
+def _columnar_count_segments(segments, within=None):
+    """
+    Number of segments in each category (only those in the `within`
+    span if given)
+    """
+    counts = {}
+    for cat, (starts, ends) in segments.items():
+        if within is None:
+            counts[cat] = len(starts)
+        else:
+            counts[cat] = np.count_nonzero((starts >= within[0]) &
+                                           (ends <= within[1]))
+    return counts
+
+
+def columnar_count_by_docname(ccorpus, docs):
+    """
+    Same as `count_by_docname`, but on the given documents (indices)
+    of an `educe.columnar.ColumnarCorpus`
+    """
+    masks = _columnar_masks(ccorpus)
+    speakers = ccorpus.feature('Emitter')
+    dcounts = PerDoc(total=empty_counts(),
+                     struct=defaultdict(empty_counts))
+    gcounts = PerDialogue(total=empty_counts(),
+                          struct=defaultdict(empty_counts))
+    gcounts2 = PerDialogue(total=empty_counts(),
+                           struct=defaultdict(empty_counts))
+
+    keys = ccorpus.keys
+    unannotated = [i for i in docs if keys[i].stage == "unannotated"]
+    for kdoc in frozenset(keys[i].doc for i in unannotated):
+        ksubdocs = frozenset(keys[i].subdoc for i in unannotated
+                             if keys[i].doc == kdoc)
+        dcounts.total["doc"] += 1
+        dcounts.total["subdoc"] += len(ksubdocs)
+        dcounts.struct[kdoc]["subdoc"] += len(ksubdocs)
+        for i in (i for i in unannotated if keys[i].doc == kdoc):
+            segments = _columnar_segments(ccorpus, i, masks, speakers)
+            seg_counts = _columnar_count_segments(segments)
+            _add_counts(dcounts.struct[kdoc], seg_counts)
+            _add_counts(dcounts.total, seg_counts)
+            for dlg in zip(*segments["dialogue"]):
+                dlg_counts = _columnar_count_segments(segments, within=dlg)
+                _add_counts(gcounts.struct[(i,) + dlg], dlg_counts)
+                _add_counts(gcounts.total, dlg_counts)
+                if dlg_counts["edu"] < 2:
+                    continue
+                _add_counts(gcounts2.struct[(i,) + dlg], dlg_counts)
+                _add_counts(gcounts2.total, dlg_counts)
+    return dcounts, gcounts, gcounts2
+
+
+def columnar_count_by_annotator(ccorpus, docs):
+    """
+    Same as `count_by_annotator`, but on the given documents (indices)
+    of an `educe.columnar.ColumnarCorpus`
+    """
+    keys = ccorpus.keys
+    annotators = frozenset(keys[i].annotator for i in docs
+                           if keys[i].annotator is not None)
+    acounts = PerAnno(struct=defaultdict(empty_counts),
+                      acts=defaultdict(empty_counts),
+                      rlabels=defaultdict(empty_counts),
+                      links=defaultdict(empty_counts))
+
+    masks = _columnar_masks(ccorpus)
+    relation = columnar.KIND_RELATION
+    rel_insts = ccorpus.mask(kind=relation,
+                             types=(educe.stac.SUBORDINATING_RELATIONS +
+                                    educe.stac.COORDINATING_RELATIONS))
+    cdus = ccorpus.mask(kind=columnar.KIND_SCHEMA,
+                        types=['Complex_discourse_unit'])
+    anno_doc = ccorpus['anno_doc']
+
+    for annotator in annotators:
+        mine = [i for i in docs if keys[i].annotator == annotator]
+        units = np.isin(anno_doc,
+                        [i for i in mine if keys[i].stage == "units"])
+        discourse_docs = [i for i in mine if keys[i].stage == "discourse"]
+        discourse = np.isin(anno_doc, discourse_docs)
+        for kdoc in frozenset(keys[i].doc for i in discourse_docs):
+            ksubdocs = frozenset(keys[i].subdoc for i in discourse_docs
+                                 if keys[i].doc == kdoc)
+            acounts.struct[annotator]["doc"] += 1
+            acounts.struct[annotator]["subdoc"] += len(ksubdocs)
+        for atype, val in ccorpus.count_types(units & masks["edu"]).items():
+            acounts.acts[annotator][_hinted_type_name(atype)] += val
+        _add_counts(acounts.struct[annotator],
+                    dict((cat, np.count_nonzero(discourse & mask))
+                         for cat, mask in masks.items()))
+        _add_counts(acounts.links[annotator],
+                    {"rel insts": np.count_nonzero(discourse & rel_insts),
+                     "CDUs": np.count_nonzero(discourse & cdus)})
+        _add_counts(acounts.rlabels[annotator],
+                    ccorpus.count_types(discourse & rel_insts))
+    return acounts
+
+
 def report(dcounts, gcounts, gcounts2, acounts):
     """
     Return a full report of all our counts
@@ -391,7 +598,12 @@ def main(args):
     You shouldn't need to call this yourself if you're using
     `config_argparser`
     """
-    corpus = read_corpus_with_unannotated(args, verbose=True)
-    dcounts, gcounts, gcounts2 = count_by_docname(corpus)
-    acounts = count_by_annotator(corpus)
+    if columnar.is_columnar_file(args.corpus):
+        ccorpus, docs = read_columnar_corpus(args, with_unannotated=True)
+        dcounts, gcounts, gcounts2 = columnar_count_by_docname(ccorpus, docs)
+        acounts = columnar_count_by_annotator(ccorpus, docs)
+    else:
+        corpus = read_corpus_with_unannotated(args, verbose=True)
+        dcounts, gcounts, gcounts2 = count_by_docname(corpus)
+        acounts = count_by_annotator(corpus)
     print(report(dcounts, gcounts, gcounts2, acounts))
@@ -19,7 +19,7 @@ from educe.util import (
 from educe.stac.rfc import BasicRfc, ThreadedRfc
 from ..args import (
     add_usual_input_args, add_usual_output_args,
-    read_corpus,
+    read_corpus, read_graph_snapshots,
     get_output_dir, announce_output_dir,
     anno_id)
 from ..glozz import anno_id_to_tuple
@@ -40,12 +40,15 @@ rfc_methods = (
     ('mlast', ThreadedRfc)     # Multiple lasts (one for each speaker)
     )
 
-def process_doc_violations(corpus, key, strip=False):
+def process_doc_violations(snapshot, strip=False):
     """ Tests document against RFC definitions.
 
+    Works from a snapshot of the document graph (see
+    `educe.stac.graph.graph_snapshots`), so we need not read it.
+
     Returns dict of method:Counter """
     res = Counter()
-    dgraph = graph.Graph.from_doc(corpus, key)
+    dgraph = graph.Graph.from_snapshot(snapshot)
     if strip:
         dgraph.strip_cdus(sloppy=True)
     relations = dgraph.relations()
@@ -75,11 +78,13 @@ def process_doc_power(corpus, key, strip=False):
     for u in doc.units:
         if educe.stac.is_edu(u):
             dia_edus[ctxs[u].dialogue].append(u)
-    for dia, edus in dia_edus.items():
+    dia_nodesets = [list(anno_to_nodes[edu] for edu in edus)
+                    for edus in dia_edus.values()]
+    dia_graphs = doc_graph.copy_many(dia_nodesets)
+    for edus, dia_edu_nodes, dia_graph in zip(dia_edus.values(),
+                                              dia_nodesets, dia_graphs):
         for i in range(len(edus)):
             res[('dia', i+1)] += 1
-        dia_edu_nodes = list(anno_to_nodes[edu] for edu in edus)
-        dia_graph = doc_graph.copy(dia_edu_nodes)
         sorted_nodes = dia_graph.first_outermost_dus()
         sorted_edus = [n for n in sorted_nodes if n in dia_edu_nodes]
         for name, method in rfc_methods[1:]:
@@ -152,11 +157,11 @@ def config_argparser(parser):
     add_usual_output_args(parser)
     parser.set_defaults(func=main)
 
-def main_violations(corpus, strip):
+def main_violations(snapshots, strip):
     """ Main for violation counting """
     res = Counter()
-    for key in corpus:
-        part_res = process_doc_violations(corpus, key, strip=strip)
+    for key in snapshots:
+        part_res = process_doc_violations(snapshots[key], strip=strip)
         res.update(part_res.elements())
 
     display_violations(res)
@@ -178,12 +183,13 @@ def main(args):
     `config_argparser`
     """
     output_dir = get_output_dir(args)
-    corpus = read_corpus(args, verbose=True,
-        preselected=dict(stage=['discourse']))
+    preselected = dict(stage=['discourse'])
 
     if args.mode == 'violations':
-        main_violations(corpus, strip=args.strip_cdus)
+        snapshots = read_graph_snapshots(args, preselected=preselected)
+        main_violations(snapshots, strip=args.strip_cdus)
     elif args.mode == 'power':
+        corpus = read_corpus(args, verbose=True, preselected=preselected)
         main_power(corpus, strip=args.strip_cdus)
 
     # announce_output_dir(output_dir)
@@ -3,16 +3,22 @@
 
 """Count and display subgraphs matching shapes of interest
 
+The corpus may also be given as a columnar corpus file (see the
+`columnar` command), in which case we only count the shapes
+(no CDU stripping or drawing)
 """
 
 from __future__ import print_function
-from collections import Counter
+from collections import Counter, defaultdict
+import sys
 
+from educe import columnar
 from educe.util import (add_corpus_filters, concat_l, fields_without)
+import educe.stac
 import educe.stac.graph as stacgraph
 
-from ..args import (get_output_dir, read_corpus)
-from ..output import write_dot_graph
+from ..args import (get_output_dir, read_columnar_corpus, read_corpus)
+from ..output import GraphvizRenderer, write_dot_graph
 
 
 NAME = 'count-shapes'
@@ -76,6 +82,7 @@ def _main_lozenge_graph(args):
                          preselected={'stage': ['discourse', 'units']})
     output_dir = get_output_dir(args)
     keys = [k for k in corpus if k.stage == 'discourse']
+    renderer = GraphvizRenderer(args.__dict__.get('jobs', 1))
 
     loz_count = Counter()
     loz_edges = Counter()
@@ -95,7 +102,74 @@ def _main_lozenge_graph(args):
         dot_gra = stacgraph.DotGraph(gra)
         if dot_gra.get_nodes():
             write_dot_graph(key, output_dir, dot_gra,
-                            run_graphviz=args.draw)
+                            run_graphviz=args.draw,
+                            renderer=renderer)
+    renderer.wait()
+    for key in sorted(loz_count):
+        print(key, loz_count[key], '({})'.format(loz_edges[key]))
+    print('TOTAL lozenges:', sum(loz_count.values()))
+    print('TOTAL edges in lozenges:', sum(loz_edges.values()))
+
+def _columnar_lozenges(ccorpus, doc, rel_insts):
+    """Return the number of lozenges in a document of a columnar corpus,
+    and the number of edges in them (see `_maybe_lozenge`)
+
+    Parameters
+    ----------
+    ccorpus: educe.columnar.ColumnarCorpus
+
+    doc: int
+        document index
+
+    rel_insts: array(bool)
+        mask of the annotations that count as relations
+    """
+    rows = ccorpus.rows(doc)
+    rel_annos = ccorpus['rel_anno']
+    first, last = rel_annos.searchsorted([rows.start, rows.stop])
+    outgoing = defaultdict(list)
+    for rel, src, tgt in zip(rel_annos[first:last],
+                             ccorpus['rel_source'][first:last],
+                             ccorpus['rel_target'][first:last]):
+        if rel_insts[rel]:
+            outgoing[src].append((rel, tgt))
+    num_lozenges = 0
+    num_edges = 0
+    for top_out in outgoing.values():
+        mid = [tgt for _, tgt in top_out]
+        if len(mid) < 2 or len(mid) != len(set(mid)):
+            continue
+        mid_outs = [outgoing.get(m, []) for m in mid]
+        bot = frozenset(tgt for _, tgt in mid_outs[0])
+        for cand in mid_outs[1:]:
+            bot &= frozenset(tgt for _, tgt in cand)
+        if len(bot) < 1:
+            continue
+        num_lozenges += 1
+        num_edges += len(frozenset(rel for rel, _ in top_out) |
+                         frozenset(rel for out in mid_outs for rel, _ in out))
+    return num_lozenges, num_edges
+
+
+def _main_lozenge_columnar(args):
+    """Count lozenge shaped subgraphs in a columnar corpus
+    """
+    if args.strip_cdus:
+        sys.exit('--strip-cdus is not supported on columnar corpora')
+    ccorpus, docs = read_columnar_corpus(args,
+                                         preselected={'stage':
+                                                      ['discourse']})
+    rel_insts = ccorpus.mask(kind=columnar.KIND_RELATION,
+                             types=(educe.stac.SUBORDINATING_RELATIONS +
+                                    educe.stac.COORDINATING_RELATIONS))
+    loz_count = Counter()
+    loz_edges = Counter()
+    for doc in docs:
+        key = ccorpus.keys[doc]
+        loz_count[key], loz_edges[key] =\
+            _columnar_lozenges(ccorpus, doc, rel_insts)
+        if not loz_count[key]:
+            del loz_count[key]
     for key in sorted(loz_count):
         print(key, loz_count[key], '({})'.format(loz_edges[key]))
     print('TOTAL lozenges:', sum(loz_count.values()))
@@ -136,7 +210,9 @@ def main(args):
     You shouldn't need to call this yourself if you're using
     `config_argparser`
     """
-    if True:  # may one day want to select diff shapes
+    if columnar.is_columnar_file(args.corpus):
+        _main_lozenge_columnar(args)
+    else:  # may one day want to select diff shapes
         _main_lozenge_graph(args)
 
 # vim: syntax=python:
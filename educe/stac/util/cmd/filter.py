@@ -69,5 +69,6 @@ def main(args):
         doc.units = list(filter(pred, doc.units))
         doc.relations = list(filter(pred, doc.relations))
         doc.schemas = list(filter(pred, doc.schemas))
+        doc.bump_version()
         save_document(output_dir, k, doc)
     announce_output_dir(output_dir)
@@ -16,7 +16,7 @@ import educe.stac.graph as stacgraph
 
 from ..args import\
     get_output_dir, read_corpus
-from ..output import write_dot_graph
+from ..output import GraphvizRenderer, write_dot_graph
 
 
 def _keep(doc, desired):
@@ -100,6 +100,7 @@ def main(args):
     output_dir = get_output_dir(args)
 
     keys = [k for k in corpus if k.stage == 'discourse']
+    renderer = GraphvizRenderer(args.__dict__.get('jobs', 1))
     for k in sorted(keys):
         try:
             gra = stacgraph.Graph.from_doc(corpus, k,
@@ -108,11 +109,13 @@ def main(args):
             dot_gra = stacgraph.DotGraph(gra)
             if dot_gra.get_nodes():
                 write_dot_graph(k, output_dir, dot_gra,
-                                run_graphviz=args.draw)
+                                run_graphviz=args.draw,
+                                renderer=renderer)
             else:
                 print("Skipping %s (empty graph)" % k, file=sys.stderr)
         except graph.DuplicateIdException:
             warning = "WARNING: %s has duplicate annotation ids" % k
             print(warning, file=sys.stderr)
+    renderer.wait()
 
 # vim: syntax=python:
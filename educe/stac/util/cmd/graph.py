@@ -18,7 +18,7 @@ import educe.stac.postag
 
 from ..args import (get_output_dir, anno_id)
 from ..glozz import (anno_id_from_tuple)
-from ..output import write_dot_graph
+from ..output import GraphvizRenderer, write_dot_graph
 
 
 # slightly different from the stock stac-util version because it
@@ -28,13 +28,17 @@ def _read_corpus(args):
     Read and return the corpus specified by the command line arguments
     """
     is_interesting = educe.util.mk_is_interesting(args)
+    cache_dir = args.__dict__.get('cache_dir')
     if args.live:
-        reader = educe.stac.LiveInputReader(args.corpus)
+        reader = educe.stac.LiveInputReader(args.corpus,
+                                              cache_dir=cache_dir)
         anno_files = reader.files()
     else:
-        reader = educe.stac.Reader(args.corpus)
-        anno_files = reader.filter(reader.files(), is_interesting)
-    return reader.slurp(anno_files, verbose=True)
+        reader = educe.stac.Reader(args.corpus, cache_dir=cache_dir)
+        all_files = reader.files(rescan=args.__dict__.get('rescan', False))
+        anno_files = reader.filter(all_files, is_interesting)
+    return reader.slurp(anno_files, verbose=True,
+                        jobs=args.__dict__.get('jobs', 1))
 
 
 def _main_rel_graph(args):
@@ -49,6 +53,7 @@ def _main_rel_graph(args):
         keys = corpus
     else:
         keys = [k for k in corpus if k.stage == 'discourse']
+    renderer = GraphvizRenderer(args.__dict__.get('jobs', 1))
 
     for k in sorted(keys):
         if args.highlight:
@@ -63,20 +68,22 @@ def _main_rel_graph(args):
             dot_gra = stacgraph.DotGraph(gra)
             if dot_gra.get_nodes():
                 write_dot_graph(k, output_dir, dot_gra,
-                                run_graphviz=args.draw)
+                                run_graphviz=args.draw,
+                                renderer=renderer)
                 if args.split:
                     ccs = gra.connected_components()
-                    for part, nodes in enumerate(ccs, 1):
-                        gra2 = gra.copy(nodes)
+                    for part, gra2 in enumerate(gra.copy_many(ccs), 1):
                         write_dot_graph(k, output_dir,
                                         stacgraph.DotGraph(gra2),
                                         part=part,
-                                        run_graphviz=args.draw)
+                                        run_graphviz=args.draw,
+                                        renderer=renderer)
             else:
                 print("Skipping %s (empty graph)" % k, file=sys.stderr)
         except graph.DuplicateIdException:
             warning = "WARNING: %s has duplicate annotation ids" % k
             print(warning, file=sys.stderr)
+    renderer.wait()
 
 
 def _main_rfc_graph(args):
@@ -98,11 +105,11 @@ def _main_rfc_graph(args):
         keys = corpus
     else:
         keys = [k for k in corpus if k.stage == 'discourse']
+    renderer = GraphvizRenderer(args.__dict__.get('jobs', 1))
 
     for key in sorted(keys):
         gra = stacgraph.Graph.from_doc(corpus, key)
-        for subgra_nodes in gra.connected_components():
-            subgra = gra.copy(subgra_nodes)
+        for subgra in gra.copy_many(gra.connected_components()):
             sub_rfc = mk_rfc(subgra)
             for node in sub_rfc.frontier():
                 gra.annotation(node).features['highlight'] = 'green'
@@ -113,9 +120,11 @@ def _main_rfc_graph(args):
         dot_gra = stacgraph.DotGraph(gra)
         if dot_gra.get_nodes():
             write_dot_graph(key, output_dir, dot_gra,
-                            run_graphviz=args.draw)
+                            run_graphviz=args.draw,
+                            renderer=renderer)
         else:
             print("Skipping %s (empty graph)" % key, file=sys.stderr)
+    renderer.wait()
 
 
 def _main_enclosure_graph(args):
@@ -129,6 +138,7 @@ def _main_enclosure_graph(args):
         postags = educe.stac.postag.read_tags(corpus, args.corpus)
     else:
         postags = None
+    renderer = GraphvizRenderer(args.__dict__.get('jobs', 1))
 
     for k in sorted(keys):
         if postags:
@@ -139,9 +149,11 @@ def _main_enclosure_graph(args):
         if dot_gra.get_nodes():
             dot_gra.set("ratio", "compress")
             write_dot_graph(k, output_dir, dot_gra,
-                            run_graphviz=args.draw)
+                            run_graphviz=args.draw,
+                            renderer=renderer)
         else:
             print("Skipping %s (empty graph)" % k, file=sys.stderr)
+    renderer.wait()
 
 # ---------------------------------------------------------------------
 # args
@@ -0,0 +1,109 @@
+# Author: Eric Kow
+# License: CeCILL-B (French BSD3-like)
+
+"""
+Check the corpus hashcodes recorded in annotation files
+
+For each annotation file, recompute the Glozz hashcode of its text
+(.ac) file, and report any annotation files whose recorded hashcode
+is missing or no longer matches (eg. because the text was edited)
+"""
+
+from __future__ import print_function
+from multiprocessing import Pool
+import sys
+
+from tabulate import tabulate
+
+from educe import glozz
+import educe.stac
+import educe.util
+
+from ..args import add_usual_input_args
+
+NAME = 'hashcode'
+
+
+def config_argparser(parser):
+    """
+    Subcommand flags.
+
+    You should create and pass in the subparser to which the flags
+    are to be added.
+    """
+    add_usual_input_args(parser)
+    parser.add_argument('--all', action='store_true',
+                        help='report all files, not just out of date ones')
+    parser.set_defaults(func=main)
+
+
+def _check_pair(paths):
+    """
+    (recorded, actual) hashcodes for an .aa/.ac pair
+    (module-level for the process pool)
+    """
+    anno_file, text_file = paths
+    with open(text_file, 'rb') as stream:
+        actual = glozz.hashcode(stream)
+    return glozz.read_hashcode(anno_file), actual
+
+
+def check_hashcodes(anno_files, jobs=1):
+    """
+    Return a dictionary from FileId to (recorded, actual) hashcode
+    pairs for the given files (see `educe.stac.Reader.files`),
+    checking `jobs` files at a time
+    """
+    keys = list(anno_files.keys())
+    pairs = [anno_files[k] for k in keys]
+    if jobs == 1:
+        results = [_check_pair(p) for p in pairs]
+    else:
+        pool = Pool(processes=jobs or None)
+        try:
+            results = pool.map(_check_pair, pairs, chunksize=16)
+        finally:
+            pool.close()
+            pool.join()
+    return dict(zip(keys, results))
+
+
+def _status(recorded, actual):
+    """
+    Summary of a hashcode check
+    """
+    if recorded is None:
+        return 'missing'
+    elif recorded != actual:
+        return 'out of date'
+    else:
+        return 'ok'
+
+
+def main(args):
+    """
+    Subcommand main.
+
+    You shouldn't need to call this yourself if you're using
+    `config_argparser`
+    """
+    reader = educe.stac.Reader(args.corpus)
+    is_interesting = educe.util.mk_is_interesting(args)
+    all_files = reader.files(rescan=args.__dict__.get('rescan', False))
+    anno_files = reader.filter(all_files, is_interesting)
+    results = check_hashcodes(anno_files, jobs=args.__dict__.get('jobs', 1))
+
+    rows = []
+    bad = 0
+    for key in sorted(results, key=educe.stac.id_to_path):
+        recorded, actual = results[key]
+        status = _status(recorded, actual)
+        if status != 'ok':
+            bad += 1
+        if args.all or status != 'ok':
+            rows.append([anno_files[key][0], status, recorded, actual])
+    if rows:
+        print(tabulate(rows, headers=['file', 'status',
+                                      'recorded', 'actual']))
+    print("%d of %d annotation files have missing or out of date "
+          "hashcodes" % (bad, len(results)), file=sys.stderr)
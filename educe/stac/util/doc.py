@@ -43,6 +43,7 @@ def _set_doc_parts(doc, parts):
     doc.units = concat_l(x.units for x in parts)
     doc.relations = concat_l(x.relations for x in parts)
     doc.schemas = concat_l(x.schemas for x in parts)
+    doc.bump_version()
 
 
 def evil_set_id(anno, author, date):
@@ -96,6 +97,8 @@ def retarget(doc, old_id, new_anno):
                 schema.schemas = schema.schemas | set(new_id)
             else:
                 schema.units.add(new_id)
+    if replaced:
+        doc.bump_version()
     return replaced
 
 
@@ -142,6 +145,7 @@ def shift_annotations(doc, offset, point=None):
     doc2.units = list(map(shift, doc.units))
     doc2.schemas = list(map(shift, doc.schemas))
     doc2.relations = list(map(shift, doc.relations))
+    doc2.bump_version()
     return doc2
 
 
@@ -194,6 +198,7 @@ def narrow_to_span(doc, span):
     doc2.units = slice_annos(doc.units)
     doc2.schemas = slice_annos(doc.schemas)
     doc2.relations = slice_annos(doc.relations)
+    doc2.bump_version()
     doc2 = shift_annotations(doc2, offset)
     evil_set_text(doc2, doc.text()[span.char_start:span.char_end])
     return doc2
@@ -275,6 +280,7 @@ def rename_ids(renames, doc):
         anno.units = set(adjust(x) for x in anno.units)
         anno.relations = set(adjust(x) for x in anno.relations)
         anno.schemas = set(adjust(x) for x in anno.schemas)
+    doc2.bump_version()
     return doc2
 
 
@@ -8,8 +8,12 @@ Help writing out corpus files
 from __future__ import print_function
 import codecs
 import copy
+import hashlib
+import multiprocessing
 import os
+import subprocess
 import sys
+import time
 from io import BytesIO
 
 from educe import glozz
@@ -69,9 +73,133 @@ def save_document(output_dir, k, doc):
             fout.write(doc_bytes)
 
 
-def write_dot_graph(doc_key, odir, dot_graph, part=None, run_graphviz=True):
+class GraphvizRenderer(object):
+    """
+    Run graphviz on dot files, up to `jobs` of them at a time
+    (0 for one per CPU), in the background until you `wait`.
+
+    Each SVG file we render is accompanied by a `.sha1` file with
+    the digest of the dot source we drew it from. If both are there
+    and the digest matches, we leave the SVG alone; so drawing the
+    graphs for a whole corpus again after a small edit only redraws
+    the graphs that changed.
+    """
+    def __init__(self, jobs=1):
+        if not jobs:
+            jobs = multiprocessing.cpu_count()
+        self.jobs = jobs
+        self._running = []  # (process, svg file, digest, start time)
+        self._failed = False  # if we could not run graphviz at all
+        self.timings = []  # (svg file, seconds or None if up to date)
+
+    @staticmethod
+    def _digest(dot_source):
+        """
+        Digest of some dot source (as text)
+        """
+        return hashlib.sha1(dot_source.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _read_digest(svg_file):
+        """
+        Digest of the dot source an SVG file was drawn from
+        (None if we don't know)
+        """
+        if not os.path.exists(svg_file):
+            return None
+        try:
+            with open(svg_file + '.sha1') as stream:
+                return stream.read().strip()
+        except IOError:
+            return None
+
+    def render(self, dot_file, svg_file, dot_source):
+        """
+        Draw an SVG file from a dot file (written out from the given
+        source), unless we have already drawn it from the same source.
+
+        If there are already `jobs` graphviz processes running, wait
+        for one of them to finish first
+        """
+        if self._failed:
+            return
+        digest = self._digest(dot_source)
+        if self._read_digest(svg_file) == digest:
+            print("Up to date: %s" % svg_file, file=sys.stderr)
+            self.timings.append((svg_file, None))
+            return
+        while len(self._running) >= self.jobs:
+            self._reap()
+        if os.path.exists(svg_file + '.sha1'):
+            os.remove(svg_file + '.sha1')
+        try:
+            proc = subprocess.Popen(['dot', '-T', 'svg', '-o', svg_file,
+                                     dot_file])
+        except OSError as oops:
+            print("Couldn't run graphviz. (%s)" % oops, file=sys.stderr)
+            print("You should install it to draw graphs.", file=sys.stderr)
+            self._failed = True
+            return
+        self._running.append((proc, svg_file, digest, time.time()))
+
+    def _reap(self):
+        """
+        Finish off the graphviz processes that are done (waiting a
+        little if none of them are)
+        """
+        done = [job for job in self._running if job[0].poll() is not None]
+        if not done:
+            time.sleep(0.01)
+        for job in done:
+            self._running.remove(job)
+            self._finish(job)
+
+    def _finish(self, job):
+        """
+        Wait for a graphviz process, and remember the digest of
+        what it drew if it went well
+        """
+        proc, svg_file, digest, start = job
+        retcode = proc.wait()
+        secs = time.time() - start
+        if retcode == 0:
+            with open(svg_file + '.sha1', 'w') as stream:
+                print(digest, file=stream)
+            print("Created %s (%.2fs)" % (svg_file, secs), file=sys.stderr)
+        else:
+            print("Failed to create %s (graphviz exit code %d)" %
+                  (svg_file, retcode), file=sys.stderr)
+        self.timings.append((svg_file, secs))
+
+    def wait(self, quiet=False):
+        """
+        Wait for all the graphviz processes we started to finish
+        (and unless `quiet`, say how many graphs we drew)
+
+        :rtype: [(string, float or None)]
+        :returns: for each SVG file we were asked for, how long
+                  graphviz took on it (None if it was up to date)
+        """
+        while self._running:
+            self._reap()
+        drawn = [secs for _, secs in self.timings if secs is not None]
+        if self.timings and not quiet:
+            print("%d graphs drawn (%.2fs of graphviz), %d up to date" %
+                  (len(drawn), sum(drawn), len(self.timings) - len(drawn)),
+                  file=sys.stderr)
+        return self.timings
+
+
+def write_dot_graph(doc_key, odir, dot_graph, part=None, run_graphviz=True,
+                    renderer=None):
     """
     Write a dot graph and possibly run graphviz on it
+
+    :param renderer: if you are writing several graphs, a renderer
+                     to draw them in parallel (you will need to
+                     `wait` on it), otherwise we draw this one before
+                     returning
+    :type renderer: GraphvizRenderer
     """
     ofile_basename = output_path_stub(odir, doc_key)
     if part is not None:
@@ -79,8 +207,13 @@ def write_dot_graph(doc_key, odir, dot_graph, part=None, run_graphviz=True):
     dot_file = ofile_basename + '.dot'
     svg_file = ofile_basename + '.svg'
     mk_parent_dirs(dot_file)
+    dot_source = dot_graph.to_string()
     with codecs.open(dot_file, 'w', encoding='utf-8') as dotf:
-        print(dot_graph.to_string(), file=dotf)
+        print(dot_source, file=dotf)
     if run_graphviz:
-        print("Creating %s" % svg_file, file=sys.stderr)
-        os.system('dot -T svg -o %s %s' % (svg_file, dot_file))
+        if renderer is None:
+            renderer = GraphvizRenderer()
+            renderer.render(dot_file, svg_file, dot_source)
+            renderer.wait(quiet=True)
+        else:
+            renderer.render(dot_file, svg_file, dot_source)
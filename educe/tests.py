@@ -8,14 +8,33 @@
 Tests for educe
 """
 
+from io import BytesIO
+from xml.dom import minidom
+import copy
+import gc
+import os.path
+import pickle
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
 import unittest
+import weakref
+import xml.etree.ElementTree as ET
 
-from educe.annotation import (Span, RelSpan,
+from educe.annotation import (Span, RelSpan, SpanArray,
                               Annotation,
                               Unit, Relation, Schema, Document)
+from educe.corpus import FileId
+from educe.external.postag import RawToken, Token
+from educe.ptb.annotation import TweakedToken
 import educe.graph as educe
 from   educe.graph import EnclosureGraph
 from educe.util import relative_indices
+import educe.glozz as glozz
+import educe.stac as stac
+from educe.stac.annotation import STAC_OUTPUT_SETTINGS
 
 
 # ---------------------------------------------------------------------
@@ -79,6 +98,118 @@ class SpanTest(unittest.TestCase):
         self.assertOverlap((5, 5), (5, 5), (5, 6), inclusive=True)
 
 
+class SpanArrayTest(unittest.TestCase):
+    "tests for educe.annotation.SpanArray"
+
+    def setUp(self):
+        self.pairs = [(0, 5), (5, 10), (8, 12), (12, 12), (3, 20)]
+        self.spans = [Span(x, y) for x, y in self.pairs]
+        self.arr = SpanArray.from_spans(self.spans)
+
+    def test_roundtrip(self):
+        "from_spans/to_spans"
+        self.assertEqual(self.spans, self.arr.to_spans())
+        self.assertEqual(self.spans[2], self.arr[2])
+        self.assertEqual(self.spans[1:3], self.arr[1:3].to_spans())
+        self.assertEqual(len(self.spans), len(self.arr))
+
+    def test_like_span(self):
+        "element-wise results agree with the Span methods"
+        probes = [Span(x, y) for x, y in
+                  [(0, 0), (4, 9), (5, 10), (10, 12), (12, 12), (13, 30)]]
+        for probe in probes:
+            self.assertEqual([x.encloses(probe) for x in self.spans],
+                             self.arr.encloses(probe).tolist())
+            self.assertEqual([probe.encloses(x) for x in self.spans],
+                             self.arr.enclosed_by(probe).tolist())
+            for incl in [False, True]:
+                expected = [x.overlaps(probe, inclusive=incl) is not None
+                            for x in self.spans]
+                self.assertEqual(expected,
+                                 self.arr.overlaps(probe,
+                                                   inclusive=incl).tolist())
+        others = SpanArray.from_spans(reversed(self.spans))
+        self.assertEqual([x.encloses(y) for x, y in
+                          zip(self.spans, reversed(self.spans))],
+                         self.arr.encloses(others).tolist())
+
+    def test_merge_shift(self):
+        "merge_all and shift"
+        self.assertEqual(Span.merge_all(self.spans), self.arr.merge_all())
+        self.assertEqual([x.shift(3) for x in self.spans],
+                         self.arr.shift(3).to_spans())
+        self.assertRaises(ValueError, SpanArray([], []).merge_all)
+
+    def test_enclosing(self):
+        "index of the first enclosing span"
+        probes = [Span(x, y) for x, y in
+                  [(1, 2), (6, 9), (9, 11), (2, 18), (15, 25)]]
+
+        def expected(spans):
+            "brute force version"
+            res = []
+            for probe in probes:
+                idx = [i for i, x in enumerate(spans) if x.encloses(probe)]
+                res.append(idx[0] if idx else -1)
+            return res
+
+        sorted_spans = [Span(x, y) for x, y in
+                        [(0, 5), (5, 10), (8, 12), (12, 20)]]
+        for spans in [self.spans, sorted_spans]:
+            self.assertEqual(expected(spans),
+                             SpanArray.from_spans(spans)
+                             .enclosing(probes).tolist())
+
+    def test_indices(self):
+        "indices of enclosed and overlapping spans"
+        sorted_spans = [Span(x, y) for x, y in
+                        [(0, 5), (5, 10), (8, 12), (12, 12), (12, 20)]]
+        for spans in [self.spans, sorted_spans]:
+            arr = SpanArray.from_spans(spans)
+            for probe in [Span(4, 12), Span(5, 10), Span(12, 12)]:
+                self.assertEqual([i for i, x in enumerate(spans)
+                                  if probe.encloses(x)],
+                                 arr.enclosed_indices(probe).tolist())
+                for incl in [False, True]:
+                    self.assertEqual([i for i, x in enumerate(spans)
+                                      if x.overlaps(probe, inclusive=incl)],
+                                     arr.overlapping_indices(
+                                         probe, inclusive=incl).tolist())
+
+
+class SlotsTest(unittest.TestCase):
+    "slotted core classes still copy, pickle and mutate like before"
+
+    def test_pickle_and_copy(self):
+        token = Token(RawToken('hello', 'UH'), Span(0, 5))
+        token.span = Span(3, 8)
+        objs = [Span(1, 2), RelSpan('e1', 'e2'),
+                FileId('doc', '01', 'units', 'bob'),
+                token, TweakedToken('U.S.', 'NNP', 'U.S', '.')]
+        for obj in objs:
+            self.assertFalse(hasattr(obj, '__dict__'))
+            for proto in range(pickle.HIGHEST_PROTOCOL + 1):
+                for obj2 in [pickle.loads(pickle.dumps(obj, proto)),
+                             copy.deepcopy(obj)]:
+                    self.assertEqual(type(obj), type(obj2))
+                    self.assertEqual([getattr(obj, k, None) for k in
+                                      ['char_start', 't1', 'doc',
+                                       'word', 'span', 'offset']],
+                                     [getattr(obj2, k, None) for k in
+                                      ['char_start', 't1', 'doc',
+                                       'word', 'span', 'offset']])
+
+    def test_fileid_hash_follows_fields(self):
+        key = FileId('doc', '01', 'units', 'bob')
+        corpus = {key: 'x'}
+        twin = copy.copy(key)
+        self.assertIn(twin, corpus)
+        twin.stage = 'discourse'
+        self.assertNotIn(twin, corpus)
+        self.assertEqual(hash(FileId('doc', '01', 'discourse', 'bob')),
+                         hash(twin))
+        self.assertIn(key, corpus)
+
 
 class NullAnno(Span, Annotation):
     def __init__(self, start, end, type="null"):
@@ -166,6 +297,131 @@ class EnclosureTest(unittest.TestCase):
         self.assertEqual([s_1_5], g.outside(s_2_4))
         self.assertEqual([s_1_5, s_2_4], g.outside(s_3_4))
 
+    def test_crossing(self):
+        """
+        partly overlapping annotations, and ones far apart
+        """
+        s1_5 = NullAnno(1, 5, 'a')
+        s4_9 = NullAnno(4, 9, 'a')
+        s0_9 = NullAnno(0, 9, 'b')
+        s4_5 = NullAnno(4, 5, 'c')
+        s5_5 = NullAnno(5, 5, 'c')
+        s20_30 = NullAnno(20, 30, 'a')
+        s21_22 = NullAnno(21, 22, 'c')
+        g = EnclosureGraph([s1_5, s4_9, s0_9, s4_5, s5_5, s20_30, s21_22])
+        self.assertEqual([s1_5, s4_9], g.inside(s0_9))
+        self.assertEqual([s4_5, s5_5], g.inside(s1_5))
+        self.assertEqual([s4_5, s5_5], g.inside(s4_9))
+        self.assertEqual([s21_22], g.inside(s20_30))
+        self.assertEqual([s20_30], g.outside(s21_22))
+
+    def test_tie_break(self):
+        """
+        same spans, with a key to say which encloses which
+        (annotations of the same width are all connected)
+        """
+        rank = {'out': 0, 'mid': 1, 'in': 2}
+        s_out = NullAnno(1, 5, 'out')
+        s_in = NullAnno(1, 5, 'in')
+        s_mid = NullAnno(1, 5, 'mid')
+        g = EnclosureGraph([s_in, s_out, s_mid],
+                           key=lambda x: rank[x.type])
+        self.assertEqual([s_in, s_mid], g.inside(s_out))
+        self.assertEqual([s_in], g.inside(s_mid))
+        self.assertEqual(set([s_mid, s_out]), set(g.outside(s_in)))
+        self.assertEqual([], g.inside(s_in))
+
+    def test_incremental(self):
+        """
+        patching the graph gives the same edges as building it again
+        """
+        rng = random.Random(0)
+        rank = {'a': 0, 'b': 1, 'c': 2}
+
+        def mk_anno():
+            "random annotation, some of them empty"
+            start = rng.randint(0, 30)
+            width = rng.choice([0, 1, 2, 4, 8, 20])
+            return NullAnno(start, start + width, rng.choice('abc'))
+
+        for key in [None, lambda x: rank[x.type]]:
+            annos = []
+            g = EnclosureGraph(annos, key=key)
+            for _ in range(100):
+                op = rng.choice(['add', 'add', 'remove', 'update'])
+                if op == 'add' or not annos:
+                    anno = mk_anno()
+                    if anno in annos:
+                        continue
+                    annos.append(anno)
+                    g.add_annotation(anno)
+                elif op == 'remove':
+                    anno = rng.choice(annos)
+                    annos.remove(anno)
+                    g.remove_annotation(anno)
+                else:
+                    # our nodes are named after their spans, so moving
+                    # one means replacing it (see test_update_span)
+                    anno = annos.pop(rng.randrange(len(annos)))
+                    g.remove_annotation(anno)
+                    anno = mk_anno()
+                    if anno in annos:
+                        continue
+                    annos.append(anno)
+                    g.add_annotation(anno)
+                fresh = EnclosureGraph(annos, key=key)
+                self.assertEqual(sorted(fresh.edges()), sorted(g.edges()))
+
+    def test_region(self):
+        """
+        the annotations reachable through chains of overlaps
+        """
+        rng = random.Random(0)
+
+        def touch(span1, span2):
+            "share text, or an empty span sits within (or on) the other"
+            if span1.length() and span2.length():
+                return span1.overlaps(span2) is not None
+            elif span1.length():
+                span1, span2 = span2, span1
+            return span2.char_start <= span1.char_start <= span2.char_end\
+                and (span2.length() or span1 == span2)
+
+        for _ in range(200):
+            annos = []
+            for _ in range(rng.randint(1, 20)):
+                start = rng.randint(0, 30)
+                anno = NullAnno(start, start + rng.choice([0, 0, 1, 3, 20]),
+                                'a')
+                if anno not in annos:
+                    annos.append(anno)
+            g = EnclosureGraph(annos)
+            seed = rng.choice(annos)
+            expected = set([seed])
+            todo = [seed]
+            while todo:
+                anno = todo.pop()
+                for other in annos:
+                    if other not in expected and\
+                            touch(anno.text_span(), other.text_span()):
+                        expected.add(other)
+                        todo.append(other)
+            self.assertEqual(expected, set(g._region([seed])))
+
+    def test_update_span(self):
+        s1_5 = Unit('s1_5', Span(1, 5), 'a', {})
+        s2_3 = Unit('s2_3', Span(2, 3), 'b', {})
+        s8_9 = Unit('s8_9', Span(8, 9), 'c', {})
+        g = EnclosureGraph([s1_5, s2_3, s8_9])
+        self.assertEqual([s2_3], g.inside(s1_5))
+        s1_5.span = Span(1, 9)
+        g.update_span(s1_5)
+        self.assertEqual([s2_3, s8_9], g.inside(s1_5))
+        s2_3.span = Span(20, 21)
+        g.update_span(s2_3)
+        self.assertEqual([s8_9], g.inside(s1_5))
+        self.assertEqual([], g.outside(s2_3))
+
 
 # ---------------------------------------------------------------------
 # annotations
@@ -213,6 +469,259 @@ def test_members():
         assert sp.char_start >= doc_sp.char_start
         assert sp.char_end   <= doc_sp.char_end
 
+
+def test_memoized_text_span():
+    u1  = TestUnit('u1', 2, 4)
+    u2  = TestUnit('u2', 3, 9)
+    u3  = TestUnit('u3', 12, 13)
+    s1  = TestSchema('s1', ['u1', 'u2'], [], [])
+    s2  = TestSchema('s2', ['u3'], [], ['s1'])
+    r1  = TestRelation('r1', 's1', 'u3')
+    doc = TestDocument([u1, u2, u3], [r1], [s1, s2], "why hello there!")
+
+    # each terminal once, even if reachable several ways
+    assert sorted(r1._terminals()) == sorted([u1, u2, u3])
+    assert s2.text_span() == Span(2, 13)
+    assert r1.text_span() == Span(2, 13)
+    assert doc.text_span() == Span(2, 13)
+
+    # stale until the document says it was modified
+    version = doc.version
+    u3.span = Span(12, 15)
+    assert s2.text_span() == Span(2, 13)
+    doc.bump_version()
+    assert doc.version is not version
+    assert s2.text_span() == Span(2, 15)
+    assert r1.text_span() == Span(2, 15)
+    assert doc.text_span() == Span(2, 15)
+
+    # copies of the document go their own way
+    doc2 = copy.deepcopy(doc)
+    doc2.units[2].span = Span(12, 16)
+    doc2.bump_version()
+    assert doc2.schemas[1].text_span() == Span(2, 16)
+    assert s2.text_span() == Span(2, 15)
+
+
+# write a pickled document out to stdout; and read one in, shrink its
+# first unit and print the span of its relation (see below)
+_PICKLE_DOC_SCRIPT = """
+import pickle, sys
+from educe.annotation import Document, Relation, RelSpan, Span, Unit
+doc = Document([Unit('u1', Span(0, 4), 'Segment', {}),
+                Unit('u2', Span(5, 9), 'Segment', {})],
+               [Relation('r1', RelSpan('u1', 'u2'), 'Comment', {})],
+               [], 'why hello')
+doc.relations[0].text_span()
+getattr(sys.stdout, 'buffer', sys.stdout).write(pickle.dumps(doc))
+"""
+
+_EDIT_DOC_SCRIPT = """
+import pickle, sys
+from educe.annotation import Span
+doc = pickle.loads(getattr(sys.stdin, 'buffer', sys.stdin).read())
+doc.units[1].span = Span(5, 6)
+doc.bump_version()
+print(doc.relations[0].text_span())
+"""
+
+
+def test_pickled_text_span():
+    # editing a document that was pickled in another process
+    # (eg. a process pool, or the parse cache) must not leave
+    # us with the text spans worked out in that process
+    def run(script, stdin=None):
+        "run a python script in a fresh process"
+        proc = subprocess.Popen([sys.executable, '-c', script],
+                                stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE)
+        out, _ = proc.communicate(stdin)
+        assert proc.returncode == 0
+        return out
+
+    pickled = run(_PICKLE_DOC_SCRIPT)
+    assert run(_EDIT_DOC_SCRIPT, pickled).decode().strip() ==\
+        str(Span(0, 6))
+
+
+def test_by_id():
+    u1  = TestUnit('u1', 2, 4)
+    u2  = TestUnit('u2', 3, 9)
+    s1  = TestSchema('s1', ['u1', 'u2'], [], [])
+    r1  = TestRelation('r1', 's1', 'u2')
+    doc = TestDocument([u1, u2], [r1], [s1], "why hello there!")
+    for anno in doc.annotations():
+        assert doc.by_id(anno.local_id()) is anno
+    assert doc.by_id('u3') is None
+
+    u3 = TestUnit('u3', 12, 13)
+    doc.units.append(u3)
+    doc.units.remove(u1)
+    doc.bump_version()
+    assert doc.by_id('u3') is u3
+    assert doc.by_id('u1') is None
+
+    doc2 = pickle.loads(pickle.dumps(doc))
+    assert doc2.by_id('u3') is doc2.units[1]
+
+    # duplicates
+    assert doc.all_by_id('u3') == [u3]
+    assert doc.all_by_id('u1') == []
+    u2b = TestUnit('u2', 12, 13)
+    doc.units.append(u2b)
+    doc.bump_version()
+    assert doc.all_by_id('u2') == [u2, u2b]
+
+
+def test_overlay():
+    u1  = TestUnit('u1', 2, 4)
+    u2  = TestUnit('u2', 3, 9)
+    u3  = TestUnit('u3', 12, 13)
+    r1  = TestRelation('r1', 'u1', 'u2')
+    r2  = TestRelation('r2', 'u2', 'u3')
+    doc = TestDocument([u1, u2, u3], [r1, r2], [], "why hello there!")
+    doc2 = doc.overlay()
+    assert type(doc2) is type(doc)
+    assert doc2.text() is doc.text()
+    assert doc2.own(r1) is not r1
+    r1b = doc2.by_id('r1')
+    r1b.target = u3
+    doc2.units.remove(u2)
+    doc2.bump_version()
+    assert doc2.relations == [r1b, r2]
+    assert doc2.own(r1b) is r1b
+    assert r1b.text_span() == Span(2, 13)
+    # the base document is none the wiser
+    assert doc.units == [u1, u2, u3]
+    assert doc.relations == [r1, r2]
+    assert r1.target is u2
+    assert r1.text_span() == Span(2, 9)
+    # owned annotations can be modified in place
+    u1b = doc2.own(u1)
+    u1b.features['foo'] = 'bar'
+    u1b.span.char_end = 3
+    doc2.bump_version()
+    assert u1.features == {}
+    assert u1.span == Span(2, 4)
+    assert r1b.text_span() == Span(2, 13)
+    s1 = Schema('s1', set(['u1', 'u2']), set(), set(), '', {})
+    doc3 = TestDocument([u1, u2], [], [s1], "why hello there!").overlay()
+    s1b = doc3.own(doc3.schemas[0])
+    s1b.units.discard('u2')
+    s1b.span.discard('u2')
+    assert s1.units == set(['u1', 'u2'])
+    assert s1.span == set(['u1', 'u2'])
+    # and plain documents are modified in place
+    assert doc.own(r1) is r1
+    # sharing survives pickling (annotation ids do not)
+    doc4, doc5 = pickle.loads(pickle.dumps((doc, doc.overlay())))
+    assert doc5.units[0] is doc4.units[0]
+    assert doc5.own(doc5.units[0]) is not doc4.units[0]
+    assert doc4.own(doc4.units[0]) is doc4.units[0]
+    # shared annotations stay alive as long as the overlay does, so
+    # that their ids cannot be mistaken for those of new annotations
+    u4 = TestUnit('u4', 0, 1)
+    u4_ref = weakref.ref(u4)
+    doc6 = TestDocument([u4], [], [], "why hello there!").overlay()
+    doc6.units = []
+    doc6.bump_version()
+    del u4
+    gc.collect()
+    assert u4_ref() is not None
+    u5 = TestUnit('u5', 0, 1)
+    doc6.units.append(u5)
+    doc6.bump_version()
+    assert doc6.own(u5) is u5
+
+
+def test_shallow_copy():
+    u1  = TestUnit('u1', 2, 4)
+    u2  = TestUnit('u2', 3, 9)
+    u3  = TestUnit('u3', 12, 13)
+    r1  = TestRelation('r1', 'u1', 'u3')
+    doc = TestDocument([u1, u2, u3], [r1], [], "why hello there!")
+    version = doc.version
+    index = doc.span_index
+    assert r1.text_span() == Span(2, 13)
+    doc2 = copy.copy(doc)
+    doc2.units = [u1, u2]
+    doc2.bump_version()
+    assert doc2.span_index.enclosed_by(Span(0, 16)) == [u1, u2]
+    # bumping the copy leaves the original (and its indices) alone
+    assert doc.version is version
+    assert doc.span_index is index
+    assert r1._version is doc._version
+    # and vice versa
+    u3.span = Span(12, 15)
+    doc.bump_version()
+    assert r1.text_span() == Span(2, 15)
+    assert doc2.version is not doc.version
+
+
+def is_short(anno):
+    "test predicate for views"
+    return anno.text_span().length() < 5
+
+
+def test_views():
+    u1 = Unit('u1', Span(12, 13), 'Turn', {})
+    u2 = Unit('u2', Span(3, 9), 'Segment', {})
+    u3 = Unit('u3', Span(2, 4), 'Turn', {})
+    r1 = TestRelation('r1', 'u1', 'u3')
+    doc = TestDocument([u1, u2, u3], [r1], [], "why hello there!")
+    assert doc.view(is_short) == [u1, u3]
+    assert doc.units_of_type('Turn') == [u3, u1]
+    assert doc.units_of_type(['Turn', 'Segment']) == [u3, u2, u1]
+    assert doc.units_of_type('Dialogue') == []
+    # we get copies of the views
+    doc.view(is_short).append(u2)
+    assert doc.view(is_short) == [u1, u3]
+
+    u3.span = Span(2, 8)
+    doc.units.remove(u1)
+    doc.bump_version()
+    assert doc.view(is_short) == []
+    assert doc.units_of_type('Turn') == [u3]
+
+
+class SpanIndexTest(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(12)
+        units = []
+        for i in range(300):
+            start = rng.randint(0, 200)
+            end = start + rng.choice([0, 1, 3, 10, 50])
+            units.append(Unit('u%d' % i, Span(start, end),
+                              rng.choice(['Turn', 'Segment']), {}))
+        self.doc = TestDocument(units, [], [], None)
+        self.queries = [Span(s, s + w)
+                        for s in range(-2, 260, 7) for w in [0, 1, 5, 30]]
+
+    def test_against_scan(self):
+        units = self.doc.units
+        index = self.doc.span_index
+        for span in self.queries:
+            self.assertEqual(index.enclosing(span),
+                             [x for x in units if x.span.encloses(span)])
+            self.assertEqual(index.enclosed_by(span),
+                             [x for x in units if span.encloses(x.span)])
+            self.assertEqual(index.overlapping(span),
+                             [x for x in units if span.overlaps(x.span)])
+            self.assertEqual(index.enclosed_by(span, types='Turn'),
+                             [x for x in units if span.encloses(x.span)
+                              and x.type == 'Turn'])
+
+    def test_rebuilt_on_bump(self):
+        index = self.doc.span_index
+        self.assertIs(index, self.doc.span_index)
+        unit = Unit('new', Span(1000, 1001), 'Segment', {})
+        self.doc.units.append(unit)
+        self.doc.bump_version()
+        self.assertEqual(self.doc.span_index.enclosing(Span(1000, 1000)),
+                         [unit])
+        self.assertEqual(len(self.doc.span_index), len(index) + 1)
+        self.assertIsNone(copy.copy(self.doc).__dict__.get('_span_index'))
+
 # ---------------------------------------------------------------------
 # graph
 # ---------------------------------------------------------------------
@@ -261,6 +770,64 @@ class FakeGraph(educe.Graph):
     def add_cdu(self, anno_id, members):
         self._add_fake_edge(anno_id, 'CDU', list(map(str,members)))
 
+def random_graph(rng, num_edus, num_edges):
+    """
+    Graph with EDUs and randomly linked relations and CDUs, following
+    the node/edge mirroring conventions of `educe.graph.Graph`
+    """
+    gr = FakeGraph()
+    nodes = []
+    for i in range(num_edus):
+        node = 'n_%d' % i
+        gr.add_node(node)
+        gr.add_node_attributes(node, [('type', 'EDU'), ('mirror', None)])
+        nodes.append(node)
+    for i in range(num_edges):
+        etype = rng.choice(['rel', 'CDU'])
+        size = 2 if etype == 'rel' else rng.randint(1, 4)
+        members = rng.sample(nodes, min(size, len(nodes)))
+        node = 'n_x%d' % i
+        edge = 'e_x%d' % i
+        gr.add_node(node)
+        gr.add_node_attributes(node, [('type', etype), ('mirror', edge)])
+        gr.add_edge(edge)
+        gr.add_edge_attributes(edge, [('type', etype), ('mirror', node)])
+        for member in members:
+            gr.link(member, edge)
+        nodes.append(node)
+    return gr
+
+
+def naive_connected_components(gr):
+    """
+    Connected components the slow way (reference for
+    `Graph.connected_components`): grow each component by
+    following hyperedges and, from mirror nodes, the links of
+    their mirror edge
+    """
+    seen = set()
+    res = []
+    for start in gr.nodes():
+        if start in seen:
+            continue
+        component = set([start])
+        todo = [start]
+        while todo:
+            node = todo.pop()
+            nexts = set(gr.neighbors(node))
+            if gr.mirror(node) is not None:
+                nexts.update(gr.links(gr.mirror(node)))
+            for edge in gr.links(node):
+                if gr.mirror(edge) is not None:
+                    nexts.add(gr.mirror(edge))
+            for nxt in nexts - component:
+                component.add(nxt)
+                todo.append(nxt)
+        seen.update(component)
+        res.append(frozenset(component))
+    return frozenset(res)
+
+
 class BasicGraphTest(unittest.TestCase):
     def test_cdu_members_trivial(self):
         "trivial CDU membership"
@@ -297,6 +864,47 @@ class BasicGraphTest(unittest.TestCase):
         expected3 = frozenset([])
         self.assertEqual(expected3,ns3)
 
+    def test_cdu_nesting(self):
+        "CDU members and containers, before and after changes"
+        gr = FakeGraph()
+        gr.add_edus(1, 2, 3, 4)
+        gr.add_rel('a', 1, 2)
+        gr.add_cdu('X', [1, 'a', 2])
+        gr.add_cdu('Y', ['X', 3])
+        self.assertEqual(frozenset(['1', '2', 'a', 'X', '3']),
+                         gr.cdu_members('Y', deep=True))
+        self.assertEqual('X', gr.containing_cdu('1'))
+        self.assertEqual(['X', 'Y'], gr.containing_cdu_chain('1'))
+        self.assertEqual([], gr.containing_cdu_chain('4'))
+
+        gr.add_cdu('Z', ['Y', 4])
+        gr.unlink('1', 'X')
+        self.assertEqual(frozenset(['2', 'a', 'X', '3', 'Y', '4']),
+                         gr.cdu_members('Z', deep=True))
+        self.assertEqual(None, gr.containing_cdu('1'))
+        self.assertEqual(['X', 'Y', 'Z'], gr.containing_cdu_chain('2'))
+        self.assertEqual(['Z'], gr.containing_cdu_chain('4'))
+
+    def test_hypergraph_links(self):
+        "link order, deletion and attributes in the native hypergraph"
+        gr = FakeGraph()
+        gr.add_edus(1, 2, 3)
+        gr.add_rel('a', 2, 1)
+        gr.add_cdu('X', [1, 2, 3])
+        self.assertEqual(['2', '1'], gr.links('a'))
+        self.assertEqual(['a', 'X'], gr.links('1'))
+        self.assertRaises(ValueError, gr.link, '1', 'X')
+        self.assertEqual('rel', gr.type('a'))
+
+        gr.unlink('3', 'X')
+        self.assertEqual(['1', '2'], gr.links('X'))
+        gr.del_edge('a')
+        self.assertFalse(gr.has_edge('a'))
+        self.assertEqual(['X'], gr.links('1'))
+        gr.del_node('1')
+        self.assertEqual(['2'], gr.links('X'))
+        self.assertEqual(frozenset(['2', '3']), gr.edus())
+
     def test_copy(self):
         """
         graph in essentially two components but some links
@@ -335,6 +943,41 @@ class BasicGraphTest(unittest.TestCase):
         self.assertEqual(xset2,             gr4.edus())
         self.assertEqual(set(['X1', 'X2']), gr4.cdus())
 
+    def test_connected_components(self):
+        "connected components on random graphs"
+        rng = random.Random(19)
+        for _ in range(200):
+            gr = random_graph(rng, rng.randint(0, 12), rng.randint(0, 12))
+            ccs = gr.connected_components()
+            self.assertEqual(naive_connected_components(gr), ccs)
+            self.assertEqual(set(gr.nodes()),
+                             set(n for cc in ccs for n in cc))
+
+    def test_copy_many(self):
+        "copy_many is like copying each subset in turn"
+        gr = FakeGraph()
+        gr.add_edus(*range(1,4))
+        gr.add_edus(*range(10,14))
+        gr.add_rel('1.2', 1, 2)
+        gr.add_rel('2.11', 2, 11)
+        gr.add_rel('11.12', 11, 12)
+        gr.add_rel('1.2-12', '1.2', 12) # relation to relation
+        gr.add_cdu('X1', [2,3])
+        gr.add_cdu('Y1', [12,13])
+
+        nodesets = [set(map(str,[1,2,3])),
+                    set(map(str,[1,2,11,12])),
+                    set(['Y1']),
+                    set()]
+        for nodes, gr2 in zip(nodesets, gr.copy_many(nodesets)):
+            gr1 = gr.copy(nodes)
+            self.assertEqual(gr1.nodes(),      gr2.nodes())
+            self.assertEqual(gr1.hyperedges(), gr2.hyperedges())
+        gr2 = gr.copy(nodesets[1])
+        self.assertEqual(set(['1.2', '2.11', '11.12', '1.2-12']),
+                         gr2.relations())
+        self.assertEqual(['1.2', '12'], gr2.links('1.2-12'))
+
 
 def test_relative_indices():
     """Test for relative_indices"""
@@ -357,3 +1000,209 @@ def test_relative_indices():
 
     inv_exa2 = [0, 0, 1, 0, 0, 0]
     assert relative_indices(example2, reverse=True, valna=0) == inv_exa2
+
+
+# ---------------------------------------------------------------------
+# glozz
+# ---------------------------------------------------------------------
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+def anno_signature(anno):
+    """
+    Comparable summary of an annotation (for comparing annotations
+    that come from different reads of the same file)
+    """
+    if isinstance(anno.span, Span):
+        span = (anno.span.char_start, anno.span.char_end)
+    elif isinstance(anno.span, RelSpan):
+        span = (anno.span.t1, anno.span.t2)
+    else:
+        span = tuple(sorted(anno.span))
+    return (anno.local_id(), anno.type, span,
+            tuple(sorted(anno.features.items())),
+            tuple(sorted((anno.metadata or {}).items())),
+            anno.origin)
+
+
+def doc_signature(doc):
+    """
+    Comparable summary of a document; see `anno_signature`
+    """
+    return (doc.hashcode,
+            doc.text(),
+            doc.origin,
+            [anno_signature(x) for x in doc.units],
+            [anno_signature(x) for x in doc.relations],
+            [anno_signature(x) for x in doc.schemas])
+
+
+def _sample_glozz_files():
+    """
+    All .aa/.ac pairs from the sample corpora
+    """
+    glozz_dir = os.path.join(DATA_DIR, 'glozz-sample')
+    pairs = [(os.path.join(glozz_dir, 'example-%s.aa' % x),
+              os.path.join(glozz_dir, 'example-%s.ac' % x))
+             for x in ['units', 'discourse']]
+    reader = stac.Reader(os.path.join(DATA_DIR, 'stac-sample'))
+    pairs.extend(reader.files().values())
+    return pairs
+
+
+class GlozzReaderTest(unittest.TestCase):
+    "tests for educe.glozz reading"
+
+    def test_iterparse_same_as_read_node(self):
+        """
+        the streaming reader gives the same documents as the
+        recursive read_node one
+        """
+        for anno_file, text_file in _sample_glozz_files():
+            doc = glozz.read_annotation_file(anno_file, text_file)
+            hashcode, units, rels, schemas =\
+                glozz.read_node(ET.parse(anno_file).getroot())
+            expected = glozz.GlozzDocument(hashcode, units, rels,
+                                                 schemas, doc.text())
+            self.assertEqual(doc_signature(expected), doc_signature(doc))
+
+    def test_shared_strings(self):
+        """
+        annotations from different files share their type names,
+        feature and metadata keys, and short values
+        """
+        (anno1, text1), (anno2, text2) = _sample_glozz_files()[-2:]
+        units = (glozz.read_annotation_file(anno1, text1).units +
+                 glozz.read_annotation_file(anno2, text2).units)
+        first = units[0]
+        for unit in units[1:]:
+            if unit.type == first.type:
+                self.assertIs(first.type, unit.type)
+            for key in unit.metadata:
+                self.assertIs(key, _same_key(first.metadata, key))
+            for key, val in unit.features.items():
+                if key in first.features and val is not None and\
+                        val == first.features[key] and len(val) < 64:
+                    self.assertIs(val, first.features[key])
+
+
+def _same_key(dct, key):
+    "the key in the dictionary equal to the given key"
+    return [k for k in dct if k == key][0]
+
+
+def _minidom_write_annotation_file(anno_filename, doc, settings):
+    """
+    How we used to write Glozz files, via ElementTree and minidom
+    (reference for the streaming writer)
+    """
+    string1 = ET.tostring(doc.to_xml(settings=settings), 'utf-8')
+    reparsed = minidom.parseString(string1.replace(b'\n', b''))
+    string2 = reparsed.toprettyxml(indent="", encoding='utf-8')
+    minidom_zero = len(minidom.Document().toxml(encoding='utf-8')) + 1
+    with open(anno_filename, 'wb') as fout:
+        fout.write((glozz._GLOZZ_DECL + '\n').encode('utf-8'))
+        fout.write(string2[minidom_zero:])
+
+
+class GlozzWriterTest(unittest.TestCase):
+    "tests for educe.glozz writing"
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def assertSameOutput(self, doc, settings):
+        "streaming writer and minidom round trip agree on doc"
+        expected_file = os.path.join(self.tmpdir, 'expected.aa')
+        got_file = os.path.join(self.tmpdir, 'got.aa')
+        _minidom_write_annotation_file(expected_file, doc, settings)
+        glozz.write_annotation_file(got_file, doc, settings)
+        with open(expected_file, 'rb') as stream:
+            expected = stream.read()
+        with open(got_file, 'rb') as stream:
+            got = stream.read()
+        self.assertEqual(expected, got)
+
+    def test_sample_corpora(self):
+        "byte-identical output on the sample data"
+        for anno_file, text_file in _sample_glozz_files():
+            doc = glozz.read_annotation_file(anno_file, text_file)
+            self.assertSameOutput(doc, glozz.default_output_settings)
+            self.assertSameOutput(doc, STAC_OUTPUT_SETTINGS)
+
+    def test_corner_cases(self):
+        "escaping, empty elements, newlines in text"
+        features = {'a': 'x & <y> "q"\nz',
+                    'b': None,
+                    'c': '',
+                    'd': '\n',
+                    'e': 'a\r\nb',
+                    'f': u'\xe9t\xe9'}
+        unit1 = Unit('u1', Span(0, 3), 'Segment', features,
+                     metadata={'author': 'bob'})
+        unit2 = Unit('u2', Span(3, 5), None, {}, metadata={})
+        rel = Relation('r1', RelSpan('u1', 'u2'), 'Comment', {}, {})
+        cdu1 = Schema('s1', frozenset(['u1', 'u2']), frozenset(['r1']),
+                      frozenset(), 'CDU', {}, {})
+        cdu2 = Schema('s2', frozenset(), frozenset(), frozenset(),
+                      'CDU', {}, {})
+        settings = glozz.default_output_settings
+        self.assertSameOutput(glozz.GlozzDocument(None, [unit1, unit2],
+                                                  [rel], [cdu1, cdu2],
+                                                  'hello'),
+                              settings)
+        self.assertSameOutput(glozz.GlozzDocument(None, [], [], [], ''),
+                              settings)
+        self.assertSameOutput(glozz.GlozzDocument('3-4', [], [], [], ''),
+                              settings)
+
+
+def _bytewise_hashcode(stream):
+    """
+    Byte at a time Glozz hashcode (reference for `glozz.hashcode`)
+    """
+    code = 1
+    length = 0
+    byte = stream.read(1)
+    while byte:
+        length += 1
+        code = (code * ord(byte)) % 99999999
+        byte = stream.read(1)
+    return str(length) + '-' + str(code)
+
+
+class GlozzHashcodeTest(unittest.TestCase):
+    "tests for glozz.hashcode"
+
+    def assertSameHashcode(self, data):
+        "chunked hashcode same as byte-at-a-time one"
+        self.assertEqual(_bytewise_hashcode(BytesIO(data)),
+                         glozz.hashcode(BytesIO(data)))
+
+    def test_corner_cases(self):
+        "empty input, zero bytes, multiple blocks"
+        self.assertEqual('0-1', glozz.hashcode(BytesIO(b'')))
+        self.assertSameHashcode(b'abc\x00def')
+        self.assertSameHashcode(bytes(bytearray(range(1, 256))) * 3)
+        rng = random.Random(42)
+        data = bytes(bytearray(rng.randint(1, 255) for _ in range(5000)))
+        old_block_size = glozz._HASHCODE_BLOCK_SIZE
+        glozz._HASHCODE_BLOCK_SIZE = 64
+        try:
+            self.assertSameHashcode(data)
+        finally:
+            glozz._HASHCODE_BLOCK_SIZE = old_block_size
+
+    def test_sample_corpora(self):
+        "hashcodes of the sample data"
+        for _, text_file in _sample_glozz_files():
+            with open(text_file, 'rb') as stream:
+                self.assertSameHashcode(stream.read())
+        stub = os.path.join(DATA_DIR, 'glozz-sample', 'example-units')
+        with open(stub + '.ac', 'rb') as stream:
+            self.assertEqual(glozz.read_hashcode(stub + '.aa'),
+                             glozz.hashcode(stream))
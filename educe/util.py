@@ -8,6 +8,8 @@ Miscellaneous utility functions
 from itertools import chain, groupby
 import re
 
+from educe.cache import DEFAULT_CACHE_DIR
+
 
 def concat(items):
     ":: Iterable (Iterable a) -> Iterable a"
@@ -86,7 +88,7 @@ def mk_is_interesting(args,
         "generalised helper for mk_checker"
         def check(fileid):
             "matching on k value"
-            val = fileid.__dict__[attr]
+            val = getattr(fileid, attr)
             return False if val is None else pred(val)
         return check
 
@@ -110,6 +112,55 @@ def mk_is_interesting(args,
     return lambda k: all(check(k) for check in doc_checkers)
 
 
+def add_jobs_arg(parser):
+    """
+    For help with script-building:
+
+    Augment an argparser with a `--jobs` option for the number of
+    processes to read the corpus with (see `educe.corpus.Reader.slurp`),
+    and to draw graphs with, if any.
+    Read it back with `args.__dict__.get('jobs', 1)`, which also
+    works for parsers that lack the option.
+
+    In scripts with subcommands, the option belongs to the main
+    parser, so it must come before the subcommand name.
+    """
+    parser.add_argument('--jobs', '-j',
+                        metavar='N',
+                        type=int,
+                        default=1,
+                        help='parse corpus files (and draw graphs) '
+                        'in N processes (default 1; 0 for one per CPU); '
+                        'give it before any subcommand')
+
+
+def add_cache_arg(parser):
+    """
+    For help with script-building:
+
+    Augment an argparser with a `--cache-dir` option for saving
+    parsed corpus files between runs (see `educe.cache`), and a
+    `--cache` shorthand for the default cache directory.
+    Read either back with `args.__dict__.get('cache_dir')` (None if
+    caching is off).
+
+    In scripts with subcommands, the options belong to the main
+    parser, so they must come before the subcommand name.
+    """
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--cache-dir',
+                       metavar='DIR',
+                       help='cache parsed corpus files in DIR '
+                       '(default: no cache); give it before any '
+                       'subcommand')
+    group.add_argument('--cache',
+                       dest='cache_dir',
+                       action='store_const',
+                       const=DEFAULT_CACHE_DIR,
+                       help='cache parsed corpus files in {}; give it '
+                       'before any subcommand'.format(DEFAULT_CACHE_DIR))
+
+
 def add_subcommand(subparsers, module):
     '''
     Add a subcommand to an argparser following some conventions:
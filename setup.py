@@ -21,6 +21,7 @@ REQS = \
      'six',
      'tabulate',
      'nltk >= 3.0.0',
+     'numpy',
      'soundex']
 
 